@@ -13,6 +13,9 @@ from config import Config
 from app.models import db, User
 from app.routes.admin import admin
 from app.utils.template_filters import setup_template_filters
+from app.utils.storage import init_storage
+from app.utils.resize_cache import init_resize_cache
+from app.utils.chunked_uploads import init_chunked_uploads
 
 cache = Cache()
 migrate = Migrate()
@@ -31,14 +34,26 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     login.init_app(app)
     admin.init_app(app)
-    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    # Backend from CACHE_TYPE; FileSystemCache is shared by the host's workers
+    cache.init_app(app)
     # --- ADD THIS LINE ---
     ckeditor.init_app(app)
     
+    # Image storage backend (S3 or local disk), see IMAGE_STORAGE
+    init_storage(app)
+    # Disk cache for /img/<key> on-demand resizes, see IMAGE_RESIZE_CACHE_PATH
+    init_resize_cache(app)
+    # Part files of resumable admin uploads, see IMAGE_CHUNKED_UPLOADS
+    init_chunked_uploads(app)
+
     # Register the custom template filter ---
     # This makes the `| s3_url` filter available in all Jinja2 templates
     setup_template_filters(app)
 
+    # Register the `flask images ...` CLI commands
+    from app.cli import images_cli
+    app.cli.add_command(images_cli)
+
     @login.user_loader
     def load_user(id):
         return User.query.get(int(id))
@@ -61,5 +76,7 @@ def create_app(config_class=Config):
     app.register_blueprint(puppies_bp)
     from app.routes.main import bp as main_bp
     app.register_blueprint(main_bp)
+    from app.routes.media import bp as media_bp
+    app.register_blueprint(media_bp)
 
     return app
\ No newline at end of file
@@ -0,0 +1,225 @@
+# app/cli.py
+"""
+Custom `flask` CLI commands.
+
+Image maintenance commands live under the `images` group, e.g.:
+    flask images work
+    flask images import ./photos --folder gallery --responsive
+    flask images backfill --dry-run
+    flask images gc --grace-days 7
+    flask images measure
+    flask images hash
+    flask images cards
+    flask images cache-stats
+"""
+
+import click
+from flask.cli import AppGroup
+
+images_cli = AppGroup('images', help='Image pipeline maintenance commands.')
+
+
+@images_cli.command('work')
+@click.option('--once', is_flag=True, help='Process the jobs that are currently due, then exit.')
+@click.option('--poll-interval', default=2.0, show_default=True, help='Seconds to sleep when the queue is empty.')
+def work(once, poll_interval):
+    """Runs the background image-processing worker."""
+    from app.utils.image_jobs import run_worker
+
+    try:
+        processed = run_worker(poll_interval=poll_interval, once=once)
+        print(f"Processed {processed} image job(s).")
+    except KeyboardInterrupt:
+        print("Image worker stopped.")
+
+
+@images_cli.command('import')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--folder', required=True, type=click.Choice(['gallery', 'parents', 'puppies']),
+              help='Storage folder, and the kind of row created for each image.')
+@click.option('--responsive', is_flag=True, help='Also store the responsive sizes.')
+@click.option('--parent-id', type=int, help='Parent the images belong to (--folder parents).')
+@click.option('--litter-id', type=int, help='Litter to add a puppy to per image (--folder puppies).')
+@click.option('--workers', type=int, default=None, help='Images processed at once. Defaults to the CPU count.')
+@click.option('--batch-size', default=50, show_default=True, help='Rows inserted per commit.')
+@click.option('--manifest', type=click.Path(dir_okay=False),
+              help='Progress file used to resume. Defaults to DIRECTORY/.images-import.')
+def import_images(directory, folder, responsive, parent_id, litter_id, workers, batch_size, manifest):
+    """Imports every image in DIRECTORY, skipping files a previous run already imported."""
+    from app.models import db, Parent, Litter
+    from app.utils.image_import import import_directory
+
+    scope_id = None
+    if folder == 'parents':
+        if parent_id is None or db.session.get(Parent, parent_id) is None:
+            raise click.BadParameter('an existing --parent-id is required for --folder parents.')
+        scope_id = parent_id
+    elif folder == 'puppies':
+        if litter_id is None or db.session.get(Litter, litter_id) is None:
+            raise click.BadParameter('an existing --litter-id is required for --folder puppies.')
+        scope_id = litter_id
+
+    try:
+        summary = import_directory(
+            directory, folder, responsive=responsive, workers=workers, batch_size=batch_size,
+            scope_id=scope_id, manifest_path=manifest
+        )
+    except KeyboardInterrupt:
+        print("Import interrupted; run the same command again to resume.")
+        return
+
+    seconds = summary['seconds'] or 1e-9
+    processed = summary['imported'] + summary['existing']
+    print(
+        f"Imported {summary['imported']} image(s) from {summary['found']} file(s): "
+        f"{summary['skipped']} already imported, {summary['existing']} already on a row, "
+        f"{summary['failed']} failed."
+    )
+    print(
+        f"{seconds:.1f}s, {processed / seconds:.2f} images/s, "
+        f"{summary['bytes_read'] / 2**20 / seconds:.1f} MB/s read, "
+        f"{summary['bytes_stored'] / 2**20:.1f} MB stored."
+    )
+
+
+@images_cli.command('backfill')
+@click.option('--dry-run', is_flag=True, help='Only list the rows that are missing sizes.')
+@click.option('--folder', 'folders', multiple=True, type=click.Choice(
+    ['about', 'gallery', 'hero', 'litters', 'parents', 'parents_alternates', 'puppies']
+),
+              help='Only backfill these image slots (repeatable). Defaults to all of them.')
+@click.option('--workers', default=2, show_default=True, help='Images rendered at once.')
+@click.option('--rate', type=float, default=None,
+              help='At most this many images started per second. Unlimited by default.')
+@click.option('--batch-size', default=50, show_default=True, help='Rows updated per commit.')
+def backfill(dry_run, folders, workers, rate, batch_size):
+    """Generates the responsive sizes missing from images stored before they existed."""
+    from app.utils.image_backfill import backfill_variants
+
+    try:
+        summary = backfill_variants(
+            folders=folders or None, workers=workers, batch_size=batch_size, rate=rate, dry_run=dry_run
+        )
+    except KeyboardInterrupt:
+        print("Backfill interrupted; run the same command again to resume.")
+        return
+
+    if dry_run:
+        print(f"{summary['rows']} row(s) across {summary['images']} image(s) need a backfill.")
+        return
+
+    seconds = summary['seconds'] or 1e-9
+    print(
+        f"Backfilled {summary['updated']} of {summary['rows']} row(s) "
+        f"({summary['images']} image(s), {summary['failed']} row(s) failed)."
+    )
+    print(
+        f"{seconds:.1f}s, {summary['images'] / seconds:.2f} images/s, "
+        f"{summary['variants_stored']} object(s) / {summary['bytes_stored'] / 2**20:.1f} MB stored."
+    )
+
+
+@images_cli.command('gc')
+@click.option('--grace-days', default=7.0, show_default=True,
+              help='Only delete unreferenced objects older than this.')
+@click.option('--prefix', 'prefixes', multiple=True,
+              help='Only scan keys under this folder (repeatable). Defaults to every image folder.')
+@click.option('--dry-run', is_flag=True, help='List what would be deleted without deleting it.')
+def gc(grace_days, prefixes, dry_run):
+    """Deletes stored images that no row refers to any more."""
+    from app.utils.image_gc import collect_garbage
+
+    summary = collect_garbage(grace_days=grace_days, prefixes=prefixes or None, dry_run=dry_run)
+
+    verb = 'Would delete' if dry_run else 'Deleted'
+    print(
+        f"{verb} {summary['deleted']} unreferenced object(s), "
+        f"{summary['bytes_reclaimed'] / 2**20:.1f} MB reclaimed, and {summary['assets_deleted']} orphaned asset(s)."
+    )
+    print(
+        f"Scanned {summary['scanned']} object(s) in {summary['seconds']:.1f}s: "
+        f"{summary['referenced']} referenced, {summary['recent']} newer than {grace_days:g} day(s)."
+    )
+
+
+@images_cli.command('measure')
+@click.option('--dry-run', is_flag=True, help='Only list the variants that have no dimensions.')
+@click.option('--workers', default=4, show_default=True, help='Objects read at once.')
+@click.option('--rate', type=float, default=None,
+              help='At most this many objects read per second. Unlimited by default.')
+@click.option('--batch-size', default=200, show_default=True, help='Variants updated per commit.')
+def measure(dry_run, workers, rate, batch_size):
+    """Records the width, height and size of stored variants that were never measured."""
+    from app.utils.image_backfill import measure_variants
+
+    try:
+        summary = measure_variants(workers=workers, batch_size=batch_size, rate=rate, dry_run=dry_run)
+    except KeyboardInterrupt:
+        print("Measuring interrupted; run the same command again to resume.")
+        return
+
+    if dry_run:
+        print(f"{summary['variants']} variant(s) have no recorded dimensions.")
+        return
+    print(
+        f"Measured {summary['measured']} of {summary['variants']} variant(s) "
+        f"({summary['failed']} failed) in {summary['seconds']:.1f}s."
+    )
+
+
+@images_cli.command('hash')
+@click.option('--dry-run', is_flag=True, help='Only list the images that have no perceptual hash.')
+@click.option('--workers', default=4, show_default=True, help='Objects read at once.')
+@click.option('--rate', type=float, default=None,
+              help='At most this many objects read per second. Unlimited by default.')
+@click.option('--batch-size', default=200, show_default=True, help='Assets updated per commit.')
+def hash_images(dry_run, workers, rate, batch_size):
+    """Records the perceptual hash of stored images uploaded before duplicates were detected."""
+    from app.utils.image_backfill import hash_assets
+
+    try:
+        summary = hash_assets(workers=workers, batch_size=batch_size, rate=rate, dry_run=dry_run)
+    except KeyboardInterrupt:
+        print("Hashing interrupted; run the same command again to resume.")
+        return
+
+    if dry_run:
+        print(f"{summary['assets']} image(s) have no perceptual hash.")
+        return
+    print(
+        f"Hashed {summary['hashed']} of {summary['assets']} image(s) "
+        f"({summary['failed']} failed) in {summary['seconds']:.1f}s."
+    )
+
+
+@images_cli.command('cards')
+def share_cards():
+    """Renders the share card of every litter and puppy whose card is missing or out of date."""
+    from app.models import db, Litter, Puppy
+    from app.utils.share_cards import refresh_share_card
+
+    rows = Litter.query.all() + Puppy.query.all()
+    rendered = sum(refresh_share_card(row) for row in rows)
+    db.session.commit()
+    print(f"Rendered {rendered} share card(s) for {len(rows)} litter(s) and puppies.")
+
+
+@images_cli.command('cache-stats')
+@click.option('--reset', is_flag=True, help='Zero the counters after printing them.')
+def cache_stats(reset):
+    """Prints the hit rate of the presigned URL cache across the workers sharing it."""
+    from flask import current_app
+    from app.utils.cache_stats import get_presigned_url_counters
+
+    counters = get_presigned_url_counters()
+    totals = counters.totals()
+    rate = totals['hits'] / totals['lookups'] if totals['lookups'] else 0
+    print(
+        f"Presigned URLs ({current_app.config['CACHE_TYPE']}): {totals['lookups']} lookup(s), "
+        f"{totals['hits']} hit(s), {totals['misses']} signed ({rate:.1%} hit rate)."
+    )
+    if current_app.config['CACHE_TYPE'] in ('SimpleCache', 'simple', 'NullCache', 'null'):
+        print("The cache is not shared between processes, so the workers' counts are not visible here.")
+    if reset:
+        counters.reset()
+        print("Counters reset.")
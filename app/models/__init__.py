@@ -13,7 +13,7 @@ from flask_sqlalchemy import SQLAlchemy
 # Initialize the database instance.
 db = SQLAlchemy()
 
-from .enums import ParentRole, PuppyStatus
+from .enums import ParentRole, PuppyStatus, ImageJobStatus
 from .site_models import SiteDetails, HeroSection, AboutSection, GalleryImage, AnnouncementBanner
 from .parent_models import Parent, ParentImage
 from .puppy_models import Puppy
@@ -23,4 +23,5 @@ from .puppy_models import Puppy
 from .review_models import Review
 from .user_models import User
 from .litter_models import Litter
+from .image_models import ImageJob, ImageAsset, ImageVariant
 
@@ -15,4 +15,11 @@ class PuppyStatus(enum.Enum):
     """Enumeration for the availability status of a puppy."""
     AVAILABLE = "Available"
     RESERVED = "Reserved"
-    SOLD = "Sold"
\ No newline at end of file
+    SOLD = "Sold"
+
+class ImageJobStatus(enum.Enum):
+    """Enumeration for the lifecycle of a background image-processing job."""
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
@@ -0,0 +1,194 @@
+# app/models/image_models.py
+"""
+Defines models used by the image-processing pipeline.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from . import db
+from .enums import ImageJobStatus
+
+
+def utcnow():
+    """Naive UTC timestamp (DateTime columns are stored without a timezone)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ImageJob(db.Model):
+    """
+    A queued image upload waiting to be resized and stored by the background
+    worker (`flask images work`).
+
+    The raw upload is kept in `payload` until the job succeeds, or, for a
+    direct upload (app/utils/direct_uploads.py), in storage under
+    `source_s3_key`. The resulting storage keys are written back onto the
+    target row using `field_map`, which maps upload_image() variant names
+    (e.g. "original", "large") to column names on the target model.
+    """
+
+    __tablename__ = "image_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(
+        db.Enum(ImageJobStatus),
+        nullable=False,
+        default=ImageJobStatus.PENDING,
+        index=True
+    )
+
+    # Row that receives the resulting keys
+    target_table = db.Column(db.String(64), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    field_map_json = db.Column(db.Text, nullable=False)
+
+    # upload_image() arguments
+    folder = db.Column(db.String(64), nullable=False)
+    responsive = db.Column(db.Boolean, default=False, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    payload = db.Column(db.LargeBinary(length=(2 ** 32) - 1))
+    source_s3_key = db.Column(db.String(255))
+
+    # Retry bookkeeping
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=utcnow, nullable=False, index=True)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=utcnow, nullable=False)
+    completed_at = db.Column(db.DateTime)
+
+    @property
+    def field_map(self):
+        return json.loads(self.field_map_json or "{}")
+
+    @field_map.setter
+    def field_map(self, value):
+        self.field_map_json = json.dumps(value)
+
+    @property
+    def target_label(self):
+        """Short description shown in the admin, e.g. "parent #3 (main_image_s3_key)"."""
+        fields = ", ".join(sorted(set(self.field_map.values())))
+        return f"{self.target_table} #{self.target_id} ({fields})"
+
+    def __repr__(self):
+        return f"<ImageJob {self.id} {self.status.name} {self.target_table}#{self.target_id}>"
+
+
+class ImageAsset(db.Model):
+    """
+    One uploaded image and every stored rendition of it (see ImageVariant).
+
+    Rows that display an image point at an asset, so pages can pick the
+    smallest variant that is wide enough instead of always sending the
+    original. Keys are content-addressed, so re-uploading the same photo
+    resolves to the same asset.
+    """
+
+    __tablename__ = "image_asset"
+
+    id = db.Column(db.Integer, primary_key=True)
+    folder = db.Column(db.String(64), nullable=False)
+    # Format of the "original" variant and <img> fallback, e.g. "jpeg"
+    source_format = db.Column(db.String(16), nullable=False)
+    # Alternate encodings stored for every variant (e.g. "avif,webp"), in preference order
+    formats = db.Column(db.String(32))
+    # Tiny preview as a data: URI, inlined as the <img> background until the image loads
+    placeholder = db.Column(db.Text)
+    # perceptual_hash() of the original (16 hex digits), used to spot near-duplicate uploads
+    dhash = db.Column(db.String(16), index=True)
+    created_at = db.Column(db.DateTime, default=utcnow, nullable=False)
+
+    # Always needed together with the asset, so load them in one extra query per page
+    variants = db.relationship(
+        "ImageVariant",
+        backref="asset",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    @property
+    def alternate_formats(self):
+        """Alternate formats as a list, e.g. ["avif", "webp"]."""
+        return [fmt for fmt in (self.formats or "").split(",") if fmt]
+
+    @property
+    def original(self):
+        """The full-size variant in the source format."""
+        return next(
+            (v for v in self.variants if v.name == "original" and v.format == self.source_format),
+            None
+        )
+
+    def variant_for(self, width=None, fmt=None):
+        """
+        The smallest variant in `fmt` (default: the source format) that is at
+        least `width` pixels wide, or the widest one if none is. Without a
+        width, the original.
+        """
+        fmt = fmt or self.source_format
+        candidates = [v for v in self.variants if v.format == fmt]
+        if not candidates:
+            return None
+        if width is None:
+            return next((v for v in candidates if v.name == "original"), None) or max(
+                candidates, key=lambda v: v.effective_width
+            )
+        adequate = [v for v in candidates if v.effective_width >= width]
+        if adequate:
+            return min(adequate, key=lambda v: v.effective_width)
+        return max(candidates, key=lambda v: v.effective_width)
+
+    def __repr__(self):
+        return f"<ImageAsset {self.id} {self.folder}>"
+
+
+class ImageVariant(db.Model):
+    """
+    A single stored rendition of an ImageAsset: one size in one format.
+
+    width/height/bytes are measured at upload. Rows backfilled from the old
+    per-size key columns leave them empty until they are measured; until
+    then the size name's bounding box stands in for the width.
+    """
+
+    __tablename__ = "image_variant"
+
+    # Long edge each responsive size is rendered to (see upload_image()); the
+    # original is assumed to be at least as large as every resized variant
+    NOMINAL_WIDTHS = {"small": 480, "medium": 800, "large": 1200, "xl": 1920}
+
+    id = db.Column(db.Integer, primary_key=True)
+    asset_id = db.Column(
+        db.Integer,
+        db.ForeignKey("image_asset.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    # Size name from upload_image(): "original", "small", "medium", "large", "xl"
+    name = db.Column(db.String(16), nullable=False)
+    # Lower-case format name, as used in <source type="image/...">
+    format = db.Column(db.String(16), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
+    # Encoder quality chosen by SSIM targeting (IMAGE_QUALITY_MODE=ssim) and the
+    # bytes that saved against the fixed quality; empty for fixed-quality encodes
+    quality = db.Column(db.Integer)
+    bytes_saved = db.Column(db.Integer)
+    key = db.Column(db.String(255), nullable=False, unique=True)
+
+    @property
+    def effective_width(self):
+        """Measured width, or the size's nominal bound when it was never measured."""
+        if self.width:
+            return self.width
+        if self.name == "original":
+            return max(self.NOMINAL_WIDTHS.values()) + 1
+        return self.NOMINAL_WIDTHS.get(self.name, 0)
+
+    def __repr__(self):
+        return f"<ImageVariant {self.key}>"
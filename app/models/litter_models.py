@@ -24,6 +24,12 @@ class Litter(db.Model):
 
     # Litter cover image (used on Current Litters page)
     main_image_s3_key = db.Column(db.String(255))
+    main_image_formats = db.Column(db.String(32))
+    main_image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    main_image_asset = db.relationship("ImageAsset", lazy="joined")
+
+    # Open Graph share card (app/utils/share_cards.py), refreshed when the image or status changes
+    share_image_s3_key = db.Column(db.String(255))
 
     # Relationship to puppies
     puppies = db.relationship(
@@ -42,6 +42,27 @@ class Parent(db.Model):
     alternate_image_s3_key_3 = db.Column(db.String(255))
     alternate_image_s3_key_4 = db.Column(db.String(255))
 
+    # Alternate encodings stored next to each image (e.g. "avif,webp"),
+    # rendered as <picture> sources.
+    main_image_formats = db.Column(db.String(32))
+    alternate_image_formats_1 = db.Column(db.String(32))
+    alternate_image_formats_2 = db.Column(db.String(32))
+    alternate_image_formats_3 = db.Column(db.String(32))
+    alternate_image_formats_4 = db.Column(db.String(32))
+
+    # Normalized image records (every stored size and format, see ImageAsset)
+    main_image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    alternate_image_asset_id_1 = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    alternate_image_asset_id_2 = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    alternate_image_asset_id_3 = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    alternate_image_asset_id_4 = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+
+    main_image_asset = db.relationship("ImageAsset", foreign_keys=[main_image_asset_id], lazy="joined")
+    alternate_image_asset_1 = db.relationship("ImageAsset", foreign_keys=[alternate_image_asset_id_1], lazy="joined")
+    alternate_image_asset_2 = db.relationship("ImageAsset", foreign_keys=[alternate_image_asset_id_2], lazy="joined")
+    alternate_image_asset_3 = db.relationship("ImageAsset", foreign_keys=[alternate_image_asset_id_3], lazy="joined")
+    alternate_image_asset_4 = db.relationship("ImageAsset", foreign_keys=[alternate_image_asset_id_4], lazy="joined")
+
     # Flexible image gallery
     images = db.relationship(
         "ParentImage",
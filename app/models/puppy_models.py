@@ -41,6 +41,12 @@ class Puppy(db.Model):
 
     # Puppy image
     main_image_s3_key = db.Column(db.String(255))
+    main_image_formats = db.Column(db.String(32))
+    main_image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    main_image_asset = db.relationship("ImageAsset", lazy="joined")
+
+    # Open Graph share card (app/utils/share_cards.py), refreshed when the image or status changes
+    share_image_s3_key = db.Column(db.String(255))
 
     def __repr__(self):
         return f"<Puppy {self.id} ({self.name})>"
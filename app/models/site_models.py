@@ -50,6 +50,11 @@ class HeroSection(db.Model):
     image_s3_key_small = db.Column(db.String(255))
     image_s3_key_medium = db.Column(db.String(255))
     image_s3_key_large = db.Column(db.String(255))
+    # Alternate encodings stored next to the image (e.g. "avif,webp")
+    image_formats = db.Column(db.String(32))
+    # Normalized image record (every stored size and format, see ImageAsset)
+    image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    image_asset = db.relationship("ImageAsset", lazy="joined")
 
     def __repr__(self):
         """Provides a developer-friendly representation of the HeroSection object."""
@@ -72,6 +77,11 @@ class AboutSection(db.Model):
     image_s3_key_small = db.Column(db.String(255))
     image_s3_key_medium = db.Column(db.String(255))
     image_s3_key_large = db.Column(db.String(255))
+    # Alternate encodings stored next to the image (e.g. "avif,webp")
+    image_formats = db.Column(db.String(32))
+    # Normalized image record (every stored size and format, see ImageAsset)
+    image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    image_asset = db.relationship("ImageAsset", lazy="joined")
 
     def __repr__(self):
         """Provides a developer-friendly representation of the AboutSection object."""
@@ -86,7 +96,11 @@ class GalleryImage(db.Model):
     associated with specific parents or puppies.
     """
     id = db.Column(db.Integer, primary_key=True)
-    image_s3_key = db.Column(db.String(255), nullable=False)
+    # Nullable while a queued upload is still being processed
+    image_s3_key = db.Column(db.String(255))
+    image_formats = db.Column(db.String(32))
+    image_asset_id = db.Column(db.Integer, db.ForeignKey("image_asset.id", ondelete="SET NULL"))
+    image_asset = db.relationship("ImageAsset", lazy="joined")
     caption = db.Column(db.String(255))
     sort_order = db.Column(db.Integer, default=0)
 
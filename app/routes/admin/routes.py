@@ -1,17 +1,21 @@
 # app/routes/admin/routes.py
 
-from flask import redirect, url_for, request, render_template
+from flask import abort, current_app, jsonify, redirect, url_for, request, render_template
 from flask_login import current_user, login_user, logout_user
 from flask_admin.menu import MenuLink
 
 from app import db
 from app.models import (
-    User, Parent, Litter, Puppy, Review, HeroSection, AboutSection, GalleryImage, AnnouncementBanner
+    User, Parent, Litter, Puppy, Review, HeroSection, AboutSection, GalleryImage, AnnouncementBanner,
+    ImageJob
 )
+from app.utils.chunked_uploads import ChunkError, get_chunked_uploads
+from app.utils.direct_uploads import presign_upload
 from . import bp, admin
 from .views import (
     ParentAdminView, LitterAdminView, PuppyAdminView, HeroSectionAdminView,
-    AboutSectionAdminView, AnnouncementBannerAdminView, ReviewAdminView, AdminModelView, GalleryImageAdminView
+    AboutSectionAdminView, AnnouncementBannerAdminView, ReviewAdminView, AdminModelView, GalleryImageAdminView,
+    ImageJobAdminView
 )
 
 # Register admin views for different models
@@ -29,6 +33,8 @@ admin.add_view(AboutSectionAdminView(AboutSection, db.session, name="About Secti
 admin.add_view(AnnouncementBannerAdminView(AnnouncementBanner, db.session, name="Announcement Banner"))
 # Custom name for GalleryImage view in the admin interface
 admin.add_view(GalleryImageAdminView(GalleryImage, db.session, name="Gallery Images"))
+# Background image-processing queue status
+admin.add_view(ImageJobAdminView(ImageJob, db.session, name="Image Jobs"))
 
 # Add a logout link to the admin menu
 admin.add_link(MenuLink(name='Logout', category='', url='/admin/logout'))
@@ -57,3 +63,64 @@ def logout():
     # Log the user out
     logout_user()
     return redirect(url_for('main.index'))
+
+
+@bp.route('/direct-upload', methods=['POST'])
+def direct_upload():
+    """Issues a presigned POST for one image, see app/utils/direct_uploads.py."""
+    if not current_user.is_authenticated:
+        abort(401)
+    if not current_app.config.get('IMAGE_DIRECT_UPLOADS'):
+        abort(404)
+    return jsonify(presign_upload((request.get_json(silent=True) or {}).get('filename')))
+
+
+def _chunked_uploads():
+    """The chunked upload store, for a logged-in admin with IMAGE_CHUNKED_UPLOADS on."""
+    if not current_user.is_authenticated:
+        abort(401)
+    if not current_app.config.get('IMAGE_CHUNKED_UPLOADS'):
+        abort(404)
+    return get_chunked_uploads()
+
+
+@bp.route('/chunked-upload', methods=['POST'])
+def chunked_upload_create():
+    """Opens a resumable upload of {filename, size}, see app/utils/chunked_uploads.py."""
+    uploads = _chunked_uploads()
+    body = request.get_json(silent=True) or {}
+    size = body.get('size')
+    if not isinstance(size, int) or size <= 0:
+        abort(400, description='The upload is empty.')
+    try:
+        status = uploads.create(body.get('filename'), size)
+    except ValueError as e:
+        return jsonify(error=str(e)), 413
+    return jsonify(status), 201
+
+
+@bp.route('/chunked-upload/<upload_id>')
+def chunked_upload_status(upload_id):
+    """How much of an upload the server holds, for the browser to resume from."""
+    uploads = _chunked_uploads()
+    try:
+        return jsonify(uploads.status(upload_id))
+    except KeyError:
+        abort(404)
+
+
+@bp.route('/chunked-upload/<upload_id>/<int:index>', methods=['PUT'])
+def chunked_upload_chunk(upload_id, index):
+    """
+    Stores chunk `index` (the raw request body) and answers with the number
+    of chunks received. A chunk out of order is refused with 409 and the
+    same count, so the browser can resend from there.
+    """
+    uploads = _chunked_uploads()
+    try:
+        received = uploads.append(upload_id, index, request.get_data(cache=False))
+    except KeyError:
+        abort(404)
+    except ChunkError as e:
+        return jsonify(error=str(e), received=e.received), 409
+    return jsonify(received=received)
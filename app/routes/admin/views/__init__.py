@@ -11,5 +11,6 @@ from .home.about_view import AboutSectionAdminView
 from .home.announcement_banner_view import AnnouncementBannerAdminView
 from .home.gallery_view import GalleryImageAdminView
 from .litter_views import LitterAdminView
+from .image_job_views import ImageJobAdminView
 
 
@@ -1,9 +1,37 @@
 # app/routes/admin/views/base.py
 
-from flask import request, url_for, redirect
+from flask import request, url_for, redirect, current_app, flash
 from flask_admin import AdminIndexView, expose
 from flask_admin.contrib.sqla import ModelView
 from flask_login import current_user
+from wtforms.fields import BooleanField, FileField
+from wtforms.fields.core import UnboundField
+
+from app.utils.chunked_uploads import ChunkedUpload, chunked_upload
+from app.utils.direct_uploads import StagedUpload, staged_upload
+from app.utils.image_uploader import client_resize_edge, hash_upload, upload_image, verify_client_resize
+from app.utils.image_jobs import (
+    apply_image_keys, asset_covers, enqueue_image_job, keys_for_asset, near_duplicates,
+)
+
+# Checkbox added to every form with an image upload (see AdminModelView.get_form)
+REUSE_DUPLICATES_FIELD = 'reuse_duplicate_images'
+REUSE_DUPLICATES_LABEL = 'Reuse stored copies of near-duplicate images'
+
+# Posted by image_uploads.js with the name of every file input it downscaled
+CLIENT_RESIZED_FIELD = 'client_resized'
+
+
+def _has_file_upload(form_class):
+    return any(
+        isinstance(field, UnboundField) and issubclass(field.field_class, FileField)
+        for field in (getattr(form_class, name, None) for name in dir(form_class))
+    )
+
+
+def _asset_label(asset):
+    return asset.original.key if asset.original is not None else f'image asset #{asset.id}'
+
 
 class MyAdminIndexView(AdminIndexView):
     """ Custom admin index view that renders a dashboard and requires authentication. """
@@ -16,9 +44,157 @@ class MyAdminIndexView(AdminIndexView):
 
 class AdminModelView(ModelView):
     """ Base ModelView that enforces authentication for all model pages. """
+
+    # Long edge image_uploads.js downscales this view's uploads to (IMAGE_CLIENT_RESIZE)
+    client_resize_max_edge = client_resize_edge('')
+
     def is_accessible(self):
         return current_user.is_authenticated
 
     def inaccessible_callback(self, name, **kwargs):
         # Redirect to the login page if the user is not authenticated.
-        return redirect(url_for('admin_auth.login', next=request.url))
\ No newline at end of file
+        return redirect(url_for('admin_auth.login', next=request.url))
+
+    def get_form(self):
+        """
+        Adds the reuse-duplicates checkbox to forms that upload images. It is
+        unticked by default: a similar photo is only flagged, never swapped in
+        unless the admin asks for it.
+        """
+        form_class = super().get_form()
+        if not _has_file_upload(form_class):
+            return form_class
+        return type(form_class.__name__, (form_class,), {
+            REUSE_DUPLICATES_FIELD: BooleanField(
+                REUSE_DUPLICATES_LABEL, default=False,
+                description='Use the image already stored instead of processing an upload that looks the same.'
+            )
+        })
+
+    def _mark_upload_inputs(self, form):
+        """
+        Tells image_uploads.js what to do with each file input before the
+        form is posted: downscale it (IMAGE_CLIENT_RESIZE) and/or send it
+        straight to storage (IMAGE_DIRECT_UPLOADS) or in resumable chunks
+        (IMAGE_CHUNKED_UPLOADS).
+        """
+        marks = {}
+        if current_app.config.get('IMAGE_CLIENT_RESIZE'):
+            marks['data-client-resize'] = self.client_resize_max_edge
+        if current_app.config.get('IMAGE_DIRECT_UPLOADS'):
+            marks['data-direct-upload'] = url_for('admin_auth.direct_upload')
+        if current_app.config.get('IMAGE_CHUNKED_UPLOADS'):
+            marks['data-chunked-upload'] = url_for('admin_auth.chunked_upload_create')
+        if marks:
+            for field in form:
+                if isinstance(field, FileField):
+                    field.render_kw = {**(field.render_kw or {}), **marks}
+        return form
+
+    def create_form(self, obj=None):
+        return self._mark_upload_inputs(super().create_form(obj))
+
+    def edit_form(self, obj=None):
+        return self._mark_upload_inputs(super().edit_form(obj))
+
+    def image_upload(self, name):
+        """
+        The image posted for file input `name`: its FileStorage, a
+        StagedUpload if the browser sent it straight to storage, a
+        ChunkedUpload if it sent it in chunks, or None.
+        """
+        file_storage = request.files.get(name)
+        if file_storage and file_storage.filename:
+            return file_storage
+        return staged_upload(request.form, name) or chunked_upload(request.form, name)
+
+    def reuse_duplicate(self, model, file_storage, field_map):
+        """
+        Checks an upload against the perceptual hashes of the stored images.
+
+        A near-duplicate is flagged with a flash message. If the reuse
+        checkbox is ticked and the stored image has every size `field_map`
+        needs, its keys are applied to `model` and True is returned, so the
+        upload is never processed.
+        """
+        duplicates = near_duplicates(hash_upload(file_storage))
+        if not duplicates:
+            return False
+
+        reusable = next((asset for asset, _ in duplicates if asset_covers(asset, field_map)), None)
+        if reusable is not None and request.form.get(REUSE_DUPLICATES_FIELD):
+            apply_image_keys(model, keys_for_asset(reusable), field_map)
+            flash(f'"{file_storage.filename}" matches an image that is already stored ({_asset_label(reusable)}), '
+                  f'so the stored copy was reused. Untick "{REUSE_DUPLICATES_LABEL}" and upload again '
+                  f'to store the new file instead.', 'info')
+            return True
+
+        hint = f' Tick "{REUSE_DUPLICATES_LABEL}" and upload again to use it instead.' if reusable else ''
+        flash(f'"{file_storage.filename}" looks like a near-duplicate of an image that is already stored '
+              f'({_asset_label(duplicates[0][0])}).{hint}', 'warning')
+        return False
+
+    def save_image_upload(self, model, file_storage, folder, field_map, responsive=False):
+        """
+        Stores an uploaded image on `model`.
+
+        `field_map` maps upload_image() variant names to model attributes,
+        e.g. {'original': 'image_s3_key', 'large': 'image_s3_key_large',
+        'asset': 'image_asset'}.
+        With IMAGE_JOBS_ENABLED the upload is queued for `flask images work`
+        and the columns are filled in once processing finishes; otherwise the
+        image is processed inline. A near-duplicate of a stored image is
+        flagged, and reused instead of processed when the form asks for it
+        (see reuse_duplicate()). An upload the browser downscaled
+        (IMAGE_CLIENT_RESIZE) is only stored if verify_client_resize() accepts it.
+
+        `file_storage` may also be a StagedUpload (IMAGE_DIRECT_UPLOADS) or
+        a ChunkedUpload (IMAGE_CHUNKED_UPLOADS). Either is read back and
+        checked like a posted file. A staged upload is then queued by its
+        storage key; otherwise the upload is processed, or queued, like a
+        posted file and deleted straight after.
+        """
+        if isinstance(file_storage, (StagedUpload, ChunkedUpload)):
+            pending, file_storage = file_storage, file_storage.open()
+            if file_storage is None:
+                flash(f'"{pending.filename}" was not stored: the upload never finished.', 'error')
+                return
+            staged = pending if isinstance(pending, StagedUpload) else None
+            try:
+                queued = self._save_image_upload(model, file_storage, folder, field_map, responsive, staged)
+            finally:
+                file_storage.close()
+            if not queued:
+                pending.discard()
+            return
+
+        self._save_image_upload(model, file_storage, folder, field_map, responsive)
+
+    def _save_image_upload(self, model, file_storage, folder, field_map, responsive, staged=None):
+        """
+        save_image_upload() for a readable `file_storage`. A job queued with
+        IMAGE_JOBS_ENABLED takes the `staged` upload's key in place of the
+        bytes. Returns True if that job now owns the staged object.
+        """
+        if file_storage.name in request.form.getlist(CLIENT_RESIZED_FIELD):
+            error = verify_client_resize(file_storage, folder)
+            if error:
+                flash(f'"{file_storage.filename}" was not stored: {error}.', 'error')
+                return False
+
+        if self.reuse_duplicate(model, file_storage, field_map):
+            return False
+
+        if current_app.config.get('IMAGE_JOBS_ENABLED'):
+            enqueue_image_job(model, staged or file_storage, folder, field_map, responsive=responsive)
+            flash(f'"{file_storage.filename}" was queued for processing.', 'info')
+            return staged is not None
+
+        variants, errors = {}, []
+        keys = upload_image(file_storage, folder=folder, create_responsive_versions=responsive,
+                            variants=variants, errors=errors)
+        if keys is None:
+            reason = errors[0] if errors else 'it could not be processed'
+            flash(f'"{file_storage.filename}" was not stored: {reason}.', 'error')
+            return
+        apply_image_keys(model, keys, field_map, variants)
@@ -1,9 +1,7 @@
 # app/routes/admin/views/home/about_view.py
 
-from flask import request
 from wtforms.fields import FileField
 from ..base import AdminModelView
-from app.utils.image_uploader import upload_image
 
 class AboutSectionAdminView(AdminModelView):
     """ Custom AdminModelView for the About Section using Bootstrap 5 templates. """
@@ -37,11 +35,16 @@ class AboutSectionAdminView(AdminModelView):
 
     def on_model_change(self, form, model, is_created):
         """ Handle the S3 image upload when the model is saved. """
-        file = request.files.get('image_upload')
+        file = self.image_upload('image_upload')
         if file and file.filename:
-            s3_keys = upload_image(file, folder='about', create_responsive_versions=True)
-            if s3_keys:
-                model.image_s3_key = s3_keys.get('original')
-                model.image_s3_key_small = s3_keys.get('small')
-                model.image_s3_key_medium = s3_keys.get('medium')
-                model.image_s3_key_large = s3_keys.get('large')
\ No newline at end of file
+            self.save_image_upload(
+                model, file, folder='about', responsive=True,
+                field_map={
+                    'original': 'image_s3_key',
+                    'small': 'image_s3_key_small',
+                    'medium': 'image_s3_key_medium',
+                    'large': 'image_s3_key_large',
+                    'formats': 'image_formats',
+                    'asset': 'image_asset',
+                }
+            )
@@ -1,9 +1,7 @@
 # app/routes/admin/views/home/gallery_view.py
 
-from flask import request
 from wtforms.fields import FileField
 from ..base import AdminModelView
-from app.utils.image_uploader import upload_image
 
 class GalleryImageAdminView(AdminModelView):
     """ Custom Admin View for Gallery Images with Bootstrap 5 templates and live preview. """
@@ -29,14 +27,15 @@ class GalleryImageAdminView(AdminModelView):
 
     def on_model_change(self, form, model, is_created):
         """ Handles the S3 image upload when a gallery item is saved. """
-        file = request.files.get('image_upload')
+        file = self.image_upload('image_upload')
         
         # On creation, an image is required.
         if is_created and not file:
             raise ValueError("An image upload is required to create a new gallery item.")
 
         if file and file.filename:
-            # Use the simple uploader; no responsive versions needed for the main gallery.
-            s3_key = upload_image(file, folder='gallery')
-            if s3_key:
-                model.image_s3_key = s3_key
\ No newline at end of file
+            # Responsive sizes back the thumbnails; the lightbox links to the original
+            self.save_image_upload(
+                model, file, folder='gallery', responsive=True,
+                field_map={'original': 'image_s3_key', 'formats': 'image_formats', 'asset': 'image_asset'}
+            )
\ No newline at end of file
@@ -1,9 +1,8 @@
 # app/routes/admin/views/home/hero_view.py
 
-from flask import request
 from wtforms.fields import FileField
+from app.utils.image_uploader import client_resize_edge
 from ..base import AdminModelView
-from app.utils.image_uploader import upload_image
 
 class HeroSectionAdminView(AdminModelView):
     """ Custom view for the Hero Section with image upload and BS5 templates. """
@@ -18,6 +17,9 @@ class HeroSectionAdminView(AdminModelView):
     can_edit = True
     can_delete = True
 
+    # Hero uploads keep an XL (1920px) size
+    client_resize_max_edge = client_resize_edge('hero')
+
     # --- List View ---
     column_list = ('main_title', 'subtitle', 'description')
     
@@ -39,11 +41,16 @@ class HeroSectionAdminView(AdminModelView):
 
     def on_model_change(self, form, model, is_created):
         """Handle the S3 image upload when the model is saved."""
-        file = request.files.get('image_upload')
+        file = self.image_upload('image_upload')
         if file and file.filename:
-            s3_keys = upload_image(file, folder='hero', create_responsive_versions=True)
-            if s3_keys:
-                model.image_s3_key = s3_keys.get('original')
-                model.image_s3_key_small = s3_keys.get('small')
-                model.image_s3_key_medium = s3_keys.get('medium')
-                model.image_s3_key_large = s3_keys.get('large')
\ No newline at end of file
+            self.save_image_upload(
+                model, file, folder='hero', responsive=True,
+                field_map={
+                    'original': 'image_s3_key',
+                    'small': 'image_s3_key_small',
+                    'medium': 'image_s3_key_medium',
+                    'large': 'image_s3_key_large',
+                    'formats': 'image_formats',
+                    'asset': 'image_asset',
+                }
+            )
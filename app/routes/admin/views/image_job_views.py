@@ -0,0 +1,52 @@
+# app/routes/admin/views/image_job_views.py
+
+from flask import flash
+from flask_admin.actions import action
+from markupsafe import Markup
+
+from .base import AdminModelView
+from app.models import db, ImageJob, ImageJobStatus
+from app.models.image_models import utcnow
+
+# Bootstrap badge colour per job status
+STATUS_BADGES = {
+    ImageJobStatus.PENDING: 'bg-warning text-dark',
+    ImageJobStatus.RUNNING: 'bg-info text-dark',
+    ImageJobStatus.DONE: 'bg-success',
+    ImageJobStatus.FAILED: 'bg-danger',
+}
+
+
+def _status_formatter(view, context, model, name):
+    badge = STATUS_BADGES.get(model.status, 'bg-secondary')
+    return Markup(f'<span class="badge {badge}">{model.status.value}</span>')
+
+
+class ImageJobAdminView(AdminModelView):
+    """Read-only list of queued image uploads and their processing status."""
+
+    can_create = False
+    can_edit = False
+    can_delete = True
+
+    list_template = 'admin/image_jobs/list_bs5.html'
+
+    column_list = ('status', 'target_label', 'filename', 'attempts', 'last_error', 'created_at', 'completed_at')
+    column_labels = {'target_label': 'Image For'}
+    column_default_sort = ('created_at', True)
+    column_filters = ('status', 'target_table')
+    column_formatters = {'status': _status_formatter}
+
+    @action('retry', 'Retry', 'Queue the selected jobs again?')
+    def action_retry(self, ids):
+        # Only jobs that still have their original: posted bytes, or a direct upload's staged key
+        jobs = ImageJob.query.filter(
+            ImageJob.id.in_(ids), db.or_(ImageJob.payload.isnot(None), ImageJob.source_s3_key.isnot(None))
+        ).all()
+        for job in jobs:
+            job.status = ImageJobStatus.PENDING
+            job.attempts = 0
+            job.next_attempt_at = utcnow()
+            job.locked_at = None
+        db.session.commit()
+        flash(f'{len(jobs)} image job(s) queued for retry.', 'success')
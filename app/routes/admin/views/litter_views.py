@@ -1,6 +1,5 @@
 # app/routes/admin/views/litter_views.py
 
-from flask import request
 from flask_wtf import FlaskForm
 from wtforms import DateField, SelectField, StringField, TextAreaField
 from wtforms.fields import FileField
@@ -8,7 +7,7 @@ from wtforms.validators import DataRequired, Optional, InputRequired
 
 from .base import AdminModelView
 from app.models import Parent, ParentRole
-from app.utils.image_uploader import upload_image
+from app.utils.share_cards import refresh_share_cards
 
 
 class LitterForm(FlaskForm):
@@ -93,6 +92,18 @@ class LitterAdminView(AdminModelView):
         model.description = (form.description.data or None)
 
         # NEW: Litter cover image upload (similar to Puppy)
-        upload = request.files.get("image_upload")
+        upload = self.image_upload("image_upload")
         if upload and upload.filename:
-            model.main_image_s3_key = upload_image(upload, folder="litters")
\ No newline at end of file
+            self.save_image_upload(
+                model, upload, folder="litters", responsive=True,
+                field_map={
+                    "original": "main_image_s3_key",
+                    "formats": "main_image_formats",
+                    "asset": "main_image_asset",
+                }
+            )
+
+    def after_model_change(self, form, model, is_created):
+        """Re-renders the share cards of the litter and its puppies if what they show changed."""
+        if refresh_share_cards(model) or self.session.dirty:
+            self.session.commit()
@@ -1,8 +1,6 @@
 # app/routes/admin/views/parent_views.py
 
-from flask import request
 from .base import AdminModelView
-from app.utils.image_uploader import upload_image
 from app.routes.admin.forms.parent_forms import ParentForm 
 
 class ParentAdminView(AdminModelView):
@@ -29,20 +27,33 @@ class ParentAdminView(AdminModelView):
     }
 
     def on_model_change(self, form, model, is_created):
-        # Image upload logic remains the same
-        main_file = request.files.get('image_upload')
+        main_file = self.image_upload('image_upload')
         if main_file and main_file.filename:
-            s3_keys = upload_image(main_file, folder='parents', create_responsive_versions=True)
-            if s3_keys:
-                model.main_image_s3_key = s3_keys.get('original')
-                model.main_image_s3_key_large = s3_keys.get('large')
+            self.save_image_upload(
+                model, main_file, folder='parents', responsive=True,
+                field_map={
+                    'original': 'main_image_s3_key',
+                    'small': 'main_image_s3_key_small',
+                    'medium': 'main_image_s3_key_medium',
+                    'large': 'main_image_s3_key_large',
+                    'formats': 'main_image_formats',
+                    'asset': 'main_image_asset',
+                }
+            )
 
         alt_fields = [f'alternate_image_upload_{i}' for i in range(1, 5)]
         alt_model_attrs = [f'alternate_image_s3_key_{i}' for i in range(1, 5)]
+        alt_format_attrs = [f'alternate_image_formats_{i}' for i in range(1, 5)]
+        alt_asset_attrs = [f'alternate_image_asset_{i}' for i in range(1, 5)]
 
         for i, field_name in enumerate(alt_fields):
-            file = request.files.get(field_name)
+            file = self.image_upload(field_name)
             if file and file.filename:
-                key = upload_image(file, folder='parents_alternates')
-                if key:
-                    setattr(model, alt_model_attrs[i], key)
\ No newline at end of file
+                self.save_image_upload(
+                    model, file, folder='parents_alternates',
+                    field_map={
+                        'original': alt_model_attrs[i],
+                        'formats': alt_format_attrs[i],
+                        'asset': alt_asset_attrs[i],
+                    }
+                )
\ No newline at end of file
@@ -7,7 +7,7 @@ from wtforms.validators import InputRequired, DataRequired
 
 from .base import AdminModelView
 from app.models import Puppy, PuppyStatus, Litter, db
-from app.utils.image_uploader import upload_image
+from app.utils.share_cards import refresh_share_card, refresh_share_cards
 
 
 class PuppyForm(FlaskForm):
@@ -79,9 +79,27 @@ class PuppyAdminView(AdminModelView):
         model.status = PuppyStatus[form.status.data]
         model.coat = form.coat.data
 
-        if form.image_upload.data:
-            upload = form.image_upload.data
-            model.main_image_s3_key = upload_image(upload, folder="puppies")
+        upload = self.image_upload("image_upload")
+        if upload:
+            self.save_image_upload(
+                model, upload, folder="puppies", responsive=True,
+                field_map={
+                    "original": "main_image_s3_key",
+                    "formats": "main_image_formats",
+                    "asset": "main_image_asset",
+                }
+            )
 
         db.session.add(model)
         db.session.commit()
+
+    def after_model_change(self, form, model, is_created):
+        """Re-renders the share cards of the puppy and its litter if what they show changed."""
+        if refresh_share_cards(model) or db.session.dirty:
+            db.session.commit()
+
+    def after_model_delete(self, model):
+        """The litter's card counts its available puppies, so it changes too."""
+        litter = db.session.get(Litter, model.litter_id)
+        if litter is not None and (refresh_share_card(litter) or db.session.dirty):
+            db.session.commit()
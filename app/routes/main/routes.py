@@ -58,7 +58,13 @@ def index():
             .all()
         )
 
-    gallery_images = GalleryImage.query.order_by(GalleryImage.sort_order).all()
+    # Skip images whose upload is still queued for processing
+    gallery_images = (
+        GalleryImage.query
+        .filter(GalleryImage.image_s3_key.isnot(None))
+        .order_by(GalleryImage.sort_order)
+        .all()
+    )
     guardian_parents = Parent.query.filter_by(is_guardian=True).all()
 
     most_recent_litter = Litter.query.order_by(Litter.birth_date.desc()).first()
@@ -0,0 +1,7 @@
+from flask import Blueprint
+
+# Serves images kept by the local storage backend (IMAGE_STORAGE=local) and
+# on-demand resizes of stored images (/img/<key>)
+bp = Blueprint('media', __name__)
+
+from . import routes
\ No newline at end of file
@@ -0,0 +1,217 @@
+# app/routes/media/routes.py
+
+from flask import abort, current_app, redirect, request, send_file, send_from_directory
+from app.models import ImageVariant
+from app.routes.media import bp
+from app.utils.direct_uploads import UPLOAD_FOLDER
+from app.utils.image_gc import IMAGE_FOLDERS
+from app.utils.image_uploader import (
+    ALTERNATE_FORMATS, AVIF_QUALITY, FORMAT_TO_CONTENT_TYPE, JPEG_QUALITY, WEBP_QUALITY, format_key,
+    resize_fallback_format, resize_to_width, supported_resize_formats
+)
+from app.utils.resize_cache import get_resize_cache
+from app.utils.share_cards import SHARE_CARD_FOLDER
+from app.utils.storage import LocalStorage, LOCAL_CACHE_MAX_AGE, get_storage
+
+IMMUTABLE_CACHE_CONTROL = f'public, max-age={LOCAL_CACHE_MAX_AGE}, immutable'
+
+# Folders /i/ and /img/ serve from: the images pages show. Staged direct
+# uploads are never meant to be served, and share cards have their own route.
+PUBLIC_IMAGE_FOLDERS = IMAGE_FOLDERS - {UPLOAD_FOLDER, SHARE_CARD_FOLDER}
+
+# Negotiated redirects to pre-signed S3 URLs must expire before the URL does (1 hour)
+NEGOTIATED_REDIRECT_MAX_AGE = 50 * 60
+
+
+def stored_alternates(key):
+    """
+    Alternate formats stored next to `key`, in preference order, e.g. ["avif", "webp"].
+    Not memoized: backfill adds alternates and `flask images gc` removes
+    them, and a cached answer would serve them stale or as a 404.
+    """
+    variant = ImageVariant.query.filter_by(key=key).first()
+    if variant is not None:
+        stored = {v.key for v in variant.asset.variants}
+        return [fmt for fmt in variant.asset.alternate_formats if format_key(key, fmt) in stored]
+
+    # Not recorded on an asset: look for the copies upload_image() would have stored
+    candidates = [fmt.lower() for fmt in ALTERNATE_FORMATS]
+    existing = get_storage().existing(format_key(key, fmt) for fmt in candidates)
+    return [fmt for fmt in candidates if format_key(key, fmt) in existing]
+
+
+def _is_public_image(key):
+    """Whether `key` names an image under PUBLIC_IMAGE_FOLDERS (and does not climb out of it)."""
+    folder, _, rest = key.partition('/')
+    return folder in PUBLIC_IMAGE_FOLDERS and bool(rest) and '..' not in rest.split('/')
+
+
+def _negotiate(formats):
+    """
+    The first of `formats` the request's Accept header names, or None.
+
+    Only explicit image/<format> entries count: browsers that cannot decode
+    WebP or AVIF still send image/* and */*.
+    """
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return next((fmt for fmt in formats if FORMAT_TO_CONTENT_TYPE[fmt.upper()] in accepted), None)
+
+
+@bp.route('/media/<path:key>')
+def serve(key):
+    """
+    Serves a stored image from local storage. Keys are content-addressed,
+    so responses can be cached by browsers and proxies indefinitely.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+
+    response = send_from_directory(storage.root, key, max_age=LOCAL_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+@bp.route('/media/upload', methods=['POST'])
+def direct_upload():
+    """
+    Local storage's counterpart of an S3 presigned POST
+    (LocalStorage.presigned_post()): stores the posted "file" under the
+    signed key. Answers 204 like S3 does.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    policy = storage.verify_post(request.form)
+    if policy is None:
+        abort(403)
+    key, max_bytes = policy
+
+    upload = request.files.get('file')
+    if upload is None:
+        abort(400, description='No file.')
+    upload.stream.seek(0, 2)
+    if not 0 < upload.stream.tell() <= max_bytes:
+        abort(413)
+    upload.stream.seek(0)
+    storage.put(key, upload.stream, upload.mimetype or 'application/octet-stream')
+    return '', 204
+
+
+@bp.route('/i/<path:key>')
+def negotiated(key):
+    """
+    Serves the stored image `key` in the smallest stored format the browser
+    accepts (AVIF, then WebP, then the key's own format), so one URL works
+    for everyone and page HTML does not depend on the browser. Responses
+    carry `Vary: Accept`. Local storage sends the file; S3 redirects to a
+    pre-signed URL of the chosen object. Keys outside PUBLIC_IMAGE_FOLDERS
+    are 404s, so staged uploads cannot be fetched through it.
+    """
+    if not current_app.config.get('IMAGE_FORMAT_NEGOTIATION') or not _is_public_image(key):
+        abort(404)
+
+    fmt = _negotiate(stored_alternates(key))
+    chosen = format_key(key, fmt) if fmt else key
+    response = _send_stored(chosen, FORMAT_TO_CONTENT_TYPE.get(fmt.upper()) if fmt else None)
+    response.vary.add('Accept')
+    return response
+
+
+@bp.route('/og/<path:key>')
+def share_card(key):
+    """
+    Serves a share card (app/utils/share_cards.py) under a URL that does
+    not expire, for og:image tags that crawlers fetch long after the page
+    was rendered.
+    """
+    if not key.startswith(f'{SHARE_CARD_FOLDER}/'):
+        abort(404)
+    return _send_stored(key, 'image/jpeg')
+
+
+def _send_stored(key, mimetype=None):
+    """
+    Response for a stored object: the file itself from local storage
+    (immutable), or a redirect to a pre-signed S3 URL cached for less time
+    than the URL is valid.
+    """
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        response = send_from_directory(storage.root, key, mimetype=mimetype, max_age=LOCAL_CACHE_MAX_AGE)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+    url = storage.url_for(key)
+    if not url:
+        abort(404)
+    response = redirect(url)
+    response.headers['Cache-Control'] = f'public, max-age={NEGOTIATED_REDIRECT_MAX_AGE}'
+    return response
+
+
+@bp.route('/img/<path:key>')
+def resized(key):
+    """
+    Serves the stored image `key` resized to ?w=<width> (one of
+    IMAGE_RESIZE_WIDTHS) and encoded as ?fmt=<format>. Without fmt, the
+    format is negotiated from the Accept header like /i/<key> (among
+    ALTERNATE_FORMATS, falling back to the key's own format, or to PNG or
+    JPEG for a format that cannot be encoded, like GIF). Results are
+    rendered once and then served from the resize cache; the output for a
+    given key, width and format never changes, so it is marked immutable.
+
+    Only keys under PUBLIC_IMAGE_FOLDERS are rendered, so the work anonymous
+    requests can cause is bounded by the site's public images times the
+    allowed widths and formats, each rendered once.
+    """
+    if not current_app.config.get('IMAGE_RESIZE_ON_DEMAND'):
+        abort(404)
+    if not _is_public_image(key):
+        abort(404)
+
+    width = request.args.get('w', type=int)
+    if width not in current_app.config['IMAGE_RESIZE_WIDTHS']:
+        abort(400, description='Unsupported width.')
+
+    formats = supported_resize_formats()
+    source_ext = key.rsplit('.', 1)[-1].lower() if '.' in key else ''
+    default_fmt = 'jpeg' if source_ext in ('jpg', 'jpeg') else source_ext
+    requested_fmt = request.args.get('fmt')
+    if not requested_fmt and current_app.config.get('IMAGE_FORMAT_NEGOTIATION'):
+        requested_fmt = _negotiate([fmt.lower() for fmt in ALTERNATE_FORMATS if fmt.lower() in formats])
+    if requested_fmt:
+        fmt = 'jpeg' if requested_fmt.lower() == 'jpg' else requested_fmt.lower()
+        if fmt not in formats:
+            abort(400, description='Unsupported format.')
+        candidates = [fmt]
+    elif default_fmt in formats:
+        candidates = [default_fmt]
+    else:
+        # The key's own format (e.g. GIF) cannot be encoded: whichever of
+        # these was rendered before, or resize_fallback_format() of the source
+        candidates = ['png', 'jpeg']
+
+    cache = get_resize_cache()
+    quality = f"q{JPEG_QUALITY},{WEBP_QUALITY},{AVIF_QUALITY}"
+    for fmt in candidates:
+        path = cache.get(cache.name_for(key, width, fmt, quality, formats[fmt]))
+        if path is not None:
+            break
+    else:
+        data = get_storage().get(key)
+        if data is None:
+            abort(404)
+        try:
+            if len(candidates) > 1:
+                fmt = resize_fallback_format(data)
+            rendered = resize_to_width(data, width, fmt)
+        except Exception as e:
+            print(f"Error resizing {key} to {width}px: {e}")
+            abort(404)
+        path = cache.put(cache.name_for(key, width, fmt, quality, formats[fmt]), rendered)
+
+    response = send_file(path, mimetype=FORMAT_TO_CONTENT_TYPE[fmt.upper()], max_age=LOCAL_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    if not request.args.get('fmt'):
+        response.vary.add('Accept')
+    return response
@@ -0,0 +1,271 @@
+// app/static/js/previews/image_uploads.js
+
+/**
+ * Submit-time handling of admin image uploads. The server marks the file
+ * inputs that need it, and every step is skipped for inputs it did not mark.
+ *
+ * data-client-resize="<long edge>" (IMAGE_CLIENT_RESIZE): photos bigger than
+ * the largest size the server stores for that upload are resized in the
+ * browser and re-encoded. JPEG stays JPEG, PNG stays PNG and WebP stays WebP,
+ * so a multi-MB phone photo goes up as a few hundred KB. EXIF orientation is
+ * applied while drawing, so the re-encoded pixels are already upright. The
+ * name of each resized input is posted as "client_resized", and the server
+ * checks those uploads before storing them.
+ *
+ * data-direct-upload="<url>" (IMAGE_DIRECT_UPLOADS): the file is sent
+ * straight to storage through a presigned POST issued by <url>. The form
+ * then submits only the token for the staged key, as
+ * "direct_upload_<input name>", instead of the bytes.
+ *
+ * data-chunked-upload="<url>" (IMAGE_CHUNKED_UPLOADS): the file is sent to
+ * <url> in fixed-size chunks, each retried with backoff on its own. The
+ * upload id is kept in sessionStorage, so after a failure, or a reload of the
+ * page, the next submit resumes from the last chunk the server acknowledged.
+ * The form then submits only "chunked_upload_<input name>". Inputs marked for
+ * a direct upload use it first.
+ *
+ * Anything the browser cannot resize or upload ahead of the form is posted
+ * with the form as before.
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    const RESIZED_TYPES = ['image/jpeg', 'image/png', 'image/webp'];
+    const QUALITY = 0.92;
+    const CHUNK_RETRIES = 5;
+    const CHUNK_RETRY_DELAY_MS = 1000;
+
+    /**
+     * Draws an image onto a new canvas of the given size.
+     * @param {CanvasImageSource} source - The image or canvas to draw.
+     * @param {number} width - The canvas width.
+     * @param {number} height - The canvas height.
+     * @returns {HTMLCanvasElement} The canvas.
+     */
+    const drawScaled = (source, width, height) => {
+        const canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const context = canvas.getContext('2d');
+        context.imageSmoothingQuality = 'high';
+        context.drawImage(source, 0, 0, width, height);
+        return canvas;
+    };
+
+    /**
+     * Resizes a photo to fit maxEdge and re-encodes it.
+     * @param {File} file - The selected file.
+     * @param {number} maxEdge - The longest edge allowed.
+     * @returns {Promise<File|null>} The smaller file, or null to send the original.
+     */
+    const resizeFile = async (file, maxEdge) => {
+        if (!RESIZED_TYPES.includes(file.type) || !window.createImageBitmap) {
+            return null;
+        }
+        // 'from-image' applies the EXIF orientation before the pixels are drawn
+        const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+        const scale = maxEdge / Math.max(bitmap.width, bitmap.height);
+        if (scale >= 1) {
+            bitmap.close();
+            return null;
+        }
+
+        // Halve at most once per step: a single large reduction drops detail in most browsers
+        const width = Math.round(bitmap.width * scale);
+        const height = Math.round(bitmap.height * scale);
+        let source = bitmap;
+        while (source.width / 2 > width) {
+            source = drawScaled(source, Math.round(source.width / 2), Math.round(source.height / 2));
+        }
+        const canvas = drawScaled(source, width, height);
+        bitmap.close();
+
+        const blob = await new Promise((resolve) => canvas.toBlob(resolve, file.type, QUALITY));
+        // Browsers that cannot encode the type fall back to PNG, which is rarely smaller
+        if (!blob || blob.type !== file.type || blob.size >= file.size) {
+            return null;
+        }
+        return new File([blob], file.name, { type: blob.type, lastModified: file.lastModified });
+    };
+
+    /**
+     * Sends a file straight to storage through a presigned POST.
+     * @param {string} presignUrl - The endpoint that issues the presigned POST.
+     * @param {File} file - The file to upload.
+     * @returns {Promise<string>} The token the form submits in place of the file.
+     */
+    const uploadDirect = async (presignUrl, file) => {
+        const presign = await fetch(presignUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name }),
+        });
+        if (!presign.ok) {
+            throw new Error(`presign failed with ${presign.status}`);
+        }
+        const { url, fields, token } = await presign.json();
+
+        const body = new FormData();
+        Object.entries(fields).forEach(([name, value]) => body.append(name, value));
+        // S3 ignores every field after the file, so it goes last
+        body.append('file', file);
+        const stored = await fetch(url, { method: 'POST', body: body });
+        if (!stored.ok) {
+            throw new Error(`upload failed with ${stored.status}`);
+        }
+        return token;
+    };
+
+    /**
+     * Sends a file in resumable chunks.
+     * @param {string} endpoint - The endpoint that opens chunked uploads.
+     * @param {File} file - The file to upload.
+     * @returns {Promise<string>} The upload id the form submits in place of the file.
+     */
+    const uploadChunked = async (endpoint, file) => {
+        const resumeKey = `chunked-upload:${endpoint}:${file.name}:${file.size}:${file.lastModified}`;
+        let status = null;
+        const resumeId = sessionStorage.getItem(resumeKey);
+        if (resumeId) {
+            const known = await fetch(`${endpoint}/${resumeId}`, { credentials: 'same-origin' });
+            if (known.ok) {
+                status = await known.json();
+            }
+        }
+        if (!status) {
+            const opened = await fetch(endpoint, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size }),
+            });
+            if (!opened.ok) {
+                throw new Error(`opening the upload failed with ${opened.status}`);
+            }
+            status = await opened.json();
+            sessionStorage.setItem(resumeKey, status.upload_id);
+        }
+
+        const chunkSize = status.chunk_size;
+        const total = Math.max(1, Math.ceil(file.size / chunkSize));
+        let received = status.received;
+        let failures = 0;
+        while (received < total) {
+            const start = received * chunkSize;
+            let response = null;
+            try {
+                response = await fetch(`${endpoint}/${status.upload_id}/${received}`, {
+                    method: 'PUT',
+                    credentials: 'same-origin',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: file.slice(start, start + chunkSize),
+                });
+            } catch (error) {
+                // Network failure: retried below
+            }
+            if (response && (response.ok || response.status === 409)) {
+                // 409 means the server holds a different number of chunks: carry on from there
+                const acknowledged = (await response.json()).received;
+                if (response.status === 409 && acknowledged === received) {
+                    throw new Error(`chunk ${received} was refused`);
+                }
+                received = acknowledged;
+                failures = 0;
+                continue;
+            }
+            if (response && response.status < 500) {
+                throw new Error(`chunk ${received} failed with ${response.status}`);
+            }
+            failures += 1;
+            if (failures > CHUNK_RETRIES) {
+                throw new Error(`chunk ${received} failed ${failures} times`);
+            }
+            await new Promise((resolve) => setTimeout(resolve, CHUNK_RETRY_DELAY_MS * 2 ** (failures - 1)));
+        }
+        sessionStorage.removeItem(resumeKey);
+        return status.upload_id;
+    };
+
+    /**
+     * Adds a hidden field to a form.
+     * @param {HTMLFormElement} form - The admin form.
+     * @param {string} name - The field name.
+     * @param {string} value - The field value.
+     */
+    const addHiddenField = (form, name, value) => {
+        const field = document.createElement('input');
+        field.type = 'hidden';
+        field.name = name;
+        field.value = value;
+        form.appendChild(field);
+    };
+
+    /**
+     * Resizes and/or uploads the marked file inputs of a form before it is posted.
+     * @param {HTMLFormElement} form - The admin form.
+     */
+    const handleFormUploads = (form) => {
+        const inputs = form.querySelectorAll('input[type="file"][data-client-resize], input[type="file"][data-direct-upload], input[type="file"][data-chunked-upload]');
+        if (!inputs.length) {
+            return;
+        }
+
+        let resized = false;
+        form.addEventListener('submit', async (event) => {
+            if (resized) {
+                return;
+            }
+            event.preventDefault();
+
+            for (const input of inputs) {
+                let file = input.files && input.files[0];
+                if (!file) {
+                    continue;
+                }
+                if (input.dataset.clientResize) {
+                    try {
+                        const smaller = await resizeFile(file, Number(input.dataset.clientResize));
+                        if (smaller) {
+                            const transfer = new DataTransfer();
+                            transfer.items.add(smaller);
+                            input.files = transfer.files;
+                            file = smaller;
+                            addHiddenField(form, 'client_resized', input.name);
+                        }
+                    } catch (error) {
+                        console.warn(`Sending ${file.name} without resizing it:`, error);
+                    }
+                }
+                if (input.dataset.directUpload) {
+                    try {
+                        const token = await uploadDirect(input.dataset.directUpload, file);
+                        addHiddenField(form, `direct_upload_${input.name}`, token);
+                        // The bytes are in storage already; post the form without them
+                        input.value = '';
+                        continue;
+                    } catch (error) {
+                        console.warn(`Could not send ${file.name} straight to storage:`, error);
+                    }
+                }
+                if (input.dataset.chunkedUpload) {
+                    try {
+                        const uploadId = await uploadChunked(input.dataset.chunkedUpload, file);
+                        addHiddenField(form, `chunked_upload_${input.name}`, uploadId);
+                        input.value = '';
+                        continue;
+                    } catch (error) {
+                        console.warn(`Could not send ${file.name} in chunks:`, error);
+                    }
+                }
+                if (input.dataset.directUpload || input.dataset.chunkedUpload) {
+                    console.warn(`Posting ${file.name} with the form instead.`);
+                }
+            }
+
+            // Submit again through the same button, so "Save and Continue" etc. still apply
+            resized = true;
+            form.requestSubmit(event.submitter);
+        });
+    };
+
+    document.querySelectorAll('form').forEach(handleFormUploads);
+});
@@ -0,0 +1,82 @@
+# app/utils/cache_stats.py
+"""
+Hit/miss counters for memoized lookups, such as the presigned URLs behind
+the `s3_url` filter.
+
+Each worker process counts locally and adds its counts to the app cache
+every FLUSH_EVERY lookups, so a cache shared by the workers (CACHE_TYPE
+FileSystemCache) ends up holding the totals for the whole host, and
+`flask images cache-stats` can read them from another process. The shared
+totals lag each worker by fewer than FLUSH_EVERY lookups, and two workers
+flushing at the same moment may lose a few counts, which is fine for
+confirming a hit rate.
+"""
+
+import threading
+
+from flask import current_app
+
+FLUSH_EVERY = 100
+
+
+class CacheCounters:
+    """Lookups and misses of the memoized function `name`; hits are the difference."""
+
+    def __init__(self, name, flush_every=FLUSH_EVERY):
+        self.name = name
+        self.flush_every = flush_every
+        self._pending = {'lookups': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _key(self, counter):
+        return f'cache_stats:{self.name}:{counter}'
+
+    def _count(self, counter):
+        with self._lock:
+            self._pending[counter] += 1
+            if self._pending['lookups'] < self.flush_every:
+                return
+            pending, self._pending = self._pending, {'lookups': 0, 'misses': 0}
+        self._add(pending)
+
+    def lookup(self):
+        """Counts a call of the memoized function."""
+        self._count('lookups')
+
+    def miss(self):
+        """Counts a call that was not in the cache, from inside the function body."""
+        self._count('misses')
+
+    def flush(self):
+        """Adds this process's pending counts to the shared totals."""
+        with self._lock:
+            pending, self._pending = self._pending, {'lookups': 0, 'misses': 0}
+        self._add(pending)
+
+    def _add(self, pending):
+        from app import cache
+
+        for counter, value in pending.items():
+            if value:
+                # Not the backend's inc(), which would expire after CACHE_DEFAULT_TIMEOUT
+                cache.set(self._key(counter), (cache.get(self._key(counter)) or 0) + value, timeout=0)
+
+    def totals(self):
+        """{'lookups', 'hits', 'misses'} summed over every process sharing the cache."""
+        from app import cache
+
+        lookups = cache.get(self._key('lookups')) or 0
+        misses = cache.get(self._key('misses')) or 0
+        return {'lookups': lookups, 'hits': max(lookups - misses, 0), 'misses': misses}
+
+    def reset(self):
+        """Clears the shared totals and this process's pending counts."""
+        from app import cache
+
+        with self._lock:
+            self._pending = {'lookups': 0, 'misses': 0}
+        cache.delete_many(self._key('lookups'), self._key('misses'))
+
+
+def get_presigned_url_counters():
+    return current_app.extensions['presigned_url_counters']
@@ -0,0 +1,259 @@
+# app/utils/chunked_uploads.py
+"""
+Resumable chunked uploads from the admin forms (IMAGE_CHUNKED_UPLOADS).
+
+The browser opens an upload at `/admin/chunked-upload` with the file's name
+and size, and gets back an upload id and the chunk size. It then PUTs the
+file in order, one fixed-size chunk per request, to
+`/admin/chunked-upload/<id>/<index>`. Every response says how many chunks
+the server holds, so after a dropped connection the browser asks for the
+upload's status and carries on from the last acknowledged chunk instead of
+starting over. The form then submits only the upload id, as
+"chunked_upload_<input name>", and the admin save feeds the assembled file
+to the usual pipeline (upload_image(), or a queued image job).
+
+Chunks of one upload may reach different worker processes, so they are
+assembled in a part file on disk, `<CHUNKED_UPLOAD_PATH>/<id>/data`, next to
+the upload's `meta.json`. Writes are serialized with a file lock. An upload
+is deleted once it has been processed, and ones left unfinished for
+CHUNKED_UPLOAD_MAX_AGE are swept when the next upload starts.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from app.utils.image_uploader import IMAGE_MAX_UPLOAD_BYTES
+
+# Size of every chunk but the last
+UPLOAD_CHUNK_BYTES = int(float(os.environ.get('IMAGE_UPLOAD_CHUNK_MB') or 1) * 1024 * 1024)
+
+# Unfinished uploads older than this are deleted
+CHUNKED_UPLOAD_MAX_AGE = 24 * 60 * 60
+
+# Form field with the id of a file input's chunked upload: "chunked_upload_<input name>"
+CHUNKED_UPLOAD_FIELD_PREFIX = 'chunked_upload_'
+
+_UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
+# Stands in for a file lock where the platform has none; only serializes this process's threads
+_process_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(f):
+    """
+    Holds an exclusive lock on the open file `f`: flock() on POSIX, a byte
+    lock through msvcrt on Windows, or a process-wide lock elsewhere. The
+    platform modules are imported here so the app starts without them.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return
+
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+    if msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+
+    with _process_lock:
+        yield
+
+
+class ChunkError(ValueError):
+    """A chunk that does not fit the upload. `received` is the number of chunks held."""
+
+    def __init__(self, message, received):
+        super().__init__(message)
+        self.received = received
+
+
+class ChunkedUploads:
+    """Uploads under `root` being assembled from chunks of `chunk_size` bytes."""
+
+    def __init__(self, root, chunk_size=UPLOAD_CHUNK_BYTES):
+        self.root = os.path.abspath(root)
+        self.chunk_size = chunk_size
+
+    def _dir(self, upload_id):
+        """The upload's directory. Raises KeyError for an unknown upload."""
+        if not isinstance(upload_id, str) or not _UPLOAD_ID.fullmatch(upload_id):
+            raise KeyError(upload_id)
+        path = os.path.join(self.root, upload_id)
+        if not os.path.isfile(os.path.join(path, 'meta.json')):
+            raise KeyError(upload_id)
+        return path
+
+    def _meta(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+
+    def _chunks(self, meta):
+        return max(1, -(-meta['size'] // meta['chunk_size']))
+
+    def _received(self, meta, held):
+        """Chunks in a part file of `held` bytes. A partly written chunk does not count."""
+        if held >= meta['size']:
+            return self._chunks(meta)
+        return held // meta['chunk_size']
+
+    def create(self, filename, size):
+        """
+        Opens an upload of `size` bytes and returns its status. Uploads are
+        capped at the largest IMAGE_MAX_UPLOAD_MB; the folder's own limit is
+        applied when the assembled file is processed. Raises ValueError for
+        an empty or oversized file.
+        """
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError('The upload is empty.')
+        if size > max(IMAGE_MAX_UPLOAD_BYTES.values()):
+            raise ValueError('The upload is too large.')
+        self.sweep()
+
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.root, upload_id)
+        os.makedirs(path)
+        open(os.path.join(path, 'data'), 'wb').close()
+        meta = {'filename': secure_filename(filename or '') or 'upload', 'size': size, 'chunk_size': self.chunk_size}
+        # meta.json appears last: until it exists the upload is unknown
+        tmp = os.path.join(path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """{upload_id, filename, size, chunk_size, received}. Raises KeyError for an unknown upload."""
+        path = self._dir(upload_id)
+        meta = self._meta(path)
+        held = os.path.getsize(os.path.join(path, 'data'))
+        return {'upload_id': upload_id, **meta, 'received': self._received(meta, held)}
+
+    def append(self, upload_id, index, data):
+        """
+        Stores chunk `index` and returns the number of chunks now held.
+
+        A chunk the server already holds is acknowledged without being
+        written again, so retrying a request whose response was lost is
+        harmless. A chunk past the next one expected, or of the wrong length,
+        raises ChunkError.
+        """
+        path = self._dir(upload_id)
+        meta = self._meta(path)
+        chunk_size, total = meta['chunk_size'], self._chunks(meta)
+
+        with open(os.path.join(path, 'data'), 'r+b') as f, _locked(f):
+            received = self._received(meta, os.fstat(f.fileno()).st_size)
+            if index < received:
+                return received
+            if index > received or index >= total:
+                raise ChunkError(f'Expected chunk {received}, got {index}.', received)
+            expected = min(chunk_size, meta['size'] - index * chunk_size)
+            if len(data) != expected:
+                raise ChunkError(f'Chunk {index} must be {expected} bytes, got {len(data)}.', received)
+
+            # Drop the tail of a chunk whose write was interrupted
+            f.truncate(index * chunk_size)
+            f.seek(index * chunk_size)
+            f.write(data)
+            f.flush()
+            return index + 1
+
+    def open(self, upload_id, name):
+        """The assembled file as a FileStorage, or None if the upload is unknown or unfinished."""
+        try:
+            status = self.status(upload_id)
+        except KeyError:
+            return None
+        if status['received'] < self._chunks(status):
+            return None
+        stream = open(os.path.join(self.root, upload_id, 'data'), 'rb')
+        return FileStorage(stream=stream, filename=status['filename'], name=name)
+
+    def discard(self, upload_id):
+        """Deletes an upload once it has been processed."""
+        try:
+            shutil.rmtree(self._dir(upload_id))
+        except (KeyError, FileNotFoundError):
+            pass
+
+    def sweep(self):
+        """Deletes uploads that have not received a chunk for CHUNKED_UPLOAD_MAX_AGE."""
+        cutoff = time.time() - CHUNKED_UPLOAD_MAX_AGE
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not (entry.is_dir() and _UPLOAD_ID.fullmatch(entry.name)):
+                continue
+            try:
+                touched = os.path.getmtime(os.path.join(entry.path, 'data'))
+            except FileNotFoundError:
+                touched = entry.stat().st_mtime
+            if touched < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class ChunkedUpload:
+    """A file input's finished chunked upload, in place of the FileStorage the admin views otherwise get."""
+
+    def __init__(self, name, upload_id, filename):
+        self.name = name
+        self.upload_id = upload_id
+        self.filename = filename
+
+    def open(self):
+        """The assembled file as a FileStorage, or None if the upload never finished."""
+        return get_chunked_uploads().open(self.upload_id, self.name)
+
+    def discard(self):
+        """Deletes the assembled file once it has been processed."""
+        get_chunked_uploads().discard(self.upload_id)
+
+
+def chunked_upload(form, name):
+    """The ChunkedUpload `form` submitted for file input `name`, or None if it has none."""
+    upload_id = form.get(CHUNKED_UPLOAD_FIELD_PREFIX + name)
+    if not upload_id:
+        return None
+    try:
+        status = get_chunked_uploads().status(upload_id)
+    except KeyError:
+        return None
+    return ChunkedUpload(name, upload_id, status['filename'])
+
+
+def init_chunked_uploads(app):
+    """Creates the app's chunked upload store from its config."""
+    app.extensions['chunked_uploads'] = ChunkedUploads(app.config['CHUNKED_UPLOAD_PATH'])
+
+
+def get_chunked_uploads():
+    return current_app.extensions['chunked_uploads']
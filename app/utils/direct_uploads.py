@@ -0,0 +1,90 @@
+# app/utils/direct_uploads.py
+"""
+Direct-to-storage uploads from the admin forms (IMAGE_DIRECT_UPLOADS).
+
+Instead of posting image bytes with the form, the browser asks
+`/admin/direct-upload` for a presigned POST (Storage.presigned_post()) and
+sends the file straight to storage under a staging key,
+`uploads/<random>.<ext>`. The form then submits only a signed token that
+names that key. The admin save queues an image job that reads the staged
+original back from storage. With background jobs off, the save processes it
+inline from storage. Either way, no Flask worker holds the request open
+while the bytes transfer.
+
+A staged object is deleted once it has been processed. Abandoned ones are
+left for `flask images gc`.
+"""
+
+import io
+import os
+import uuid
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from app.utils.image_uploader import IMAGE_MAX_UPLOAD_BYTES
+from app.utils.storage import get_storage
+
+UPLOAD_FOLDER = 'uploads'
+
+# Form field with the token of a file input's direct upload: "direct_upload_<input name>"
+DIRECT_UPLOAD_FIELD_PREFIX = 'direct_upload_'
+
+# How long a presigned POST, and the token issued with it, stay valid
+DIRECT_UPLOAD_EXPIRATION = 60 * 60
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='direct-upload')
+
+
+def presign_upload(filename):
+    """
+    Reserves a staging key for `filename` and returns {url, fields, token}:
+    the presigned POST the browser sends the file with, and the token the
+    form submits in its place. Uploads are capped at the largest
+    IMAGE_MAX_UPLOAD_MB; the folder's own limit is applied when the staged
+    original is processed.
+    """
+    filename = secure_filename(filename or '') or 'upload'
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    key = f"{UPLOAD_FOLDER}/{uuid.uuid4().hex}{ext}"
+    post = get_storage().presigned_post(key, max(IMAGE_MAX_UPLOAD_BYTES.values()), DIRECT_UPLOAD_EXPIRATION)
+    return {**post, 'token': _serializer().dumps([key, filename])}
+
+
+class StagedUpload:
+    """A file input's direct upload, in place of the FileStorage the admin views otherwise get."""
+
+    def __init__(self, name, key, filename):
+        self.name = name
+        self.key = key
+        self.filename = filename
+
+    def open(self):
+        """The staged original as a FileStorage, or None if it never arrived."""
+        data = get_storage().get(self.key)
+        if data is None:
+            return None
+        return FileStorage(stream=io.BytesIO(data), filename=self.filename, name=self.name)
+
+    def discard(self):
+        """Deletes the staged original once it has been processed."""
+        get_storage().delete_many([self.key])
+
+
+def staged_upload(form, name):
+    """
+    The StagedUpload `form` submitted for file input `name`, or None if it
+    has none, or if its token is forged or expired.
+    """
+    token = form.get(DIRECT_UPLOAD_FIELD_PREFIX + name)
+    if not token:
+        return None
+    try:
+        key, filename = _serializer().loads(token, max_age=DIRECT_UPLOAD_EXPIRATION)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return StagedUpload(name, key, filename)
@@ -0,0 +1,366 @@
+# app/utils/image_backfill.py
+"""
+Backfill of responsive sizes for images stored before they were generated
+(`flask images backfill`).
+
+Every image slot in BACKFILL_SLOTS is scanned for rows whose original has
+no asset yet, whose asset lacks one of the folder's responsive sizes, or
+whose per-size key columns are empty. The missing sizes are rendered from
+the stored original on a small thread pool, and the rows are updated in
+batches. The original itself is left untouched. Sizes that already exist
+in storage are reused rather than uploaded again, so an interrupted
+backfill can simply be run again.
+
+measure_variants() (`flask images measure`) fills in the width, height and
+byte size of variants recorded before they were measured at upload, and
+hash_assets() (`flask images hash`) the perceptual hash of assets stored
+before uploads were hashed.
+"""
+
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, AboutSection, GalleryImage, HeroSection, ImageAsset, ImageVariant, Litter, Parent, Puppy
+from app.utils.image_jobs import apply_image_keys
+from app.utils.image_uploader import (
+    RESPONSIVE_SIZES_BASE, RESPONSIVE_SIZES_HERO, describe_image, hash_upload, upload_image,
+)
+from app.utils.storage import get_storage
+
+# (storage folder, model, field_map) for every image slot. Folders match the
+# admin uploads so backfilled sizes get the same keys a fresh upload would.
+# "formats" is left out: the row's formats describe its original, which a
+# backfill does not re-encode.
+BACKFILL_SLOTS = [
+    ('parents', Parent, {
+        'original': 'main_image_s3_key',
+        'small': 'main_image_s3_key_small',
+        'medium': 'main_image_s3_key_medium',
+        'large': 'main_image_s3_key_large',
+        'asset': 'main_image_asset',
+    }),
+    *[
+        ('parents_alternates', Parent,
+         {'original': f'alternate_image_s3_key_{i}', 'asset': f'alternate_image_asset_{i}'})
+        for i in range(1, 5)
+    ],
+    *[
+        (folder, model, {
+            'original': 'image_s3_key',
+            'small': 'image_s3_key_small',
+            'medium': 'image_s3_key_medium',
+            'large': 'image_s3_key_large',
+            'asset': 'image_asset',
+        })
+        for folder, model in (('hero', HeroSection), ('about', AboutSection))
+    ],
+    ('gallery', GalleryImage, {'original': 'image_s3_key', 'asset': 'image_asset'}),
+    ('puppies', Puppy, {'original': 'main_image_s3_key', 'asset': 'main_image_asset'}),
+    ('litters', Litter, {'original': 'main_image_s3_key', 'asset': 'main_image_asset'}),
+]
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1 / per_second seconds apart (no limit if falsy)."""
+
+    def __init__(self, per_second=None):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def _throttled(app, func, jobs, workers, rate):
+    """
+    Runs func(app, *job) for every job on `workers` threads, starting at
+    most `rate` per second, and yields (job, result, error) as they finish.
+    Only `workers` jobs are queued at a time, so the rate limit holds.
+    """
+    limiter = RateLimiter(rate)
+    jobs = iter(jobs)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-backfill') as pool:
+
+        def submit_next():
+            job = next(jobs, None)
+            if job is not None:
+                limiter.wait()
+                in_flight[pool.submit(func, app, *job)] = job
+
+        for _ in range(workers):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                error = future.exception()
+                yield job, None if error else future.result(), error
+                submit_next()
+
+
+def missing_sizes(row, folder, field_map):
+    """Responsive sizes `row`'s image lacks in the given slot, in size order."""
+    sizes = RESPONSIVE_SIZES_HERO if folder == 'hero' else RESPONSIVE_SIZES_BASE
+    asset = getattr(row, field_map['asset'])
+    stored = set()
+    if asset is not None:
+        stored = {variant.name for variant in asset.variants if variant.format == asset.source_format}
+
+    missing = []
+    for name in sizes:
+        column = field_map.get(name)
+        if name not in stored or (column and not getattr(row, column)):
+            missing.append(name)
+    return missing
+
+
+def find_missing_variants(folders=None):
+    """
+    Scans every image slot (optionally only those in `folders`) and returns
+    one entry per row and slot that needs a backfill: a dict with model,
+    row_id, folder, field_map, original and missing (size names).
+    """
+    entries = []
+    for folder, model, field_map in BACKFILL_SLOTS:
+        if folders and folder not in folders:
+            continue
+        original_column = getattr(model, field_map['original'])
+        for row in model.query.filter(original_column.isnot(None), original_column != '').order_by(model.id):
+            missing = missing_sizes(row, folder, field_map)
+            if missing:
+                entries.append({
+                    'model': model,
+                    'row_id': row.id,
+                    'folder': folder,
+                    'field_map': field_map,
+                    'original': getattr(row, field_map['original']),
+                    'missing': missing,
+                })
+    return entries
+
+
+def _render_missing(app, original, folder):
+    """Renders the responsive sizes of a stored original on a pool thread. Returns (keys, variants)."""
+    variants = {}
+    with app.app_context():
+        data = get_storage().get(original)
+        if data is None:
+            print(f"Original not found in storage: {original}")
+            return None, {}
+        upload = FileStorage(stream=io.BytesIO(data), filename=os.path.basename(original))
+        keys = upload_image(
+            upload, folder=folder, create_responsive_versions=True, variants=variants, include_original=False
+        )
+    return keys, variants
+
+
+def _apply_batch(batch, summary):
+    """Writes one batch of rendered sizes onto their rows and commits."""
+    for entries, keys, variants in batch:
+        for entry in entries:
+            row = db.session.get(entry['model'], entry['row_id'])
+            # The image may have been replaced since the scan
+            if row is None or getattr(row, entry['field_map']['original']) != entry['original']:
+                continue
+            if apply_image_keys(row, {**keys, 'original': entry['original']}, entry['field_map'], variants):
+                summary['updated'] += 1
+    db.session.commit()
+
+
+def backfill_variants(folders=None, workers=2, batch_size=50, rate=None, dry_run=False, log=print):
+    """
+    Generates the missing responsive sizes for every slot found by
+    find_missing_variants().
+
+    At most `workers` images are rendered at once, and no more than `rate`
+    are started per second, so a backfill can share a host with the web
+    workers. Rows sharing an original in the same folder are rendered once.
+    With dry_run nothing is rendered or written. Must run inside an app
+    context. Returns a summary dict: rows (needing a backfill), images
+    (distinct originals), updated, failed, variants_stored, bytes_stored
+    and seconds.
+    """
+    started = time.perf_counter()
+    entries = find_missing_variants(folders)
+
+    jobs = {}  # (original, folder) -> entries
+    for entry in entries:
+        jobs.setdefault((entry['original'], entry['folder']), []).append(entry)
+
+    summary = {
+        'rows': len(entries), 'images': len(jobs), 'updated': 0, 'failed': 0,
+        'variants_stored': 0, 'bytes_stored': 0, 'seconds': 0.0,
+    }
+    if dry_run:
+        for entry in entries:
+            log(f"{entry['model'].__tablename__} #{entry['row_id']} ({entry['field_map']['original']}): "
+                f"missing {', '.join(entry['missing'])}")
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+
+    app = current_app._get_current_object()
+    batch = []
+    batch_rows = 0
+    try:
+        for job, result, error in _throttled(app, _render_missing, jobs, workers, rate):
+            if error is not None:
+                print(f"Error backfilling {job[0]}: {error}")
+            keys, variants = result or (None, {})
+            if not keys:
+                summary['failed'] += len(jobs[job])
+                log(f"Failed: {job[0]}")
+            else:
+                summary['variants_stored'] += len(variants)
+                summary['bytes_stored'] += sum(info['bytes'] for info in variants.values())
+                batch.append((jobs[job], keys, variants))
+                batch_rows += len(jobs[job])
+            if batch_rows >= batch_size:
+                _apply_batch(batch, summary)
+                log(f"Updated {summary['updated']} / {len(entries)}")
+                batch, batch_rows = [], 0
+    except KeyboardInterrupt:
+        # Keep what finished; a re-run picks up the rest
+        if batch:
+            _apply_batch(batch, summary)
+        raise
+
+    if batch:
+        _apply_batch(batch, summary)
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def _measure(app, key):
+    """Width, height and bytes of a stored object (see describe_image()), or None if it is missing."""
+    with app.app_context():
+        data = get_storage().get(key)
+    return describe_image(io.BytesIO(data)) if data is not None else None
+
+
+def _save_measurements(batch, summary):
+    """Writes one batch of {variant id: {width, height, bytes}} and commits."""
+    for variant_id, info in batch.items():
+        variant = db.session.get(ImageVariant, variant_id)
+        if variant is not None:
+            for field, value in info.items():
+                setattr(variant, field, value)
+            summary['measured'] += 1
+    db.session.commit()
+    batch.clear()
+
+
+def measure_variants(workers=4, batch_size=200, rate=None, dry_run=False, log=print):
+    """
+    Records width, height and bytes on every ImageVariant missing them
+    (e.g. rows the asset migration created from the old key columns) by
+    reading the object from storage. Throttled like backfill_variants().
+    Must run inside an app context. Returns a summary dict: variants
+    (unmeasured), measured, failed and seconds.
+    """
+    started = time.perf_counter()
+    unmeasured = db.or_(ImageVariant.width.is_(None), ImageVariant.height.is_(None), ImageVariant.bytes.is_(None))
+    pending = dict(db.session.query(ImageVariant.key, ImageVariant.id).filter(unmeasured).order_by(ImageVariant.id))
+
+    summary = {'variants': len(pending), 'measured': 0, 'failed': 0, 'seconds': 0.0}
+    if dry_run:
+        for key in pending:
+            log(f"Unmeasured: {key}")
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+
+    app = current_app._get_current_object()
+    batch = {}
+    try:
+        for (key,), info, error in _throttled(app, _measure, [(key,) for key in pending], workers, rate):
+            if error is not None:
+                print(f"Error measuring {key}: {error}")
+            if info is None:
+                summary['failed'] += 1
+                log(f"Failed: {key}")
+            else:
+                batch[pending[key]] = info
+            if len(batch) >= batch_size:
+                _save_measurements(batch, summary)
+                log(f"Measured {summary['measured']} / {len(pending)}")
+    except KeyboardInterrupt:
+        _save_measurements(batch, summary)
+        raise
+
+    _save_measurements(batch, summary)
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def _hash(app, key):
+    """perceptual_hash() of a stored object, or None if it is missing or unreadable."""
+    with app.app_context():
+        data = get_storage().get(key)
+    return hash_upload(io.BytesIO(data)) if data is not None else None
+
+
+def _save_hashes(batch, summary):
+    """Writes one batch of {asset id: dhash} and commits."""
+    for asset_id, dhash in batch.items():
+        asset = db.session.get(ImageAsset, asset_id)
+        if asset is not None:
+            asset.dhash = dhash
+            summary['hashed'] += 1
+    db.session.commit()
+    batch.clear()
+
+
+def hash_assets(workers=4, batch_size=200, rate=None, dry_run=False, log=print):
+    """
+    Records the perceptual hash of every ImageAsset without one by reading
+    its original from storage, so older images take part in near-duplicate
+    detection. Throttled like backfill_variants(). Must run inside an app
+    context. Returns a summary dict: assets (unhashed), hashed, failed and
+    seconds.
+    """
+    started = time.perf_counter()
+    pending = {}  # original key -> asset id
+    for asset in ImageAsset.query.filter(ImageAsset.dhash.is_(None)).order_by(ImageAsset.id):
+        if asset.original is not None:
+            pending[asset.original.key] = asset.id
+
+    summary = {'assets': len(pending), 'hashed': 0, 'failed': 0, 'seconds': 0.0}
+    if dry_run:
+        for key in pending:
+            log(f"Unhashed: {key}")
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+
+    app = current_app._get_current_object()
+    batch = {}
+    try:
+        for (key,), dhash, error in _throttled(app, _hash, [(key,) for key in pending], workers, rate):
+            if error is not None:
+                print(f"Error hashing {key}: {error}")
+            if dhash is None:
+                summary['failed'] += 1
+                log(f"Failed: {key}")
+            else:
+                batch[pending[key]] = dhash
+            if len(batch) >= batch_size:
+                _save_hashes(batch, summary)
+                log(f"Hashed {summary['hashed']} / {len(pending)}")
+    except KeyboardInterrupt:
+        _save_hashes(batch, summary)
+        raise
+
+    _save_hashes(batch, summary)
+    summary['seconds'] = time.perf_counter() - started
+    return summary
@@ -0,0 +1,153 @@
+# app/utils/image_gc.py
+"""
+Garbage collection of stored image objects that no row refers to any more
+(`flask images gc`).
+
+Replacing an image only rewrites the row's key columns, so the objects of
+the old image stay in storage forever. The collector builds the set of key
+stems (key minus extension, which also covers the alternate-format copies)
+that are still referenced, then pages through the storage listing of the
+image folders and deletes everything else older than a grace period, in
+batches of S3_DELETE_BATCH_SIZE keys (one DeleteObjects request each).
+
+An image is referenced by any `*s3_key*` column of any model, or by a
+variant of an ImageAsset that an owner row still points at. Assets no
+owner points at are removed together with their objects.
+
+The grace period protects uploads whose row has not been committed yet.
+It cannot protect an upload that reuses an object already stored (keys are
+content-addressed) while the collector runs, so keep it for quiet hours.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.models import db, ImageAsset, ImageVariant
+from app.utils.storage import S3_DELETE_BATCH_SIZE, get_storage
+
+# Folders upload_image() writes to; objects outside them are never touched
+IMAGE_FOLDERS = {
+    'about', 'gallery', 'general', 'hero', 'litters', 'parents', 'parents_alternates', 'puppies', 'share',
+    'uploads',
+}
+
+
+def _stem(key):
+    return key.rsplit('.', 1)[0]
+
+
+def _scalars(column):
+    """Streams the non-null values of `column`."""
+    query = db.select(column).where(column.isnot(None)).execution_options(yield_per=1000)
+    return db.session.execute(query).scalars()
+
+
+def _columns(predicate):
+    """Every mapped column for which `predicate(column)` holds."""
+    for mapper in db.Model.registry.mappers:
+        for column in mapper.columns:
+            if predicate(column):
+                yield column
+
+
+def _is_key_column(column):
+    return 's3_key' in column.name
+
+
+def _is_asset_column(column):
+    """Owner foreign keys to image_asset (not the variants' own asset_id)."""
+    return column.table.name != ImageVariant.__tablename__ and any(
+        fk.column.table.name == ImageAsset.__tablename__ for fk in column.foreign_keys
+    )
+
+
+def referenced_asset_ids():
+    """Ids of the assets some owner row points at."""
+    return {asset_id for column in _columns(_is_asset_column) for asset_id in _scalars(column)}
+
+
+def referenced_stems(live_assets, cutoff):
+    """
+    Stems of every key still in use: the key columns, plus the variants of
+    `live_assets` and of assets created after `cutoff` (naive UTC).
+    """
+    stems = {_stem(key) for column in _columns(_is_key_column) for key in _scalars(column) if key}
+
+    query = (
+        db.select(ImageVariant.key, ImageVariant.asset_id, ImageAsset.created_at)
+        .join(ImageAsset, ImageVariant.asset_id == ImageAsset.id)
+        .execution_options(yield_per=1000)
+    )
+    for key, asset_id, created_at in db.session.execute(query):
+        if asset_id in live_assets or created_at > cutoff:
+            stems.add(_stem(key))
+    return stems
+
+
+def _delete_batch(storage, batch, summary, dry_run, log):
+    """Deletes one batch of {key: size} and adds what was reclaimed to `summary`."""
+    if not batch:
+        return
+    if dry_run:
+        for key in batch:
+            log(f"Would delete {key}")
+        deleted = batch
+    elif storage.delete_many(batch) == len(batch):
+        deleted = batch
+    else:
+        # Some deletes failed (and were reported); only count what is gone
+        remaining = storage.existing(batch)
+        deleted = {key: size for key, size in batch.items() if key not in remaining}
+    summary['deleted'] += len(deleted)
+    summary['bytes_reclaimed'] += sum(deleted.values())
+    batch.clear()
+
+
+def collect_garbage(grace_days=7, prefixes=None, dry_run=False, log=print):
+    """
+    Deletes unreferenced objects older than `grace_days` under `prefixes`
+    (default: IMAGE_FOLDERS plus every folder a stored key uses), then the
+    orphaned assets. Must run inside an app context. Returns a summary dict:
+    scanned, referenced, recent (within the grace period), deleted,
+    bytes_reclaimed, assets_deleted and seconds. With dry_run nothing is
+    deleted and the counts say what would be.
+    """
+    started = time.perf_counter()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=grace_days)
+    naive_cutoff = cutoff.replace(tzinfo=None)
+
+    live_assets = referenced_asset_ids()
+    stems = referenced_stems(live_assets, naive_cutoff)
+    if not prefixes:
+        prefixes = sorted(IMAGE_FOLDERS | {stem.split('/', 1)[0] for stem in stems if '/' in stem})
+
+    summary = {
+        'scanned': 0, 'referenced': 0, 'recent': 0, 'deleted': 0, 'bytes_reclaimed': 0,
+        'assets_deleted': 0, 'seconds': 0.0,
+    }
+    storage = get_storage()
+    batch = {}
+    for prefix in prefixes:
+        for key, size, modified in storage.iter_objects(prefix.strip('/') + '/'):
+            summary['scanned'] += 1
+            if _stem(key) in stems:
+                summary['referenced'] += 1
+            elif modified > cutoff:
+                summary['recent'] += 1
+            else:
+                batch[key] = size
+                if len(batch) >= S3_DELETE_BATCH_SIZE:
+                    _delete_batch(storage, batch, summary, dry_run, log)
+    _delete_batch(storage, batch, summary, dry_run, log)
+
+    orphans = ImageAsset.query.filter(ImageAsset.created_at <= naive_cutoff)
+    if live_assets:
+        orphans = orphans.filter(ImageAsset.id.notin_(live_assets))
+    for asset in orphans.all():
+        summary['assets_deleted'] += 1
+        if not dry_run:
+            db.session.delete(asset)
+    db.session.commit()
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
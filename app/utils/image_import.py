@@ -0,0 +1,212 @@
+# app/utils/image_import.py
+"""
+Bulk import of a directory of images (`flask images import`).
+
+Files are processed and uploaded concurrently on a thread pool (Pillow
+releases the GIL while it decodes, resizes and encodes), and the matching
+rows are inserted in batches. Every committed batch is appended to a
+manifest in the imported directory, so an interrupted import can simply be
+run again: files already listed (same size and modification time) are
+skipped without being read.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, GalleryImage, ParentImage, Puppy
+from app.utils.image_jobs import apply_image_keys
+from app.utils.image_uploader import upload_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Written inside the imported directory unless --manifest says otherwise
+MANIFEST_NAME = '.images-import'
+
+# What each --folder creates. `scope` is the column that ties the row to its
+# owner (a parent or litter id), given on the command line.
+IMPORT_TARGETS = {
+    'gallery': {
+        'model': GalleryImage,
+        'scope': None,
+        'field_map': {'original': 'image_s3_key', 'formats': 'image_formats', 'asset': 'image_asset'},
+    },
+    'parents': {
+        'model': ParentImage,
+        'scope': 'parent_id',
+        'field_map': {'original': 'image_s3_key'},
+    },
+    'puppies': {
+        'model': Puppy,
+        'scope': 'litter_id',
+        'field_map': {'original': 'main_image_s3_key', 'formats': 'main_image_formats', 'asset': 'main_image_asset'},
+    },
+}
+
+
+def find_images(directory):
+    """Image files under `directory` (recursively), as sorted paths relative to it."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def read_manifest(manifest_path):
+    """{relative path: fingerprint} of the files a previous run imported."""
+    if not os.path.exists(manifest_path):
+        return {}
+    done = {}
+    with open(manifest_path, encoding='utf-8') as manifest:
+        for line in manifest:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 2:
+                done[parts[0]] = parts[1]
+    return done
+
+
+def _append_manifest(manifest_path, entries):
+    with open(manifest_path, 'a', encoding='utf-8') as manifest:
+        for rel_path, fingerprint, key in entries:
+            manifest.write(f"{rel_path}\t{fingerprint}\t{key}\n")
+
+
+def _original_key(keys):
+    return keys if isinstance(keys, str) else keys.get('original')
+
+
+def _process_file(app, path, folder, responsive):
+    """Runs one file through upload_image() on a pool thread. Returns (keys, variants)."""
+    variants = {}
+    with app.app_context(), open(path, 'rb') as f:
+        upload = FileStorage(stream=f, filename=os.path.basename(path))
+        keys = upload_image(upload, folder=folder, create_responsive_versions=responsive, variants=variants)
+    return keys, variants
+
+
+def _puppy_name(rel_path):
+    """Puppy name from the file name, e.g. "litter-a/river_2.jpg" -> "River 2"."""
+    stem = os.path.splitext(os.path.basename(rel_path))[0]
+    return stem.replace('-', ' ').replace('_', ' ').strip().title() or 'Puppy'
+
+
+def _insert_batch(folder, batch, scope_id, manifest_path, summary):
+    """Creates the rows for one batch of processed files, commits, and records them in the manifest."""
+    target = IMPORT_TARGETS[folder]
+    model = target['model']
+    original_attr = target['field_map']['original']
+    scope = {target['scope']: scope_id} if target['scope'] else {}
+
+    next_sort_order = None
+    if model is GalleryImage:
+        next_sort_order = (db.session.query(db.func.max(GalleryImage.sort_order)).scalar() or 0) + 1
+
+    rows = []
+    seen = set()
+    # Rows are inserted together at commit time rather than flushed one by one
+    with db.session.no_autoflush:
+        for rel_path, _, keys, variants in sorted(batch, key=lambda item: item[0]):
+            original = _original_key(keys)
+            already = original in seen or model.query.filter_by(**{original_attr: original}, **scope).first()
+            seen.add(original)
+            if already:
+                summary['existing'] += 1
+                continue
+
+            row = model(**scope)
+            if model is Puppy:
+                row.name = _puppy_name(rel_path)
+            if next_sort_order is not None:
+                row.sort_order = next_sort_order
+                next_sort_order += 1
+            apply_image_keys(row, keys, target['field_map'], variants)
+            rows.append(row)
+
+    db.session.add_all(rows)
+    db.session.commit()
+    summary['imported'] += len(rows)
+    _append_manifest(
+        manifest_path, [(rel_path, fingerprint, _original_key(keys)) for rel_path, fingerprint, keys, _ in batch]
+    )
+
+
+def import_directory(directory, folder, responsive=False, workers=None, batch_size=50, scope_id=None,
+                     manifest_path=None, log=print):
+    """
+    Imports every image under `directory` as a `folder` row (see IMPORT_TARGETS).
+
+    `scope_id` is the parent id (parents) or litter id (puppies) the rows
+    belong to. Must run inside an app context. Returns a summary dict:
+    found, skipped (listed in the manifest), imported, existing (a row
+    already had the image), failed, bytes_read, bytes_stored and seconds.
+    """
+    if folder not in IMPORT_TARGETS:
+        raise ValueError(f"Unknown import folder: {folder!r}")
+    if IMPORT_TARGETS[folder]['scope'] and scope_id is None:
+        raise ValueError(f"Importing into {folder!r} needs a {IMPORT_TARGETS[folder]['scope']}.")
+
+    manifest_path = manifest_path or os.path.join(directory, MANIFEST_NAME)
+    done = read_manifest(manifest_path)
+    paths = find_images(directory)
+    pending = {}
+    for rel_path in paths:
+        fingerprint = _fingerprint(os.path.join(directory, rel_path))
+        if done.get(rel_path) != fingerprint:
+            pending[rel_path] = fingerprint
+
+    summary = {
+        'found': len(paths), 'skipped': len(paths) - len(pending), 'imported': 0, 'existing': 0,
+        'failed': 0, 'bytes_read': 0, 'bytes_stored': 0, 'seconds': 0.0,
+    }
+    app = current_app._get_current_object()
+    started = time.perf_counter()
+
+    batch = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix='image-import') as pool:
+        futures = {
+            pool.submit(_process_file, app, os.path.join(directory, rel_path), folder, responsive): rel_path
+            for rel_path in pending
+        }
+        try:
+            for future in as_completed(futures):
+                rel_path = futures[future]
+                try:
+                    keys, variants = future.result()
+                except Exception as e:
+                    print(f"Error importing {rel_path}: {e}")
+                    keys, variants = None, {}
+                if not keys:
+                    summary['failed'] += 1
+                    log(f"Failed: {rel_path}")
+                    continue
+
+                summary['bytes_read'] += int(pending[rel_path].split(':')[0])
+                summary['bytes_stored'] += sum(info.get('bytes', 0) for info in variants.values())
+                batch.append((rel_path, pending[rel_path], keys, variants))
+                if len(batch) >= batch_size:
+                    _insert_batch(folder, batch, scope_id, manifest_path, summary)
+                    log(f"Imported {summary['imported']} / {len(pending)}")
+                    batch = []
+        except KeyboardInterrupt:
+            # Keep what finished so a re-run resumes from here
+            pool.shutdown(wait=True, cancel_futures=True)
+            if batch:
+                _insert_batch(folder, batch, scope_id, manifest_path, summary)
+            raise
+
+    if batch:
+        _insert_batch(folder, batch, scope_id, manifest_path, summary)
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
@@ -0,0 +1,356 @@
+# app/utils/image_jobs.py
+"""
+DB-backed background queue for image uploads.
+
+Admin saves call enqueue_image_job() instead of upload_image(), which stores
+the raw upload in the `image_job` table (or, for a direct upload, just its
+staged storage key) and returns immediately. The worker
+(`flask images work`) claims due jobs, runs them through upload_image(), and
+writes the resulting keys back onto the target row. Failed jobs are retried
+with exponential backoff; jobs left RUNNING by a crashed worker are reclaimed
+once their lock goes stale.
+"""
+
+import io
+import time
+from datetime import timedelta
+
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, ImageJob, ImageJobStatus, ImageAsset, ImageVariant
+from app.models.image_models import utcnow
+from app.utils.direct_uploads import StagedUpload
+from app.utils.image_uploader import (
+    FORMAT_TO_EXTENSION, IMAGE_DUPLICATE_MAX_DISTANCE, upload_image, stored_formats_for_key, format_key,
+    hamming_distance,
+)
+from app.utils.share_cards import refresh_share_cards
+from app.utils.storage import get_storage
+
+# Retry delay is RETRY_BASE_SECONDS * 2^(attempt - 1), capped at RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+# A RUNNING job whose lock is older than this is assumed orphaned by a dead worker
+STALE_LOCK_SECONDS = 15 * 60
+
+
+# upload_image() result entries that describe the image rather than name a stored key
+METADATA_ENTRIES = ('formats', 'placeholder')
+
+# upload_image() measurements that describe the whole image and belong on the asset
+ASSET_FIELDS = ('dhash',)
+
+# Stored file extension -> lower-case format name recorded on ImageVariant
+EXTENSION_TO_FORMAT = {ext: fmt.lower() for fmt, ext in FORMAT_TO_EXTENSION.items() if fmt != 'JPG'}
+
+
+def _format_of_key(s3_key):
+    return EXTENSION_TO_FORMAT.get(s3_key.rsplit('.', 1)[-1].lower(), 'jpeg')
+
+
+def _as_key_dict(keys):
+    """Expands a single non-responsive key into the dict form of upload_image() output."""
+    if not isinstance(keys, str):
+        return keys
+    formats = stored_formats_for_key(keys)
+    expanded = {'original': keys, 'formats': formats}
+    for fmt in formats.split(','):
+        if fmt:
+            expanded[f'original_{fmt}'] = format_key(keys, fmt)
+    return expanded
+
+
+def asset_for_keys(keys, variants=None):
+    """
+    Returns the ImageAsset for upload_image() output, adding it to the session
+    if it is new.
+
+    Keys are content-addressed, so an upload whose original key is already
+    recorded resolves to the existing asset; any variants it does not have
+    yet are added, and a new placeholder replaces the old one. `variants` is
+    upload_image()'s {s3_key: {width, height, bytes}} measurements; the
+    original's "dhash" is recorded on the asset.
+    """
+    keys = _as_key_dict(keys)
+    original = keys.get('original') if keys else None
+    if not original:
+        return None
+    variants = variants or {}
+
+    known = ImageVariant.query.filter_by(key=original).first()
+    if known is not None:
+        asset = known.asset
+    else:
+        asset = ImageAsset(
+            folder=original.rsplit('/', 1)[0] if '/' in original else '',
+            source_format=_format_of_key(original),
+            formats=keys.get('formats') or None,
+        )
+        db.session.add(asset)
+    if keys.get('placeholder'):
+        asset.placeholder = keys['placeholder']
+
+    by_key = {variant.key: variant for variant in asset.variants}
+    for name, s3_key in keys.items():
+        if name in METADATA_ENTRIES or not s3_key:
+            continue
+        variant = by_key.get(s3_key)
+        if variant is None:
+            # "small_webp" -> size "small"
+            variant = ImageVariant(name=name.split('_', 1)[0], format=_format_of_key(s3_key), key=s3_key)
+            asset.variants.append(variant)
+            by_key[s3_key] = variant
+        for field, value in variants.get(s3_key, {}).items():
+            setattr(asset if field in ASSET_FIELDS else variant, field, value)
+    return asset
+
+
+def keys_for_asset(asset):
+    """The stored keys of `asset` in the dict form of responsive upload_image() output."""
+    keys = {'formats': asset.formats or '', 'placeholder': asset.placeholder}
+    for variant in asset.variants:
+        name = variant.name if variant.format == asset.source_format else f'{variant.name}_{variant.format}'
+        keys[name] = variant.key
+    return keys
+
+
+def asset_covers(asset, field_map):
+    """True if `asset` has every size `field_map` writes, so its keys can stand in for a new upload."""
+    names = {variant.name for variant in asset.variants if variant.format == asset.source_format}
+    return all(name in names for name in field_map if name not in METADATA_ENTRIES and name != 'asset')
+
+
+def near_duplicates(dhash, max_distance=IMAGE_DUPLICATE_MAX_DISTANCE):
+    """
+    Assets whose perceptual hash is within `max_distance` bits of `dhash`,
+    closest first, as (asset, distance) pairs.
+
+    Hamming distance cannot be answered by an index, so the hashes are
+    compared in Python; reading them is a scan of the (covering) dhash
+    index only, which stays cheap at the few thousand assets a site has.
+    """
+    if not dhash:
+        return []
+    query = db.select(ImageAsset.id, ImageAsset.dhash).where(ImageAsset.dhash.isnot(None))
+    distances = {}
+    for asset_id, other in db.session.execute(query):
+        distance = hamming_distance(dhash, other)
+        if distance <= max_distance:
+            distances[asset_id] = distance
+    if not distances:
+        return []
+    assets = ImageAsset.query.filter(ImageAsset.id.in_(distances)).all()
+    return sorted(((asset, distances[asset.id]) for asset in assets), key=lambda pair: (pair[1], pair[0].id))
+
+
+def apply_image_keys(model, keys, field_map, variants=None):
+    """
+    Copies upload_image() output onto `model`.
+
+    `keys` is either a single key (non-responsive upload) or a dict of keys;
+    `field_map` maps variant names (plus "formats") to model attributes, and
+    "asset" to the model's ImageAsset relationship. `variants` is passed on
+    to asset_for_keys(). Returns True if any attribute was set.
+    """
+    if not keys:
+        return False
+    keys = _as_key_dict(keys)
+
+    applied = False
+    for variant, attr in field_map.items():
+        if variant in METADATA_ENTRIES or variant == 'asset':
+            continue
+        if keys.get(variant):
+            setattr(model, attr, keys[variant])
+            applied = True
+
+    # Keep the recorded formats in step with the keys that were just written
+    if applied and 'formats' in field_map:
+        setattr(model, field_map['formats'], keys.get('formats') or None)
+    if applied and 'asset' in field_map:
+        setattr(model, field_map['asset'], asset_for_keys(keys, variants))
+    return applied
+
+
+def enqueue_image_job(model, file_storage, folder, field_map, responsive=False):
+    """
+    Queues `file_storage` for background processing on behalf of `model`.
+    A StagedUpload is queued by its key; the worker reads it from storage.
+
+    The model is flushed first so newly created rows have an id to write back to.
+    """
+    db.session.add(model)
+    db.session.flush()
+
+    job = ImageJob(
+        target_table=model.__tablename__,
+        target_id=model.id,
+        folder=folder,
+        responsive=responsive,
+        filename=file_storage.filename,
+    )
+    if isinstance(file_storage, StagedUpload):
+        job.source_s3_key = file_storage.key
+    else:
+        file_storage.seek(0)
+        job.payload = file_storage.read()
+    job.field_map = field_map
+    db.session.add(job)
+    return job
+
+
+def _model_for_table(table_name):
+    """Finds the mapped model class for a table name."""
+    for mapper in db.Model.registry.mappers:
+        if getattr(mapper.class_, '__tablename__', None) == table_name:
+            return mapper.class_
+    return None
+
+
+def retry_delay(attempts):
+    """Backoff before the next try after `attempts` failed attempts."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def claim_next_job():
+    """
+    Atomically marks the next due job as RUNNING and returns it (or None).
+
+    Due jobs are PENDING with next_attempt_at in the past, or RUNNING with a
+    stale lock. SKIP LOCKED lets several workers poll the table safely on
+    databases that support it.
+
+    Reclaiming a stale lock counts as a failed attempt: the worker holding it
+    died, possibly because of the upload itself, so a job that keeps killing
+    workers ends up FAILED instead of being claimed forever.
+    """
+    while True:
+        now = utcnow()
+        stale_before = now - timedelta(seconds=STALE_LOCK_SECONDS)
+
+        job = (
+            ImageJob.query
+            .filter(
+                db.or_(
+                    db.and_(ImageJob.status == ImageJobStatus.PENDING, ImageJob.next_attempt_at <= now),
+                    db.and_(ImageJob.status == ImageJobStatus.RUNNING, ImageJob.locked_at <= stale_before),
+                )
+            )
+            .order_by(ImageJob.next_attempt_at.asc(), ImageJob.id.asc())
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.session.rollback()
+            return None
+
+        if job.status == ImageJobStatus.RUNNING:
+            job.attempts += 1
+            if job.attempts >= job.max_attempts:
+                job.status = ImageJobStatus.FAILED
+                job.last_error = "The worker processing this job stopped before it finished."
+                job.locked_at = None
+                db.session.commit()
+                continue
+
+        job.status = ImageJobStatus.RUNNING
+        job.locked_at = now
+        db.session.commit()
+        return job
+
+
+def _fail(job, message, permanent=False):
+    """Records a failed attempt: retried later with backoff, or FAILED if `permanent` or out of attempts."""
+    job.attempts += 1
+    job.last_error = message
+    job.locked_at = None
+    if permanent or job.attempts >= job.max_attempts:
+        job.status = ImageJobStatus.FAILED
+    else:
+        job.status = ImageJobStatus.PENDING
+        job.next_attempt_at = utcnow() + retry_delay(job.attempts)
+
+
+def _discard_source(job):
+    """Deletes a direct upload's staged original once the job no longer needs it."""
+    if job.source_s3_key:
+        get_storage().delete_many([job.source_s3_key])
+        job.source_s3_key = None
+
+
+def process_job(job):
+    """
+    Runs one claimed job through the upload pipeline and records the outcome.
+    Returns True on success.
+    """
+    model_class = _model_for_table(job.target_table)
+    target = db.session.get(model_class, job.target_id) if model_class else None
+
+    if target is None:
+        # The row was deleted while the job was queued; nothing to update.
+        _discard_source(job)
+        job.status = ImageJobStatus.DONE
+        job.payload = None
+        job.last_error = "Target row no longer exists."
+        job.completed_at = utcnow()
+        db.session.commit()
+        return True
+
+    variants, errors = {}, []
+    try:
+        if job.source_s3_key:
+            payload = get_storage().get(job.source_s3_key)
+            if payload is None:
+                raise ValueError(f"direct upload {job.source_s3_key} is not in storage")
+        else:
+            payload = job.payload or b""
+        upload = FileStorage(stream=io.BytesIO(payload), filename=job.filename)
+        keys = upload_image(upload, folder=job.folder, create_responsive_versions=job.responsive,
+                            variants=variants, errors=errors)
+    except Exception as e:
+        keys = None
+        errors.append(e)
+        print(f"Image job {job.id} raised: {e}")
+
+    if not apply_image_keys(target, keys, job.field_map, variants):
+        error = errors[0] if errors else None
+        # A rejection (ImageRejected, or any ValueError) would fail the same way on every retry
+        rejected = isinstance(error, ValueError)
+        if rejected:
+            message = f"Image rejected: {error}"
+        else:
+            message = str(error) if error else "upload_image did not return any keys."
+        _fail(job, message, permanent=rejected)
+        db.session.commit()
+        return False
+    # Litters and puppies show the new image on their share card too
+    refresh_share_cards(target)
+
+    _discard_source(job)
+    job.status = ImageJobStatus.DONE
+    job.payload = None
+    job.last_error = None
+    job.locked_at = None
+    job.completed_at = utcnow()
+    db.session.commit()
+    return True
+
+
+def run_worker(poll_interval=2.0, once=False):
+    """
+    Processes jobs until interrupted. With once=True, drains the currently due
+    jobs and returns. Returns the number of jobs processed.
+    """
+    processed = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        ok = process_job(job)
+        processed += 1
+        print(f"Image job {job.id} ({job.target_label}): {'done' if ok else job.status.value.lower()}")
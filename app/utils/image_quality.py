@@ -0,0 +1,59 @@
+# app/utils/image_quality.py
+"""
+Image quality metrics used by the image pipeline (quality targeting, see
+IMAGE_QUALITY_MODE), its benchmarks and tests.
+
+Pillow-only, so it runs anywhere the uploader does.
+"""
+
+from PIL import Image, ImageMath
+
+# Stabilising constants from the SSIM paper, for 8-bit data (L = 255)
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+
+def _window_means(img, window):
+    """Mean of every non-overlapping `window` x `window` block."""
+    w, h = img.size
+    return img.resize((w // window, h // window), Image.Resampling.BOX)
+
+
+def ssim(a, b, window=8):
+    """
+    Mean structural similarity of two images' luminance (1.0 = identical).
+
+    Statistics are computed over non-overlapping `window`-pixel blocks, as in
+    the block-based SSIM variant. `b` is resized to `a` if they differ.
+    """
+    x = a.convert("L")
+    y = b.convert("L")
+    if y.size != x.size:
+        y = y.resize(x.size, Image.Resampling.LANCZOS)
+
+    # Crop to whole windows so BOX resizing averages exactly one block per pixel
+    w, h = (dim - dim % window for dim in x.size)
+    if w == 0 or h == 0:
+        raise ValueError(f"Images must be at least {window}px on each side.")
+    x = x.crop((0, 0, w, h)).convert("F")
+    y = y.crop((0, 0, w, h)).convert("F")
+
+    products = (
+        ImageMath.lambda_eval(lambda args: args["p"] * args["q"], p=p, q=q)
+        for p, q in ((x, x), (y, y), (x, y))
+    )
+    mu_x, mu_y, xx, yy, xy = (_window_means(img, window) for img in (x, y, *products))
+
+    ssim_map = ImageMath.lambda_eval(
+        lambda args: (
+            (2 * args["mx"] * args["my"] + _SSIM_C1)
+            * (2 * (args["xy"] - args["mx"] * args["my"]) + _SSIM_C2)
+        ) / (
+            (args["mx"] * args["mx"] + args["my"] * args["my"] + _SSIM_C1)
+            * (args["xx"] - args["mx"] * args["mx"] + args["yy"] - args["my"] * args["my"] + _SSIM_C2)
+        ),
+        mx=mu_x, my=mu_y, xx=xx, yy=yy, xy=xy
+    )
+    # ImageStat bins "F" images into a 256-entry histogram, so average the values directly
+    values = list(ssim_map.getdata())
+    return sum(values) / len(values)
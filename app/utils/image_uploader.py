@@ -1,14 +1,20 @@
-import boto3
+import ctypes
+import ctypes.util
+import base64
+import hashlib
+import math
 import os
-from werkzeug.utils import secure_filename
-import uuid
-from PIL import Image, ImageOps
+from PIL import Image, ImageOps, features
 import io
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
 
-# --- S3 Configuration ---
-S3_BUCKET = os.environ.get('S3_BUCKET_NAME')
-S3_REGION = os.environ.get('S3_BUCKET_REGION')
-s3_client = boto3.client("s3", region_name=S3_REGION)
+from app.utils.image_quality import ssim
+from app.utils.storage import get_storage
 
 # Base responsive sizes (used for most uploads)
 RESPONSIVE_SIZES_BASE = {
@@ -26,18 +32,146 @@ RESPONSIVE_SIZES_HERO = {
 # Minimum acceptable resolution for hero uploads (long edge)
 HERO_MIN_LONG_EDGE_PX = 1600
 
+# Formats the admin forms re-encode to when they downscale an upload in the
+# browser (IMAGE_CLIENT_RESIZE, see verify_client_resize())
+CLIENT_RESIZE_FORMATS = ("JPEG", "PNG", "WEBP")
+
 # JPEG tuning (premium, still reasonable file sizes)
 JPEG_QUALITY = 88
 
+# Modern-format tuning. These are emitted next to the source format for every
+# variant and served via <picture> sources to browsers that support them.
+# AVIF is much smaller but ~10x slower to encode than WebP, so it is opt-in
+# (IMAGE_ALTERNATE_FORMATS=avif,webp), ideally with IMAGE_PROCESS_WORKERS or
+# background jobs enabled.
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+AVIF_SPEED = 8
+
+# Perceptual quality targeting (IMAGE_QUALITY_MODE=ssim): each JPEG/WebP
+# variant is encoded at the lowest quality between IMAGE_MIN_QUALITY and the
+# fixed quality above whose SSIM against the unencoded variant still reaches
+# IMAGE_TARGET_SSIM, found by binary search. Smooth shots drop well below the
+# fixed quality; busy fur close-ups keep it. Images larger than
+# QUALITY_SEARCH_SAMPLE_EDGE are searched on a central crop of that size and
+# encoded once at the chosen quality. `fixed` (the default) skips the search.
+IMAGE_QUALITY_MODE = os.environ.get('IMAGE_QUALITY_MODE', 'fixed').strip().lower()
+IMAGE_TARGET_SSIM = float(os.environ.get('IMAGE_TARGET_SSIM') or 0.98)
+IMAGE_MIN_QUALITY = int(os.environ.get('IMAGE_MIN_QUALITY') or 50)
+QUALITY_SEARCH_SAMPLE_EDGE = 1024
+QUALITY_SEARCH_FORMATS = ("JPEG", "WEBP")
+
+
+def _supported_alternate_formats():
+    """Alternate formats requested via IMAGE_ALTERNATE_FORMATS that this Pillow build can encode."""
+    requested = os.environ.get('IMAGE_ALTERNATE_FORMATS', 'webp')
+    formats = []
+    for fmt in (f.strip().upper() for f in requested.split(',')):
+        if fmt and features.check(fmt.lower()) and fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+# Order matters: browsers use the first <picture> source they support,
+# so the smallest format comes first.
+ALTERNATE_FORMATS = _supported_alternate_formats()
+
+# How responsive sizes are resized:
+#   "cascade" - largest to smallest, each size built from the previous one, so
+#               only the first resize touches the full-resolution pixels
+#   "direct"  - every size resized from the full-resolution decode
+# See benchmarks/resize_cascade.py for the CPU / memory / SSIM comparison.
+IMAGE_RESIZE_MODE = os.environ.get('IMAGE_RESIZE_MODE', 'cascade').strip().lower()
+
+# Responsive JPEG uploads are decoded with DCT-domain scaling (1/2, 1/4, 1/8)
+# for the resized variants, keeping the long edge at least
+# DRAFT_REDUCING_GAP x the largest size. The full-resolution decode then only
+# happens for the "original" variant, and only when it is not already stored.
+# A gap of 1.0 halves decode time and memory on 12MP phone photos while
+# staying within ~0.01 SSIM of a full decode; 2.0 (Pillow's thumbnail()
+# default) rarely allows any scaling. See benchmarks/jpeg_draft_decode.py.
+IMAGE_DRAFT_DECODE = os.environ.get('IMAGE_DRAFT_DECODE', 'true').lower() in ('1', 'true', 'yes')
+DRAFT_REDUCING_GAP = float(os.environ.get('IMAGE_DRAFT_REDUCING_GAP') or 1.0)
+
+# Streaming mode bounds the memory an upload needs: variants are rendered and
+# uploaded one at a time, each encoded into a temp file that spills to disk
+# above IMAGE_SPOOL_THRESHOLD_MB and is released right after its upload, and
+# concurrent uploads share IMAGE_MEMORY_BUDGET_MB (0 = unlimited), waiting up
+# to IMAGE_MEMORY_BUDGET_WAIT seconds for room before giving up.
+IMAGE_STREAMING_UPLOADS = os.environ.get('IMAGE_STREAMING_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+IMAGE_SPOOL_THRESHOLD = int(float(os.environ.get('IMAGE_SPOOL_THRESHOLD_MB') or 4) * 1024 * 1024)
+IMAGE_MEMORY_BUDGET = int(float(os.environ.get('IMAGE_MEMORY_BUDGET_MB') or 0) * 1024 * 1024)
+IMAGE_MEMORY_BUDGET_WAIT = float(os.environ.get('IMAGE_MEMORY_BUDGET_WAIT') or 60)
+
+
+def _folder_limits(prefix, default, scale):
+    """
+    {folder: limit} from `<prefix>` (the default, under "") and any
+    `<prefix>_<FOLDER>` overrides, e.g. IMAGE_MAX_MEGAPIXELS_HERO=60.
+    """
+    limits = {'': int(float(os.environ.get(prefix) or default) * scale)}
+    for name, value in os.environ.items():
+        if name.startswith(prefix + '_') and value:
+            limits[name[len(prefix) + 1:].lower()] = int(float(value) * scale)
+    return limits
+
+
+# Ingest limits, checked from the upload's size and image header before any
+# pixels are decoded. Images over IMAGE_MAX_MEGAPIXELS are downscaled to fit
+# (JPEGs through a DCT-scaled decode, so the full size is never in memory);
+# uploads over IMAGE_MAX_UPLOAD_MB are rejected. Both can be set per folder.
+# Non-JPEG images must be decoded at full size before they can be downscaled,
+# so anything over IMAGE_MAX_DECODE_MEGAPIXELS (after DCT scaling) is
+# rejected as a likely decompression bomb.
+IMAGE_MAX_PIXELS = _folder_limits('IMAGE_MAX_MEGAPIXELS', 40, 1_000_000)
+IMAGE_MAX_UPLOAD_BYTES = _folder_limits('IMAGE_MAX_UPLOAD_MB', 25, 1024 * 1024)
+IMAGE_MAX_DECODE_PIXELS = int(float(os.environ.get('IMAGE_MAX_DECODE_MEGAPIXELS') or 100) * 1_000_000)
+
+# Peak memory of processing one decoded image, as a multiple of its pixel
+# buffer: the decode itself, the EXIF-transposed copy, and the JPEG encoder's
+# coefficient buffers for progressive/optimized output.
+WORKING_SET_FACTOR = 3.0
+
+# Low-quality image placeholder (LQIP): a tiny WebP of every responsive upload,
+# returned as a data: URI and inlined by templates as the <img> background
+# while the real image downloads. ~20px keeps it to a few hundred bytes.
+PLACEHOLDER_LONG_EDGE = 20
+PLACEHOLDER_QUALITY = 50
+
+# Perceptual hash (dHash) recorded on every upload's asset, so the same photo
+# uploaded again to another folder, or re-encoded, can be recognised: one bit
+# per horizontal brightness step of a 9x8 grayscale thumbnail (64 bits).
+# Hashes at most IMAGE_DUPLICATE_MAX_DISTANCE bits apart count as the same picture.
+DHASH_SIZE = 8
+IMAGE_DUPLICATE_MAX_DISTANCE = int(os.environ.get('IMAGE_DUPLICATE_MAX_DISTANCE') or 6)
+
+# Worker processes used to fan out responsive resize + encode work.
+# 0 (the default) keeps everything in the request thread.
+IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS') or 0)
+
 # Map Pillow formats to HTTP Content-Types
 FORMAT_TO_CONTENT_TYPE = {
     "JPEG": "image/jpeg",
     "JPG": "image/jpeg",
     "PNG": "image/png",
     "WEBP": "image/webp",
+    "AVIF": "image/avif",
     "GIF": "image/gif",
 }
 
+# File extensions used in content-addressed keys
+FORMAT_TO_EXTENSION = {
+    "JPEG": "jpg",
+    "JPG": "jpg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "AVIF": "avif",
+    "GIF": "gif",
+}
+
+# Length of the content hash used in storage keys (hex characters)
+CONTENT_DIGEST_LENGTH = 32
+
 
 def _get_lanczos_resample():
     """
@@ -60,9 +194,14 @@ def _normalize_for_save(img: Image.Image, fmt: str, background_rgb=(255, 255, 25
     - JPEG does not support alpha, so RGBA/LA/P w/transparency must be flattened onto a background.
     - For JPEG, we also guarantee RGB mode.
     - For PNG, we keep alpha if present.
+    - WebP/AVIF keep alpha too, but only encode RGB/RGBA.
     """
     fmt = (fmt or "JPEG").upper()
 
+    if fmt in ("WEBP", "AVIF") and img.mode not in ("RGB", "RGBA"):
+        has_alpha = img.mode in ("LA", "PA") or "transparency" in img.info
+        return img.convert("RGBA" if has_alpha else "RGB")
+
     if fmt in ("JPEG", "JPG"):
         has_alpha = (
             img.mode in ("RGBA", "LA")
@@ -77,7 +216,7 @@ def _normalize_for_save(img: Image.Image, fmt: str, background_rgb=(255, 255, 25
             background.paste(rgba, mask=alpha)
             return background
 
-        return img.convert("RGB")
+        return img if img.mode == "RGB" else img.convert("RGB")
 
     return img
 
@@ -87,18 +226,38 @@ def _content_type_for_format(fmt: str) -> str:
     return FORMAT_TO_CONTENT_TYPE.get(fmt, "application/octet-stream")
 
 
-def _save_image_to_bytes(img: Image.Image, fmt: str) -> io.BytesIO:
+class _SpooledBuffer(tempfile.SpooledTemporaryFile):
+    """
+    SpooledTemporaryFile that stays in memory until it outgrows its max_size.
+
+    Pillow asks for fileno() before encoding, which would otherwise force the
+    file onto disk straight away.
+    """
+
+    def fileno(self):
+        if not self._rolled:
+            raise io.UnsupportedOperation("in-memory buffer has no fileno")
+        return super().fileno()
+
+
+def _new_buffer(spool=False):
+    return _SpooledBuffer(max_size=IMAGE_SPOOL_THRESHOLD) if spool else io.BytesIO()
+
+
+def _save_image_to_bytes(img: Image.Image, fmt: str, spool=False, quality=None):
     """
     Save image to BytesIO with format-specific quality tuning.
+    With spool=True the buffer spills to a temp file above IMAGE_SPOOL_THRESHOLD.
+    `quality` overrides the fixed JPEG/WebP quality.
     """
     fmt = (fmt or "JPEG").upper()
-    buf = io.BytesIO()
+    buf = _new_buffer(spool)
 
     if fmt in ("JPEG", "JPG"):
         img.save(
             buf,
             format="JPEG",
-            quality=JPEG_QUALITY,
+            quality=quality or JPEG_QUALITY,
             optimize=True,
             progressive=True
         )
@@ -107,6 +266,10 @@ def _save_image_to_bytes(img: Image.Image, fmt: str) -> io.BytesIO:
         # (optimize works for PNG but can be slower; enable if you want)
         if fmt == "PNG":
             img.save(buf, format="PNG", optimize=True)
+        elif fmt == "WEBP":
+            img.save(buf, format="WEBP", quality=quality or WEBP_QUALITY, method=4)
+        elif fmt == "AVIF":
+            img.save(buf, format="AVIF", quality=AVIF_QUALITY, speed=AVIF_SPEED)
         else:
             img.save(buf, format=fmt)
 
@@ -114,31 +277,706 @@ def _save_image_to_bytes(img: Image.Image, fmt: str) -> io.BytesIO:
     return buf
 
 
-def upload_image(file_storage, folder='general', create_responsive_versions=False):
+def _quality_sample(img: Image.Image) -> Image.Image:
+    """`img`, or its central QUALITY_SEARCH_SAMPLE_EDGE crop aligned to the 16px JPEG MCU grid."""
+    width, height = img.size
+    edge = QUALITY_SEARCH_SAMPLE_EDGE
+    if width <= edge and height <= edge:
+        return img
+    left = (max(width - edge, 0) // 2) // 16 * 16
+    top = (max(height - edge, 0) // 2) // 16 * 16
+    return img.crop((left, top, min(left + edge, width), min(top + edge, height)))
+
+
+def _encode_at_target(img: Image.Image, fmt: str, spool=False):
+    """
+    Encodes `img` as JPEG/WebP at the lowest quality that still reaches
+    IMAGE_TARGET_SSIM (see IMAGE_QUALITY_MODE). Returns (buffer, encoding),
+    where encoding is {quality, bytes_saved}: the chosen quality and the
+    bytes saved against the fixed quality (estimated from the sample for
+    images searched on a crop).
+    """
+    ceiling = JPEG_QUALITY if fmt in ("JPEG", "JPG") else WEBP_QUALITY
+    sample = _quality_sample(img)
+    if min(sample.size) < 16:
+        return _save_image_to_bytes(img, fmt, spool=spool), {'quality': ceiling, 'bytes_saved': 0}
+
+    encoded = {}
+
+    def reaches_target(quality):
+        encoded[quality] = _save_image_to_bytes(sample, fmt, quality=quality).getvalue()
+        with Image.open(io.BytesIO(encoded[quality])) as decoded:
+            return ssim(sample, decoded) >= IMAGE_TARGET_SSIM
+
+    # Never above the fixed quality: if that misses the target, keep it
+    best = ceiling
+    if reaches_target(ceiling):
+        low, high = min(IMAGE_MIN_QUALITY, ceiling), ceiling - 1
+        while low <= high:
+            middle = (low + high) // 2
+            if reaches_target(middle):
+                best, high = middle, middle - 1
+            else:
+                low = middle + 1
+
+    if sample is img:
+        buf = _new_buffer(spool)
+        buf.write(encoded[best])
+        buf.seek(0)
+        saved = len(encoded[ceiling]) - len(encoded[best])
+    else:
+        buf = _save_image_to_bytes(img, fmt, spool=spool, quality=best)
+        size = buf.seek(0, io.SEEK_END)
+        buf.seek(0)
+        saved = round(size * (len(encoded[ceiling]) / len(encoded[best]) - 1))
+    return buf, {'quality': best, 'bytes_saved': saved}
+
+
+def _encode(img: Image.Image, fmt: str, spool=False):
+    """Encodes one variant. Returns (buffer, encoding); encoding is {} unless the quality was searched."""
+    if IMAGE_QUALITY_MODE == "ssim" and fmt in QUALITY_SEARCH_FORMATS:
+        return _encode_at_target(img, fmt, spool)
+    return _save_image_to_bytes(img, fmt, spool=spool), {}
+
+
+_process_pool = None
+
+
+def get_process_pool():
+    """
+    Returns the shared process pool for variant rendering, creating it on first use.
+    Returns None when IMAGE_PROCESS_WORKERS is 0 (sequential mode).
+    """
+    global _process_pool
+    if IMAGE_PROCESS_WORKERS <= 0:
+        return None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+    return _process_pool
+
+
+def _iter_chain(img: Image.Image, chain, background_rgb=(255, 255, 255), spool=False):
+    """
+    Renders one chain of variants, yielding (name, format, buffer, encoding) as
+    each is encoded (see _encode()).
+
+    `chain` is a list of (name, size, formats) steps. Each step LANCZOS-thumbnails
+    the previous step's output to fit within `size` (size=None keeps it as-is,
+    the "original" variant) and encodes it once per format, sharing the resize.
+    Steps without formats are only resized, to feed the next step.
+    """
+    for name, size, formats in chain:
+        if size is not None:
+            img = img.copy()
+            img.thumbnail(size, resample=LANCZOS)
+        for fmt in formats:
+            img_to_save = _normalize_for_save(img, fmt, background_rgb=background_rgb)
+            yield (name, fmt, *_encode(img_to_save, fmt, spool=spool))
+
+
+def _render_chain(img: Image.Image, chain, background_rgb=(255, 255, 255), encodings=None) -> dict:
+    """
+    Renders one chain of variants (see _iter_chain). Returns {name: {format: bytes}}.
+    Pass a dict as `encodings` to receive {name: {format: encoding}} for searched qualities.
+    """
+    rendered = {}
+    for name, fmt, buf, encoding in _iter_chain(img, chain, background_rgb):
+        rendered.setdefault(name, {})[fmt] = buf.getvalue()
+        if encoding and encodings is not None:
+            encodings.setdefault(name, {})[fmt] = encoding
+    return rendered
+
+
+def _plan_chains(variant_sizes, missing, resize_mode=None) -> list:
+    """
+    Groups the variants to render ({name: formats}) into _render_chain() chains.
+
+    "direct" gives every variant its own single-step chain off the full image.
+    "cascade" links the resized sizes largest to smallest and stops after the
+    smallest one that still needs rendering; the original stays on its own.
+    """
+    resize_mode = resize_mode or IMAGE_RESIZE_MODE
+    if resize_mode != "cascade":
+        return [[(name, variant_sizes[name], formats)] for name, formats in missing.items()]
+
+    chains = []
+    if "original" in missing:
+        chains.append([("original", None, missing["original"])])
+
+    resized = sorted(
+        ((name, size) for name, size in variant_sizes.items() if size is not None),
+        key=lambda item: max(item[1]),
+        reverse=True
+    )
+    chain = [(name, size, missing.get(name, [])) for name, size in resized]
+    while chain and not chain[-1][2]:
+        chain.pop()
+    if chain:
+        chains.append(chain)
+    return chains
+
+
+class ImageRejected(ValueError):
+    """
+    Why upload_image() refused an upload that can never be stored as it is
+    (over a limit, unreadable, a too-small hero), as opposed to a failure
+    that may pass on a later try.
+    """
+
+
+class MemoryBudget:
+    """
+    Process-wide cap on the image memory held by concurrent streaming uploads.
+
+    Each upload reserves its estimated working set before decoding and waits
+    while others hold the budget. A limit of 0 disables the cap.
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes, timeout=None):
+        if self.limit <= 0:
+            yield
+            return
+        if nbytes > self.limit:
+            raise MemoryError(
+                f"needs ~{nbytes // 2**20} MB to process, over the {self.limit // 2**20} MB image memory budget"
+            )
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_use + nbytes <= self.limit, timeout):
+                raise MemoryError(f"timed out after {timeout}s waiting for image memory budget")
+            self.in_use += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_use -= nbytes
+                self._cond.notify_all()
+
+
+MEMORY_BUDGET = MemoryBudget(IMAGE_MEMORY_BUDGET)
+
+_M_MMAP_THRESHOLD = -3
+_mmap_threshold_pinned = False
+
+
+def _pin_mmap_threshold():
+    """
+    Makes glibc serve large allocations (Pillow's pixel blocks) with mmap so
+    they go back to the OS as soon as they are freed.
+
+    By default glibc raises its mmap threshold after the first large free,
+    and later pixel buffers land in per-thread heaps that keep their pages.
+    RSS then creeps above the memory budget across uploads handled by
+    different threads. No-op on other C libraries.
+    """
+    global _mmap_threshold_pinned
+    if _mmap_threshold_pinned:
+        return
+    _mmap_threshold_pinned = True
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        libc.mallopt(_M_MMAP_THRESHOLD, 1024 * 1024)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+
+def image_limits(folder):
+    """(max pixels, max upload bytes) for uploads to `folder`."""
+    folder = (folder or '').lower()
+    return (
+        IMAGE_MAX_PIXELS.get(folder, IMAGE_MAX_PIXELS['']),
+        IMAGE_MAX_UPLOAD_BYTES.get(folder, IMAGE_MAX_UPLOAD_BYTES['']),
+    )
+
+
+def _decoded_bytes(size, mode) -> int:
+    # Pillow stores multi-band images at 4 bytes per pixel
+    return size[0] * size[1] * (1 if mode in ("1", "L", "P") else 4)
+
+
+def _ingest_size(size, max_pixels):
+    """The size an image is downscaled to on ingest, or None if it is within `max_pixels`."""
+    w, h = size
+    if w * h <= max_pixels:
+        return None
+    scale = math.sqrt(max_pixels / (w * h))
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def _decode_size(img: Image.Image, target):
+    """
+    Size `img` will be decoded at on its way to `target`: JPEGs can be
+    DCT-scaled by 1/2 to 1/8 while staying at least `target`, everything
+    else is decoded in full.
+    """
+    w, h = img.size
+    if img.format not in ("JPEG", "MPO"):
+        return w, h
+    for scale in (8, 4, 2):
+        scaled = math.ceil(w / scale), math.ceil(h / scale)
+        if scaled[0] >= target[0] and scaled[1] >= target[1]:
+            return scaled
+    return w, h
+
+
+def _upload_size(file_storage) -> int:
+    file_storage.seek(0, io.SEEK_END)
+    size = file_storage.tell()
+    file_storage.seek(0)
+    return size
+
+
+def _check_ingest_limits(file_storage, folder):
+    """
+    Rejects an upload over its folder's byte limit, or one whose header
+    promises more pixels than can safely be decoded. Returns an error
+    message, or None if it can be processed.
+    """
+    max_pixels, max_bytes = image_limits(folder)
+    size = _upload_size(file_storage)
+    if size > max_bytes:
+        return f"file is {size / 2**20:.1f} MB, over the {max_bytes / 2**20:.0f} MB limit for {folder!r}"
+    try:
+        with Image.open(file_storage) as probe:
+            target = _ingest_size(probe.size, max_pixels)
+            decode_w, decode_h = _decode_size(probe, target) if target else probe.size
+    except Exception:
+        return None  # unreadable; the upload itself reports the error
+    finally:
+        file_storage.seek(0)
+    if target and decode_w * decode_h > IMAGE_MAX_DECODE_PIXELS:
+        return (
+            f"{decode_w}x{decode_h} must be decoded in full to downscale it, "
+            f"over the {IMAGE_MAX_DECODE_PIXELS / 1e6:.0f} MP decode limit"
+        )
+    return None
+
+
+def client_resize_edge(folder) -> int:
+    """
+    Long edge the admin forms downscale uploads to in the browser: the
+    largest responsive size stored for `folder` (1920 for hero, else 1200).
+    """
+    sizes = RESPONSIVE_SIZES_HERO if folder == "hero" else RESPONSIVE_SIZES_BASE
+    return max(max(size) for size in sizes.values())
+
+
+def verify_client_resize(file_storage, folder):
+    """
+    Checks an upload the browser says it downscaled (IMAGE_CLIENT_RESIZE):
+    it must be a JPEG, PNG or WebP that fits client_resize_edge(folder),
+    which is what the admin script produces. Returns an error message, or
+    None if it can be processed. The upload then goes through upload_image()
+    like any other, so every other limit still applies.
+    """
+    edge = client_resize_edge(folder)
+    try:
+        with Image.open(file_storage) as probe:
+            fmt, (w, h) = probe.format, probe.size
+    except Exception:
+        return "it is not a readable image"
+    finally:
+        file_storage.seek(0)
+    if fmt not in CLIENT_RESIZE_FORMATS:
+        return f"a resized upload must be {', '.join(CLIENT_RESIZE_FORMATS)}, not {fmt}"
+    if max(w, h) > edge:
+        return f"{w}x{h} is larger than the {edge}px it should have been resized to"
+    return None
+
+
+def _estimate_working_set(file_storage, folder='general') -> int:
+    """Estimated peak bytes to process an upload, from its header alone."""
+    try:
+        file_storage.seek(0)
+        with Image.open(file_storage) as probe:
+            size = probe.size
+            target = _ingest_size(size, image_limits(folder)[0])
+            if target:
+                # The scaled decode is freed once it has been downscaled
+                return (_decoded_bytes(_decode_size(probe, target), probe.mode)
+                        + int(_decoded_bytes(target, probe.mode) * WORKING_SET_FACTOR))
+            return int(_decoded_bytes(size, probe.mode) * WORKING_SET_FACTOR)
+    except Exception:
+        return 0  # unreadable; the upload itself reports the error
+
+
+def _draft_for_sizes(img: Image.Image, sizes) -> bool:
+    """
+    Configures a not-yet-loaded JPEG to decode at the smallest DCT scale whose
+    long edge is still DRAFT_REDUCING_GAP x the largest of `sizes`.
+    Returns True if the decode size was reduced.
+    """
+    if not IMAGE_DRAFT_DECODE or img.format not in ("JPEG", "MPO"):
+        return False
+
+    w, h = img.size
+    scale = max(max(size) for size in sizes.values()) * DRAFT_REDUCING_GAP / max(w, h)
+    if scale > 0.5:
+        return False  # libjpeg cannot scale by less than 1/2
+
+    img.draft(None, (math.ceil(w * scale), math.ceil(h * scale)))
+    return img.size != (w, h)
+
+
+def _decode_source(source) -> Image.Image:
+    """Full-resolution, EXIF-transposed decode of the upload's bytes or a seekable file."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    source.seek(0)
+    return ImageOps.exif_transpose(Image.open(source))
+
+
+def _render_source_chain(source, chain, background_rgb=(255, 255, 255)) -> dict:
+    """
+    Runs _render_chain on a full-resolution decode of `source`. Used for the
+    original when the variants were rendered from a draft decode. Returns
+    (rendered, encodings).
+    """
+    encodings = {}
+    return _render_chain(_decode_source(source), chain, background_rgb, encodings), encodings
+
+
+def _render_chain_shared(shm_name, mode, img_size, info, palette, chain, background_rgb):
+    """
+    Process-pool entry point for _render_chain.
+
+    The decoded pixels live in a shared memory block written once by the parent,
+    so each worker rebuilds the image without re-decoding or re-pickling it.
+    Returns (rendered, encodings).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img = Image.frombytes(mode, img_size, bytes(shm.buf))
+    finally:
+        shm.close()
+
+    img.info.update(info)
+    if palette:
+        palette_mode, palette_data = palette
+        img.putpalette(palette_data, rawmode=palette_mode)
+
+    encodings = {}
+    return _render_chain(img, chain, background_rgb, encodings), encodings
+
+
+def _render_chains_in_pool(executor, img, chains, background_rgb, source=None, source_chains=()):
+    """
+    Renders each chain on `executor` in parallel.
+    `source_chains` are rendered from a fresh decode of `source` (bytes) instead of `img`.
+    Returns ({name: {format: bytes}}, encodings) for every variant the chains encode.
+    """
+    source_futures = [
+        executor.submit(_render_source_chain, source, chain, background_rgb)
+        for chain in source_chains
+    ]
+    if not chains:
+        return _merge_rendered(source_futures)
+
+    pixels = img.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(len(pixels), 1))
+    try:
+        shm.buf[:len(pixels)] = pixels
+        del pixels
+
+        palette = None
+        if img.mode in ("P", "PA") and img.palette is not None:
+            palette = (img.palette.mode, img.getpalette(img.palette.mode))
+
+        futures = [
+            executor.submit(
+                _render_chain_shared,
+                shm.name, img.mode, img.size, dict(img.info), palette,
+                chain, background_rgb
+            )
+            for chain in chains
+        ]
+        return _merge_rendered(futures + source_futures)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _stream_chain(storage, img: Image.Image, chain, planned, background_rgb, variants=None) -> dict:
+    """
+    Encodes and uploads one chain's variants one at a time, closing each
+    spooled buffer as soon as it is stored. Returns {s3_key: seconds}.
+    """
+    uploads = {}
+    for name, fmt, buf, encoding in _iter_chain(img, chain, background_rgb, spool=True):
+        with buf:
+            s3_key = planned[name][fmt]
+            if variants is not None:
+                variants[s3_key] = {**describe_image(buf), **encoding}
+            uploads[s3_key] = _upload_fileobj(storage, buf, s3_key, _content_type_for_format(fmt))
+    return uploads
+
+
+def describe_image(fileobj) -> dict:
+    """Width, height and size in bytes of an encoded image, read from its header."""
+    fileobj.seek(0, io.SEEK_END)
+    nbytes = fileobj.tell()
+    fileobj.seek(0)
+    with Image.open(fileobj) as encoded:
+        width, height = encoded.size
+    fileobj.seek(0)
+    return {'width': width, 'height': height, 'bytes': nbytes}
+
+
+def _merge_rendered(futures):
+    rendered, encodings = {}, {}
+    for future in futures:
+        chain_rendered, chain_encodings = future.result()
+        rendered.update(chain_rendered)
+        encodings.update(chain_encodings)
+    return rendered, encodings
+
+
+def _content_digest(img: Image.Image, fmt: str) -> str:
+    """
+    Hash of the normalized (EXIF-transposed) pixels plus the settings that
+    affect the encoded output, so re-uploading the same photo under a
+    different filename or with different metadata yields the same keys.
+    """
+    h = hashlib.sha256()
+    quality = f"q{JPEG_QUALITY},{WEBP_QUALITY},{AVIF_QUALITY}"
+    if IMAGE_QUALITY_MODE == "ssim":
+        quality += f",ssim{IMAGE_TARGET_SSIM},min{IMAGE_MIN_QUALITY}"
+    h.update(f"{img.mode}|{img.size}|{fmt}|{quality}|".encode())
+    if img.mode in ("P", "PA") and img.palette is not None:
+        h.update(bytes(img.getpalette(img.palette.mode)))
+    # Hash in row bands rather than one tobytes() copy of the whole image
+    width, height = img.size
+    for top in range(0, height, 256):
+        h.update(img.crop((0, top, width, min(top + 256, height))).tobytes())
+    return h.hexdigest()[:CONTENT_DIGEST_LENGTH]
+
+
+def _placeholder_data_uri(img: Image.Image):
+    """
+    A PLACEHOLDER_LONG_EDGE-pixel preview of `img` as a data: URI. None for
+    images with transparency, whose see-through areas would keep showing the
+    placeholder once the real image has loaded.
+    """
+    if img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info:
+        return None
+    if img.mode in ("P", "1"):
+        img = img.convert("RGB")
+
+    scale = PLACEHOLDER_LONG_EDGE / max(img.size)
+    size = tuple(max(1, round(dim * scale)) for dim in img.size)
+    tiny = img.resize(size, Image.Resampling.BOX).convert("RGB")
+
+    fmt = "WEBP" if features.check("webp") else "JPEG"
+    buf = io.BytesIO()
+    tiny.save(buf, format=fmt, quality=PLACEHOLDER_QUALITY)
+    return f"data:{_content_type_for_format(fmt)};base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
+
+
+def perceptual_hash(img: Image.Image) -> str:
+    """
+    64-bit difference hash (dHash) of `img` as 16 hex digits. Copies of a
+    photo that differ only in size, encoding or metadata hash the same or a
+    few bits apart (see hamming_distance()).
+    """
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    tiny = img.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BOX).convert("L")
+    pixels = tiny.tobytes()
+    bits = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{DHASH_SIZE * DHASH_SIZE // 4}x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    """Number of differing bits between two perceptual_hash() values."""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def hash_upload(fileobj):
+    """
+    perceptual_hash() of an uploaded or stored image without processing it:
+    JPEGs are decoded at 1/8 scale. None if the file cannot be read.
+    """
+    try:
+        fileobj.seek(0)
+        with Image.open(fileobj) as img:
+            img.draft(None, (DHASH_SIZE * 8, DHASH_SIZE * 8))
+            return perceptual_hash(ImageOps.exif_transpose(img))
+    except Exception as e:
+        print(f"Could not hash image: {e}")
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def _upload_fileobj(storage, fileobj, s3_key: str, content_type: str) -> float:
+    """Stores one object from a file-like object and returns the elapsed wall time in seconds."""
+    started = time.perf_counter()
+    storage.put(s3_key, fileobj, content_type)
+    return time.perf_counter() - started
+
+
+def stored_formats_label(formats=None) -> str:
+    """Comma-separated alternate formats stored next to each image, e.g. "avif,webp"."""
+    return ",".join(fmt.lower() for fmt in (ALTERNATE_FORMATS if formats is None else formats))
+
+
+def stored_formats_for_key(s3_key: str) -> str:
+    """Alternate formats upload_image() stores next to a non-responsive upload's key."""
+    if not s3_key or s3_key.lower().endswith('.gif'):
+        return ""
+    return stored_formats_label()
+
+
+def format_key(s3_key: str, fmt: str) -> str:
+    """Key of the `fmt` encoding stored alongside `s3_key` (same name, different extension)."""
+    if not s3_key:
+        return s3_key
+    ext = FORMAT_TO_EXTENSION.get(fmt.upper(), fmt.lower())
+    return f"{s3_key.rsplit('.', 1)[0]}.{ext}"
+
+
+def upload_image(file_storage, folder='general', create_responsive_versions=False, executor=None,
+                 timings=None, streaming=None, variants=None, include_original=True, errors=None):
     """
-    Uploads an image to S3 and returns:
+    Uploads an image to the configured storage (see app.utils.storage) and returns:
       - a single S3 key (non-responsive), OR
       - a dict of S3 keys (responsive sizes + original)
 
     Enhancements:
       - Hero uploads get an XL (1920) version for crisp desktop hero rendering
       - LANCZOS resampling for highest resize quality
-      - JPEG quality tuning (quality=88, optimize, progressive)
+      - JPEG draft decoding (IMAGE_DRAFT_DECODE): responsive variants are
+        rendered from a DCT-scaled decode; the full-resolution decode is only
+        done for the original, and only if it still needs to be stored
+      - Cascaded downscaling (IMAGE_RESIZE_MODE): each size is resized from
+        the next larger one rather than from the full-resolution image
+      - JPEG quality tuning (quality=88, optimize, progressive), or per-variant
+        SSIM-targeted JPEG/WebP quality with IMAGE_QUALITY_MODE=ssim
       - Minimum resolution guard for hero uploads (rejects too-small images)
       - PNG alpha flattening when saving JPEG (prevents RGBA -> JPEG crash)
       - ContentType derived from detected format
+      - Optional process-pool rendering: the image is decoded once and each
+        size is resized/encoded in parallel (pass `executor`, or set
+        IMAGE_PROCESS_WORKERS). Output is byte-identical to the sequential path.
+      - Variant uploads run concurrently on a shared, bounded thread pool (S3).
+      - Keys are content-addressed (`<folder>/<hash>[-<size>].<ext>`), and any
+        variant whose key already exists is neither rendered nor re-uploaded.
+      - Every variant is also stored as AVIF/WebP (ALTERNATE_FORMATS) under the
+        same key with a different extension. Responsive results include them as
+        "<size>_<format>" entries plus "formats" (see stored_formats_label()).
+      - Responsive results also carry a "placeholder": a ~20px WebP data: URI
+        for templates to inline while the real image loads (LQIP). Images
+        with transparency get none.
+      - Streaming mode (`streaming`, default IMAGE_STREAMING_UPLOADS) bounds
+        memory: variants are rendered and uploaded one at a time through
+        spooled temp files, and the upload waits for room in the per-process
+        IMAGE_MEMORY_BUDGET_MB before decoding (rejected if it can never fit).
+      - Per-folder ingest limits (image_limits()) checked from the header:
+        images over the pixel limit are downscaled before anything else
+        happens, uploads over the byte limit or too large to decode safely
+        are rejected.
+
+    Pass a dict as `timings` to receive a per-stage breakdown in seconds:
+    decode, hash, render, upload (wall time for all objects), total,
+    uploads ({s3_key: seconds} per object) and reused (variants skipped
+    because they already existed), plus decoded_bytes (pixel memory of
+    every decode the upload needed).
+
+    Pass a dict as `variants` to receive {s3_key: {width, height, bytes}} for
+    every object stored by this call (reused objects are not re-measured).
+    The original's entry also carries its "dhash" (perceptual_hash()), even
+    when the original itself was reused. With IMAGE_QUALITY_MODE=ssim, JPEG
+    and WebP entries also carry the searched "quality" and "bytes_saved".
+
+    With include_original=False (responsive only) just the resized sizes are
+    rendered and returned, e.g. when backfilling sizes for an image whose
+    original is already stored.
+
+    Pass a list as `errors` to receive the reason when None is returned
+    (e.g. "file is 30.0 MB, over the 25 MB limit for 'gallery'"), for
+    showing to whoever uploaded the image. Reasons retrying cannot fix are
+    ImageRejected instances; the rest (e.g. a storage failure, or waiting
+    too long for the memory budget) are plain strings.
     """
-    original_filename = secure_filename(file_storage.filename)
-    unique_prefix = f"{uuid.uuid4().hex[:8]}"
+    errors = [] if errors is None else errors
+    error = _check_ingest_limits(file_storage, folder)
+    if error:
+        return _rejected(errors, error)
+
+    streaming = IMAGE_STREAMING_UPLOADS if streaming is None else streaming
+    if not streaming:
+        return _upload_image(file_storage, folder, create_responsive_versions, executor, timings,
+                             variants=variants, include_original=include_original, errors=errors)
+
+    _pin_mmap_threshold()
+    needed = _estimate_working_set(file_storage, folder)
+    try:
+        with MEMORY_BUDGET.reserve(needed, timeout=IMAGE_MEMORY_BUDGET_WAIT):
+            return _upload_image(file_storage, folder, create_responsive_versions, None, timings,
+                                 streaming=True, variants=variants, include_original=include_original,
+                                 errors=errors)
+    except MemoryError as e:
+        # More than the whole budget never fits; a wait that timed out may succeed later
+        return _rejected(errors, str(e), final=0 < MEMORY_BUDGET.limit < needed)
+
+
+def _rejected(errors, reason, final=True):
+    """
+    Records why an upload was not stored, for upload_image() to return None
+    with: an ImageRejected if retrying cannot help (`final`), else the text.
+    """
+    print(f"Image rejected: {reason}")
+    errors.append(ImageRejected(reason) if final else reason)
+    return None
+
+
+def _upload_image(file_storage, folder, create_responsive_versions, executor, timings, streaming=False,
+                  variants=None, include_original=True, errors=None):
+    timings = {} if timings is None else timings
+    errors = [] if errors is None else errors
+    started = time.perf_counter()
+
+    # Select responsive sizes (hero gets XL)
+    responsive_sizes = RESPONSIVE_SIZES_HERO if folder == "hero" else RESPONSIVE_SIZES_BASE
 
     try:
         file_storage.seek(0)
         img = Image.open(file_storage)
-        img = ImageOps.exif_transpose(img)
         img_format = (img.format or 'JPEG').upper()
+        if img_format == "MPO":
+            # Phone photos often open as MPO (a JPEG with extra preview/depth frames);
+            # only the primary frame is kept, so store it as a plain JPEG
+            img_format = "JPEG"
+        source_size = img.size
+        target = _ingest_size(source_size, image_limits(folder)[0])
+        if target:
+            # Over the folder's pixel limit: downscale now, and treat the result as the upload
+            if img_format == "JPEG":
+                img.draft(None, target)
+            decoded_bytes = _decoded_bytes(img.size, img.mode)
+            img.load()
+            img = img.resize(target, LANCZOS)
+            drafted = False
+        else:
+            # Variants only need a fraction of the pixels; the original is decoded in full later if needed
+            drafted = create_responsive_versions and _draft_for_sizes(img, responsive_sizes)
+            decoded_bytes = _decoded_bytes(img.size, img.mode)
+        img = ImageOps.exif_transpose(img)
     except Exception as e:
         print(f"Error processing image orientation: {e}")
+        errors.append(ImageRejected(f"it could not be read as an image ({e})"))
         return None
+    timings['decode'] = time.perf_counter() - started
 
     # Optional: choose a background that matches your theme (cream)
     # background_rgb = (251, 245, 239)  # #fbf5ef
@@ -146,92 +984,172 @@ def upload_image(file_storage, folder='general', create_responsive_versions=Fals
 
     # Minimum resolution guard (hero only)
     if folder == "hero":
-        w, h = img.size
+        w, h = source_size
         long_edge = max(w, h)
         if long_edge < HERO_MIN_LONG_EDGE_PX:
-            print(
-                f"Hero image rejected: resolution too small ({w}x{h}). "
-                f"Please upload at least {HERO_MIN_LONG_EDGE_PX}px on the long edge for a crisp hero."
+            return _rejected(
+                errors,
+                f"the resolution is too small for a hero image ({w}x{h}); "
+                f"upload at least {HERO_MIN_LONG_EDGE_PX}px on the long edge for a crisp hero"
             )
-            return None
-
-    content_type = _content_type_for_format(img_format)
 
-    # Select responsive sizes (hero gets XL)
-    responsive_sizes = RESPONSIVE_SIZES_HERO if folder == "hero" else RESPONSIVE_SIZES_BASE
+    # Content-addressed keys: identical pixels always map to the same objects
+    hash_started = time.perf_counter()
+    digest = _content_digest(img, img_format)
+    timings['hash'] = time.perf_counter() - hash_started
+    placeholder = _placeholder_data_uri(img) if create_responsive_versions else None
+    dhash = perceptual_hash(img) if include_original else None
 
-    # --- Simple Upload (Non-responsive) ---
     if not create_responsive_versions:
-        s3_key = f"{folder}/{unique_prefix}-{original_filename}"
-        try:
-            img_to_save = _normalize_for_save(img, img_format, background_rgb=background_rgb)
-            in_mem_file = _save_image_to_bytes(img_to_save, img_format)
-
-            s3_client.upload_fileobj(
-                in_mem_file,
-                S3_BUCKET,
-                s3_key,
-                ExtraArgs={"ContentType": content_type}
-            )
-            return s3_key
-        except Exception as e:
-            print(f"Error during single S3 upload: {e}")
-            return None
+        variant_sizes = {'original': None}
+    elif include_original:
+        variant_sizes = {**responsive_sizes, 'original': None}
+    else:
+        variant_sizes = dict(responsive_sizes)
+
+    # Animated GIFs would lose their animation, so they keep a single format
+    alternate_formats = [] if img_format == "GIF" else ALTERNATE_FORMATS
+    formats = [img_format] + [fmt for fmt in alternate_formats if fmt != img_format]
+
+    # {name: {format: key}}
+    planned = {}
+    for name in variant_sizes:
+        base = f"{folder}/{digest}-{name}" if create_responsive_versions else f"{folder}/{digest}"
+        planned[name] = {
+            fmt: f"{base}.{FORMAT_TO_EXTENSION.get(fmt, fmt.lower())}" for fmt in formats
+        }
 
-    # --- Responsive Images Logic ---
-    keys = {}
     try:
-        # Upload responsive versions
-        for name, size in responsive_sizes.items():
-            img_copy = img.copy()
-
-            # High-quality resize (LANCZOS)
-            img_copy.thumbnail(size, resample=LANCZOS)
-
-            img_to_save = _normalize_for_save(img_copy, img_format, background_rgb=background_rgb)
-            in_mem_file = _save_image_to_bytes(img_to_save, img_format)
-
-            s3_key = f"{folder}/{unique_prefix}-{name}-{original_filename}"
-            s3_client.upload_fileobj(
-                in_mem_file,
-                S3_BUCKET,
-                s3_key,
-                ExtraArgs={"ContentType": content_type}
-            )
-            keys[name] = s3_key
-
-        # Upload the original, full-size image
-        img_to_save_original = _normalize_for_save(img, img_format, background_rgb=background_rgb)
-        in_mem_original = _save_image_to_bytes(img_to_save_original, img_format)
-
-        s3_key_original = f"{folder}/{unique_prefix}-original-{original_filename}"
-        s3_client.upload_fileobj(
-            in_mem_original,
-            S3_BUCKET,
-            s3_key_original,
-            ExtraArgs={"ContentType": content_type}
-        )
-        keys['original'] = s3_key_original
+        # Skip rendering/uploading anything that is already stored
+        storage = get_storage()
+        existing = storage.existing(key for by_format in planned.values() for key in by_format.values())
+        missing = {}
+        for name in variant_sizes:
+            missing_formats = [fmt for fmt, key in planned[name].items() if key not in existing]
+            if missing_formats:
+                missing[name] = missing_formats
+        timings['reused'] = len(existing)
+
+        render_started = time.perf_counter()
+        chains = _plan_chains(variant_sizes, missing)
+        # A draft decode is too small for the original, which gets its own full decode
+        source_chains = [chain for chain in chains if drafted and chain[0][1] is None]
+        chains = [chain for chain in chains if chain not in source_chains]
+        if source_chains:
+            decoded_bytes += _decoded_bytes(source_size, img.mode)
+        timings['decoded_bytes'] = decoded_bytes
+        executor = (executor or get_process_pool()) if create_responsive_versions and not streaming else None
+
+        if streaming:
+            # Encode and upload one object at a time so only one buffer is alive
+            uploads = {}
+            for chain in chains:
+                uploads.update(_stream_chain(storage, img, chain, planned, background_rgb, variants))
+            img = None  # release the variant decode before the full-size one
+            for chain in source_chains:
+                uploads.update(
+                    _stream_chain(storage, _decode_source(file_storage), chain, planned, background_rgb, variants)
+                )
+            timings['uploads'] = uploads
+            timings['upload'] = sum(uploads.values())
+            timings['render'] = time.perf_counter() - render_started - timings['upload']
+        else:
+            if executor is not None and (chains or source_chains):
+                file_storage.seek(0)
+                source = file_storage.read() if source_chains else None
+                rendered, encodings = _render_chains_in_pool(
+                    executor, img, chains, background_rgb, source, source_chains
+                )
+            else:
+                rendered, encodings = {}, {}
+                for chain in chains:
+                    rendered.update(_render_chain(img, chain, background_rgb, encodings))
+                img = None  # release the variant decode before the full-size one
+                for chain in source_chains:
+                    chain_rendered, chain_encodings = _render_source_chain(file_storage, chain, background_rgb)
+                    rendered.update(chain_rendered)
+                    encodings.update(chain_encodings)
+            timings['render'] = time.perf_counter() - render_started
 
-        return keys
+            upload_started = time.perf_counter()
+            objects = {
+                planned[name][fmt]: (rendered[name][fmt], _content_type_for_format(fmt))
+                for name, missing_formats in missing.items()
+                for fmt in missing_formats
+            }
+            if variants is not None:
+                for name, missing_formats in missing.items():
+                    for fmt in missing_formats:
+                        key = planned[name][fmt]
+                        variants[key] = {
+                            **describe_image(io.BytesIO(objects[key][0])), **encodings.get(name, {}).get(fmt, {})
+                        }
+            timings['uploads'] = storage.put_many(objects)
+            timings['upload'] = time.perf_counter() - upload_started
+        timings['total'] = time.perf_counter() - started
     except Exception as e:
-        print(f"Error during responsive S3 upload: {e}")
+        print(f"Error during image upload: {e}")
+        errors.append(f"storing it failed ({e})")
         return None
 
+    if variants is not None and dhash:
+        variants.setdefault(planned['original'][img_format], {})['dhash'] = dhash
+
+    if not create_responsive_versions:
+        return planned['original'][img_format]
+
+    keys = {}
+    for name, by_format in planned.items():
+        keys[name] = by_format[img_format]
+        for fmt in alternate_formats:
+            keys[f"{name}_{fmt.lower()}"] = by_format[fmt]
+    keys['formats'] = stored_formats_label(alternate_formats)
+    if placeholder:
+        keys['placeholder'] = placeholder
+    return keys
+
 
 def generate_presigned_url(s3_key, expiration=3600):
     """
-    Generate a pre-signed URL to securely access a private S3 object.
+    Returns a URL for a stored image: pre-signed for S3, or served by the
+    app's media route for local storage.
     """
     if not s3_key:
         return None
-    try:
-        response = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET, 'Key': s3_key},
-            ExpiresIn=expiration
-        )
-        return response
-    except Exception as e:
-        print(f"Error generating presigned URL for key {s3_key}: {e}")
-        return None
\ No newline at end of file
+    return get_storage().url_for(s3_key, expiration)
+
+
+def resize_to_width(data: bytes, width: int, fmt: str) -> bytes:
+    """
+    Re-encodes a stored image (raw bytes) at most `width` pixels wide in `fmt`
+    (e.g. "webp"), with the same resampling and quality settings as uploads.
+    Used by the on-demand /img/<key> endpoint. Never upscales.
+    """
+    img = Image.open(io.BytesIO(data))
+    w, h = img.size
+    box = (width, max(1, math.ceil(h * width / w)))
+    _draft_for_sizes(img, {"resized": box})
+    img.thumbnail(box, resample=LANCZOS)
+    fmt = "JPEG" if fmt.upper() == "JPG" else fmt.upper()
+    return _save_image_to_bytes(_normalize_for_save(img, fmt), fmt).getvalue()
+
+
+def resize_fallback_format(data: bytes) -> str:
+    """
+    The format /img/<key> renders a stored image in when its own format (e.g.
+    GIF) is not one resize_to_width() can produce: "png" if it has
+    transparency, "jpeg" otherwise.
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info:
+        return "png"
+    return "jpeg"
+
+
+def supported_resize_formats() -> dict:
+    """{format: file extension} that resize_to_width() can produce with this Pillow build."""
+    return {
+        fmt.lower(): FORMAT_TO_EXTENSION[fmt]
+        for fmt in ("JPEG", "PNG", "WEBP", "AVIF")
+        if fmt in ("JPEG", "PNG") or features.check(fmt.lower())
+    }
@@ -0,0 +1,115 @@
+# app/utils/resize_cache.py
+"""
+Size-bounded disk cache for images resized on demand by the `/img/<key>`
+endpoint (see app/routes/media/routes.py).
+
+Entries live under IMAGE_RESIZE_CACHE_PATH. Every hit bumps the file's
+modification time, and once the directory grows past IMAGE_RESIZE_CACHE_MB
+the least recently used files are deleted. Several worker processes can
+share one directory: writes are atomic renames and eviction works from a
+fresh scan of the directory.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from flask import current_app
+
+# Eviction frees space down to this fraction of the limit, so it does not
+# run again on the very next write
+EVICT_TO_FRACTION = 0.9
+
+
+class DiskLRUCache:
+    """Files under `root`, evicted least recently used first beyond `max_bytes`."""
+
+    def __init__(self, root, max_bytes):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._size = None  # bytes on disk, scanned on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name_for(*parts):
+        """Cache file name for the given identifying parts, e.g. (key, width, format, extension)."""
+        *identity, ext = parts
+        digest = hashlib.sha256("|".join(map(str, identity)).encode()).hexdigest()
+        return f"{digest}.{ext}"
+
+    def path_for(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def get(self, name):
+        """Path of a cached file (marking it recently used), or None."""
+        path = self.path_for(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name, data):
+        """Stores `data` under `name`, evicting old entries if needed. Returns its path."""
+        path = self.path_for(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".resize-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _entries(self):
+        """(mtime, size, path) of every cached file."""
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO_FRACTION
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+def init_resize_cache(app):
+    """Creates the app's resize cache from its config."""
+    app.extensions['image_resize_cache'] = DiskLRUCache(
+        app.config['IMAGE_RESIZE_CACHE_PATH'], app.config['IMAGE_RESIZE_CACHE_MB'] * 1024 * 1024
+    )
+
+
+def get_resize_cache():
+    return current_app.extensions['image_resize_cache']
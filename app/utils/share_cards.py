@@ -0,0 +1,200 @@
+# app/utils/share_cards.py
+"""
+Open Graph share cards for litters and puppies.
+
+A share card is a 1200x630 JPEG composited from the row's cover photo, a
+title (the litter's display_label, or the puppy's name) and a status badge.
+It is rendered when the row's image or status changes, stored like any
+other image object, and its key is kept in the row's `share_image_s3_key`
+column, which the pages put in their og:image meta tags. Crawlers then
+fetch a static, immutable object; nothing is rendered per request.
+
+Card keys are content-addressed over everything drawn on the card, so a
+refresh that changes nothing is a single exists() check, and a card whose
+row changed is replaced (the old one is left to `flask images gc`).
+"""
+
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from app.models import Litter, Puppy, PuppyStatus
+from app.utils.image_uploader import LANCZOS
+from app.utils.storage import get_storage
+
+SHARE_CARD_SIZE = (1200, 630)
+SHARE_CARD_FOLDER = 'share'
+SHARE_CARD_QUALITY = 85
+# Bump when the layout changes so every card is rendered again
+SHARE_CARD_VERSION = 1
+
+# TrueType font for the card text; Pillow's bundled font when unset
+SHARE_CARD_FONT = os.environ.get('SHARE_CARD_FONT') or None
+
+CARD_MARGIN = 60
+CARD_BACKGROUND = (251, 245, 239)  # cream, for rows without a photo
+TITLE_SIZES = (64, 56, 48, 40)
+SUBTITLE_SIZE = 34
+BADGE_SIZE = 32
+BADGE_COLOURS = {
+    PuppyStatus.AVAILABLE: (25, 135, 84),
+    PuppyStatus.RESERVED: (204, 136, 0),
+    PuppyStatus.SOLD: (108, 117, 125),
+}
+
+
+def _font(size):
+    if SHARE_CARD_FONT:
+        return ImageFont.truetype(SHARE_CARD_FONT, size)
+    return ImageFont.load_default(size)
+
+
+def _cover_key(row):
+    """Key of the smallest stored rendition of `row`'s photo that covers the card."""
+    asset = row.main_image_asset
+    if asset is not None:
+        variant = asset.variant_for(SHARE_CARD_SIZE[0])
+        if variant is not None:
+            return variant.key
+    return row.main_image_s3_key
+
+
+def litter_card(litter):
+    """(cover key, title, subtitle, badge text, badge colour) of a litter's card."""
+    cover = litter.main_image_s3_key and _cover_key(litter)
+    if not cover:
+        # Same fallback as the litter tiles (litters.html): the first puppy's photo, if it has one
+        puppy = litter.puppies[0] if litter.puppies else None
+        cover = _cover_key(puppy) if puppy is not None and puppy.main_image_s3_key else None
+
+    available = sum(1 for puppy in litter.puppies if puppy.status == PuppyStatus.AVAILABLE)
+    if available:
+        badge = (f"{available} {'puppy' if available == 1 else 'puppies'} available",
+                 BADGE_COLOURS[PuppyStatus.AVAILABLE])
+    elif litter.puppies:
+        statuses = {puppy.status for puppy in litter.puppies}
+        if statuses == {PuppyStatus.SOLD}:
+            badge = ('All puppies sold', BADGE_COLOURS[PuppyStatus.SOLD])
+        elif statuses == {PuppyStatus.RESERVED}:
+            badge = ('All puppies reserved', BADGE_COLOURS[PuppyStatus.RESERVED])
+        else:
+            badge = ('All puppies reserved or sold', BADGE_COLOURS[PuppyStatus.RESERVED])
+    else:
+        badge = (None, None)
+    born = f"Born {litter.birth_date:%B} {litter.birth_date.day}, {litter.birth_date.year}" if litter.birth_date else None
+    subtitle = ' · '.join(part for part in (litter.breed_name, born) if part) or None
+    return (cover, litter.display_label, subtitle, *badge)
+
+
+def puppy_card(puppy):
+    """(cover key, title, subtitle, badge text, badge colour) of a puppy's card."""
+    cover = _cover_key(puppy) if puppy.main_image_s3_key else None
+    subtitle = puppy.litter.display_label if puppy.litter else None
+    return cover, puppy.name, subtitle, puppy.status.value, BADGE_COLOURS.get(puppy.status)
+
+
+def _fit_text(draw, text, sizes, max_width):
+    """The largest of `sizes` that fits `text` in `max_width`, shortening the text if none does."""
+    for size in sizes:
+        font = _font(size)
+        if draw.textlength(text, font=font) <= max_width:
+            return text, font
+    while len(text) > 1 and draw.textlength(text + '…', font=font) > max_width:
+        text = text[:-1]
+    return text.rstrip() + '…', font
+
+
+def render_share_card(cover, title, subtitle=None, badge=None, badge_colour=None) -> bytes:
+    """
+    Composites a SHARE_CARD_SIZE JPEG: `cover` (a PIL image, or None for a
+    plain background) cropped to fill the card, `title` and `subtitle` over
+    a dark gradient along the bottom, and `badge` as a pill in the corner.
+    """
+    width, height = SHARE_CARD_SIZE
+    if cover is not None:
+        card = ImageOps.fit(cover.convert('RGB'), SHARE_CARD_SIZE, LANCZOS, centering=(0.5, 0.4))
+    else:
+        card = Image.new('RGB', SHARE_CARD_SIZE, CARD_BACKGROUND)
+
+    # Darken the lower half so white text stays legible on any photo
+    shade_height = height // 2
+    shade = Image.linear_gradient('L').resize((width, shade_height)).point(lambda v: v * 3 // 4)
+    card.paste((0, 0, 0), (0, height - shade_height, width, height), shade)
+
+    draw = ImageDraw.Draw(card)
+    text_width = width - 2 * CARD_MARGIN
+    bottom = height - CARD_MARGIN
+    if subtitle:
+        subtitle, font = _fit_text(draw, subtitle, (SUBTITLE_SIZE,), text_width)
+        draw.text((CARD_MARGIN, bottom), subtitle, font=font, fill=(235, 235, 235), anchor='ls')
+        bottom -= SUBTITLE_SIZE + 24
+    title, font = _fit_text(draw, title, TITLE_SIZES, text_width)
+    draw.text((CARD_MARGIN, bottom), title, font=font, fill=(255, 255, 255), anchor='ls')
+
+    if badge:
+        font = _font(BADGE_SIZE)
+        origin = (CARD_MARGIN + 24, CARD_MARGIN + 14)
+        _, _, right, bottom = draw.textbbox(origin, badge, font=font)
+        pill = (CARD_MARGIN, CARD_MARGIN, right + 24, bottom + 14)
+        draw.rounded_rectangle(pill, radius=(pill[3] - pill[1]) // 2,
+                               fill=badge_colour or BADGE_COLOURS[PuppyStatus.SOLD])
+        draw.text(origin, badge, font=font, fill=(255, 255, 255))
+
+    buf = io.BytesIO()
+    card.save(buf, format='JPEG', quality=SHARE_CARD_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _load_cover(storage, key):
+    data = storage.get(key) if key else None
+    if data is None:
+        return None
+    img = Image.open(io.BytesIO(data))
+    img.draft('RGB', SHARE_CARD_SIZE)
+    return ImageOps.exif_transpose(img)
+
+
+def refresh_share_card(row):
+    """
+    Makes sure `row` (a Litter or Puppy) has an up-to-date share card,
+    rendering and storing it if its content changed. The caller commits.
+    Returns True if a new card was stored. Errors are printed, never
+    raised, so a failed card never blocks a save.
+    """
+    describe = litter_card if isinstance(row, Litter) else puppy_card if isinstance(row, Puppy) else None
+    if describe is None:
+        return False
+
+    try:
+        content = describe(row)
+        digest = hashlib.sha256(repr((SHARE_CARD_VERSION, SHARE_CARD_SIZE, content)).encode()).hexdigest()[:32]
+        key = f"{SHARE_CARD_FOLDER}/{digest}.jpg"
+        storage = get_storage()
+        rendered = False
+        if not storage.exists(key):
+            cover_key, title, subtitle, badge, colour = content
+            storage.put(key, render_share_card(_load_cover(storage, cover_key), title, subtitle, badge, colour),
+                        'image/jpeg')
+            rendered = True
+        row.share_image_s3_key = key
+        return rendered
+    except Exception as e:
+        print(f"Error rendering share card for {row!r}: {e}")
+        return False
+
+
+def refresh_share_cards(row):
+    """
+    Refreshes every card that shows `row`: a puppy's own card and its
+    litter's (whose badge counts the available puppies), or a litter's card
+    and its puppies' (which name the litter). Returns the number of cards
+    stored.
+    """
+    rows = [row]
+    if isinstance(row, Puppy) and row.litter is not None:
+        rows.append(row.litter)
+    elif isinstance(row, Litter):
+        rows.extend(row.puppies)
+    return sum(refresh_share_card(r) for r in rows)
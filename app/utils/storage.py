@@ -0,0 +1,343 @@
+# app/utils/storage.py
+"""
+Pluggable storage for uploaded images.
+
+Two backends share one interface (put, put_many, get, exists, existing,
+iter_objects, delete_many, url_for, presigned_post):
+
+  - S3Storage:    the production bucket; URLs are pre-signed.
+  - LocalStorage: files under a directory on disk, served by the `media`
+                  blueprint with long-lived cache headers. No network, so
+                  it suits development, tests, benchmarks and small
+                  single-server deployments.
+
+The backend is picked by the IMAGE_STORAGE config value ("s3" or "local").
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from flask import current_app, has_app_context, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+from werkzeug.security import safe_join
+
+# --- S3 Configuration ---
+S3_BUCKET = os.environ.get('S3_BUCKET_NAME')
+S3_REGION = os.environ.get('S3_BUCKET_REGION')
+# Optional custom endpoint (e.g. MinIO or moto_server) for local testing
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+
+# Threads used to upload the variants of a single image concurrently.
+S3_UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS') or 8)
+# The HTTP connection pool must be at least as large as the upload pool,
+# otherwise threads queue up waiting for a free connection.
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS') or max(10, S3_UPLOAD_WORKERS * 2))
+
+# Transfer tuning for upload_fileobj (multipart kicks in above the threshold)
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get('S3_MULTIPART_THRESHOLD_MB') or 8) * 1024 * 1024,
+    max_concurrency=int(os.environ.get('S3_TRANSFER_CONCURRENCY') or 4),
+)
+
+# DeleteObjects accepts at most this many keys per request
+S3_DELETE_BATCH_SIZE = 1000
+
+# Keys are content-addressed, so a stored object never changes
+LOCAL_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _as_fileobj(data):
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+
+class Storage:
+    """Base class for storage backends."""
+
+    def put(self, key, data, content_type):
+        """Stores `data` (bytes or a readable file object) under `key`."""
+        raise NotImplementedError
+
+    def put_many(self, objects):
+        """
+        Stores {key: (data, content_type)}.
+        Returns {key: seconds} per object. Raises the first error encountered.
+        """
+        timings = {}
+        for key, (data, content_type) in objects.items():
+            started = time.perf_counter()
+            self.put(key, data, content_type)
+            timings[key] = time.perf_counter() - started
+        return timings
+
+    def get(self, key):
+        """The stored bytes of `key`, or None if it does not exist."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def existing(self, keys):
+        """Returns the subset of `keys` that are already stored."""
+        return {key for key in keys if self.exists(key)}
+
+    def iter_objects(self, prefix=''):
+        """Yields (key, size in bytes, last modified as an aware UTC datetime) for every stored object."""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        """Deletes `keys` (missing ones are ignored). Returns the number of keys deleted or already gone."""
+        raise NotImplementedError
+
+    def url_for(self, key, expiration=3600):
+        """A URL the browser can load `key` from, or None."""
+        raise NotImplementedError
+
+    def presigned_post(self, key, max_bytes, expiration=3600):
+        """
+        {url, fields} of a form POST that lets a browser store one file of
+        at most `max_bytes` under `key` (the file goes last, as "file").
+        """
+        raise NotImplementedError
+
+
+class S3Storage(Storage):
+    """Objects in an S3 bucket. The boto3 client is created on first use."""
+
+    def __init__(self, bucket=S3_BUCKET, client=None):
+        self.bucket = bucket
+        self._client = client
+        self._pool = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                "s3",
+                region_name=S3_REGION,
+                endpoint_url=S3_ENDPOINT_URL,
+                config=BotoConfig(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+            )
+        return self._client
+
+    def put(self, key, data, content_type):
+        self.client.upload_fileobj(
+            _as_fileobj(data),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=S3_TRANSFER_CONFIG
+        )
+
+    def _timed_put(self, key, data, content_type):
+        started = time.perf_counter()
+        self.put(key, data, content_type)
+        return time.perf_counter() - started
+
+    def put_many(self, objects):
+        """Uploads concurrently over a bounded thread pool."""
+        futures = {
+            key: self._pool.submit(self._timed_put, key, data, content_type)
+            for key, (data, content_type) in objects.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def existing(self, keys):
+        """Checked concurrently, one HEAD request per key."""
+        keys = list(keys)
+        found = self._pool.map(self.exists, keys)
+        return {key for key, exists in zip(keys, found) if exists}
+
+    def iter_objects(self, prefix=''):
+        """Pages through the bucket listing (1000 keys per request)."""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'], obj['Size'], obj['LastModified']
+
+    def delete_many(self, keys):
+        """One DeleteObjects request per S3_DELETE_BATCH_SIZE keys."""
+        keys = list(keys)
+        failed = 0
+        for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            ) or {}
+            # Quiet mode only lists the keys that could not be deleted
+            for error in response.get('Errors', []):
+                print(f"Error deleting {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                failed += 1
+        return len(keys) - failed
+
+    def url_for(self, key, expiration=3600):
+        """Generate a pre-signed URL to securely access a private S3 object."""
+        if not key:
+            return None
+        try:
+            return self.client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': key},
+                ExpiresIn=expiration
+            )
+        except Exception as e:
+            print(f"Error generating presigned URL for key {key}: {e}")
+            return None
+
+    def presigned_post(self, key, max_bytes, expiration=3600):
+        """An S3 POST policy; the bucket's CORS rules must allow POST from the site."""
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Conditions=[["content-length-range", 1, max_bytes]],
+            ExpiresIn=expiration
+        )
+
+
+class LocalStorage(Storage):
+    """Files under `root`, served by the `media` blueprint."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path_for(self, key):
+        """Absolute path of `key`, or None if the key would escape the storage root."""
+        return safe_join(self.root, key) if key else None
+
+    def put(self, key, data, content_type):
+        path = self.path_for(key)
+        if path is None:
+            raise ValueError(f"Invalid storage key: {key!r}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(_as_fileobj(data), out)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        path = self.path_for(key)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def exists(self, key):
+        path = self.path_for(key)
+        return path is not None and os.path.isfile(path)
+
+    def iter_objects(self, prefix=''):
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue  # in-progress writes
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield key, stat.st_size, datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    def delete_many(self, keys):
+        count = 0
+        for key in keys:
+            path = self.path_for(key)
+            if path is not None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            count += 1
+        return count
+
+    def url_for(self, key, expiration=3600):
+        if not key:
+            return None
+        return url_for('media.serve', key=key)
+
+    def presigned_post(self, key, max_bytes, expiration=3600):
+        """
+        The local stand-in for an S3 POST policy: a signed form for the
+        `media.direct_upload` route, which checks it with verify_post().
+        """
+        policy = _post_serializer().dumps({'key': key, 'max_bytes': max_bytes, 'expires': time.time() + expiration})
+        return {'url': url_for('media.direct_upload'), 'fields': {'key': key, 'policy': policy}}
+
+    def verify_post(self, fields):
+        """(key, max bytes) of an unexpired presigned_post() form, or None."""
+        try:
+            policy = _post_serializer().loads(fields.get('policy') or '')
+        except BadSignature:
+            return None
+        if policy.get('key') != fields.get('key') or policy.get('expires', 0) < time.time():
+            return None
+        return policy['key'], policy['max_bytes']
+
+
+def _post_serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='local-storage-post')
+
+
+def create_storage(backend, local_path=None):
+    """Builds the backend named by IMAGE_STORAGE."""
+    backend = (backend or 's3').lower()
+    if backend == 'local':
+        return LocalStorage(local_path)
+    if backend == 's3':
+        return S3Storage()
+    raise ValueError(f"Unknown IMAGE_STORAGE backend: {backend!r}")
+
+
+_default_storage = None
+
+
+def init_storage(app):
+    """Creates the app's storage backend from its config."""
+    app.extensions['image_storage'] = create_storage(
+        app.config.get('IMAGE_STORAGE'), app.config.get('LOCAL_STORAGE_PATH')
+    )
+
+
+def get_storage():
+    """
+    The storage backend in use: the current app's, or, outside an app
+    context (process-pool workers, scripts), one built from Config.
+    """
+    if has_app_context() and 'image_storage' in current_app.extensions:
+        return current_app.extensions['image_storage']
+
+    global _default_storage
+    if _default_storage is None:
+        from config import Config
+        _default_storage = create_storage(Config.IMAGE_STORAGE, Config.LOCAL_STORAGE_PATH)
+    return _default_storage
@@ -1,6 +1,9 @@
 # app/utils/template_filters.py
 
-from .image_uploader import generate_presigned_url
+from flask import url_for
+
+from .cache_stats import CacheCounters
+from .image_uploader import generate_presigned_url, format_key
 # The 'from app import cache' line should be removed from the top of the file.
 
 def setup_template_filters(app):
@@ -13,14 +16,120 @@ def setup_template_filters(app):
     # and it avoids the circular import error.
     from app import cache
     
-    @app.template_filter('s3_url')
+    # Hit/miss counts of the presigned URL cache, see `flask images cache-stats`
+    counters = app.extensions['presigned_url_counters'] = CacheCounters('s3_url')
+
     @cache.memoize(timeout=3000)
+    def presigned_url(s3_key):
+        counters.miss()
+        return generate_presigned_url(s3_key)
+
+    @app.template_filter('s3_url')
     def s3_url_filter(s3_key):
         """
         A Jinja2 filter that takes an S3 key and converts it into a
         temporary, pre-signed URL. The result is cached to prevent
-        redundant API calls.
+        redundant API calls; with a shared CACHE_TYPE every worker
+        reuses the URLs the others signed.
+        """
+        if not s3_key:
+            return None
+        counters.lookup()
+        return presigned_url(s3_key)
+
+    @app.template_filter('image_url')
+    def image_url_filter(s3_key):
+        """
+        A URL for `s3_key` that serves the best stored format (AVIF, WebP,
+        or the original) for each browser's Accept header, for images linked
+        or used outside a <picture>. Plain s3_url when negotiation is off.
+        """
+        if not s3_key:
+            return None
+        if app.config.get('IMAGE_FORMAT_NEGOTIATION'):
+            return url_for('media.negotiated', key=s3_key)
+        return s3_url_filter(s3_key)
+
+    @app.template_filter('format_key')
+    def format_key_filter(s3_key, fmt):
+        """
+        Returns the key of the `fmt` encoding (e.g. "webp") stored next to
+        `s3_key`, for use in <picture> sources.
+        """
+        return format_key(s3_key, fmt)
+
+    def _resized_width(variant, width):
+        """Width the /img endpoint renders `variant` at for `width`, or None if it is sent as stored."""
+        if width and variant.name == 'original' and app.config.get('IMAGE_RESIZE_ON_DEMAND'):
+            allowed = [w for w in app.config['IMAGE_RESIZE_WIDTHS'] if w >= width]
+            if allowed and (variant.width is None or variant.width > min(allowed)):
+                return min(allowed)
+        return None
+
+    @app.template_filter('variant_url')
+    def variant_url_filter(asset, width=None, fmt=None):
+        """
+        URL of the smallest stored variant of `asset` (an ImageAsset) at least
+        `width` pixels wide, in `fmt` (default: the source format).
+
+        If only the original is available and it is wider than needed, the
+        on-demand /img endpoint renders the nearest allowed width instead.
+        """
+        variant = asset.variant_for(width, fmt) if asset else None
+        if variant is None:
+            return None
+
+        resized = _resized_width(variant, width)
+        if resized:
+            source = asset.original or variant
+            return url_for('media.resized', key=source.key, w=resized, fmt=variant.format)
+        return s3_url_filter(variant.key)
+
+    @app.template_filter('variant_size')
+    def variant_size_filter(asset, width=None):
+        """
+        (width, height) of the image variant_url sends for `width`, for the
+        <img> width/height attributes, or None if it was never measured.
+        """
+        variant = asset.variant_for(width) if asset else None
+        if variant is None or not (variant.width and variant.height):
+            return None
+        resized = _resized_width(variant, width)
+        if resized:
+            return resized, round(variant.height * resized / variant.width)
+        return variant.width, variant.height
+
+    @app.template_filter('variant_srcset')
+    def variant_srcset_filter(asset, fmt=None):
+        """
+        A srcset ("<url> 480w, <url> 800w, ...") over the measured variants
+        of `asset` in `fmt`, so the browser can pick one for its layout and
+        pixel density. An asset with only its original offers the on-demand
+        widths below it instead. None if there is nothing to choose from.
+        """
+        fmt = fmt or asset.source_format
+        by_width = {}
+        for variant in asset.variants:
+            if variant.format == fmt and variant.width:
+                by_width.setdefault(variant.width, variant)
+
+        candidates = [(width, s3_url_filter(variant.key)) for width, variant in by_width.items()]
+        only = list(by_width.values())
+        if len(only) == 1 and only[0].name == 'original' and app.config.get('IMAGE_RESIZE_ON_DEMAND'):
+            candidates += [
+                (w, url_for('media.resized', key=only[0].key, w=w, fmt=fmt))
+                for w in app.config['IMAGE_RESIZE_WIDTHS'] if w < only[0].width
+            ]
+
+        entries = [f"{url} {width}w" for width, url in sorted(candidates) if url]
+        return ', '.join(entries) if len(entries) > 1 else None
+
+    @app.template_filter('share_card_url')
+    def share_card_url_filter(s3_key):
+        """
+        Absolute, non-expiring URL of a share card for og:image tags, which
+        crawlers may fetch long after a pre-signed URL would have expired.
         """
         if not s3_key:
             return None
-        return generate_presigned_url(s3_key)
\ No newline at end of file
+        return url_for('media.share_card', key=s3_key, _external=True)
@@ -0,0 +1,119 @@
+"""
+Benchmark: JPEG draft (DCT-scaled) decoding for responsive variants.
+
+For every image and size set (base, hero), decodes the upload and renders
+the resized variants as JPEG, once from a full-resolution decode and once
+from a draft decode, and reports:
+
+  - decode: seconds to decode + EXIF-transpose
+  - render: CPU seconds to resize + encode the variants
+  - rss:    peak resident set size (MB), each run in a fresh process
+  - ssim:   lowest per-size SSIM of the draft output against the full-decode
+            output (1.0 = identical)
+
+The original variant is left out: it always needs the full decode.
+
+Usage:
+    python benchmarks/jpeg_draft_decode.py [--gap 2.0] [image ...]    # defaults to seed_images/*.jpg
+"""
+
+import argparse
+import glob
+import io
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from app.utils import image_uploader  # noqa: E402
+from app.utils.image_quality import ssim  # noqa: E402
+
+SIZE_SETS = {
+    "base": image_uploader.RESPONSIVE_SIZES_BASE,
+    "hero": image_uploader.RESPONSIVE_SIZES_HERO,
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(path, sizes, draft, gap):
+    """Runs in a fresh worker process so peak RSS is not shared between runs."""
+    image_uploader.IMAGE_DRAFT_DECODE = draft
+    image_uploader.DRAFT_REDUCING_GAP = gap
+
+    started = time.perf_counter()
+    img = Image.open(path)
+    _draft = image_uploader._draft_for_sizes(img, sizes)
+    img = ImageOps.exif_transpose(img)
+    img.load()
+    decode = time.perf_counter() - started
+    decoded_size = img.size
+
+    chains = image_uploader._plan_chains(dict(sizes), {name: ["JPEG"] for name in sizes})
+    cpu_started = time.process_time()
+    rendered = {}
+    for chain in chains:
+        rendered.update(image_uploader._render_chain(img, chain))
+    render = time.process_time() - cpu_started
+
+    outputs = {name: encoded["JPEG"] for name, encoded in rendered.items()}
+    return decode, render, _peak_rss_mb(), decoded_size, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gap", type=float, default=image_uploader.DRAFT_REDUCING_GAP,
+                        help="DRAFT_REDUCING_GAP to benchmark")
+    parser.add_argument("images", nargs="*")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = args.images or sorted(glob.glob(os.path.join(root, "seed_images", "*.jpg")))
+
+    header = (f"{'image':<28} {'sizes':<5} {'decoded':>11} {'decode s':>9} {'render s':>9} "
+              f"{'rss MB':>11} {'min ssim':>9}")
+    print(f"DRAFT_REDUCING_GAP = {args.gap}\n")
+    print(header)
+    print("-" * len(header))
+
+    totals = {"full": [0.0, 0.0, 0.0], "draft": [0.0, 0.0, 0.0]}
+    for path in paths:
+        for set_name, sizes in SIZE_SETS.items():
+            results = {}
+            for label, draft in (("full", False), ("draft", True)):
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    results[label] = pool.submit(_run, path, sizes, draft, args.gap).result()
+                decode, render, rss = results[label][:3]
+                totals[label][0] += decode
+                totals[label][1] += render
+                totals[label][2] = max(totals[label][2], rss)
+
+            full, draft = results["full"], results["draft"]
+            min_ssim = min(
+                ssim(Image.open(io.BytesIO(full[4][name])), Image.open(io.BytesIO(draft[4][name])))
+                for name in sizes
+            )
+            decoded = "x".join(map(str, draft[3]))
+            print(
+                f"{os.path.basename(path):<28} {set_name:<5} {decoded:>11} "
+                f"{full[0]:>4.2f}/{draft[0]:<4.2f} {full[1]:>4.2f}/{draft[1]:<4.2f} "
+                f"{full[2]:>5.0f}/{draft[2]:<5.0f} {min_ssim:>9.4f}"
+            )
+
+    print("\n(columns show full/draft)\n")
+    for label, (decode, render, rss) in totals.items():
+        print(f"{label:<6} decode {decode:6.2f}s   render {render:6.2f}s   max peak rss {rss:5.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
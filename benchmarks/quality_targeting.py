@@ -0,0 +1,110 @@
+"""
+Benchmark: fixed vs SSIM-targeted encoder quality (IMAGE_QUALITY_MODE).
+
+For every image, renders the base responsive sizes plus the original as JPEG
+and WebP, once at the fixed qualities and once with the per-variant quality
+search, and reports:
+
+  - bytes:   total encoded bytes (fixed/ssim) and the percentage saved
+  - cpu:     process CPU seconds to resize + encode (fixed/ssim)
+  - quality: lowest and highest JPEG quality the search chose
+  - ssim:    lowest SSIM of any variant against a direct LANCZOS resize of
+             the source (fixed/ssim); this includes the cascade's resampling
+             error, so compare the two modes rather than either to the target
+
+Usage:
+    python benchmarks/quality_targeting.py [--target 0.98] [image ...]    # defaults to seed_images/*.jpg
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from app.utils import image_uploader  # noqa: E402
+from app.utils.image_quality import ssim  # noqa: E402
+
+SIZES = {**image_uploader.RESPONSIVE_SIZES_BASE, "original": None}
+FORMATS = ["JPEG", "WEBP"]
+
+
+def _load(path):
+    with Image.open(path) as img:
+        return ImageOps.exif_transpose(img).convert("RGB")
+
+
+def _run(path, mode, target):
+    """Runs in a fresh worker process so each mode starts from the same state."""
+    image_uploader.IMAGE_QUALITY_MODE = mode
+    image_uploader.IMAGE_TARGET_SSIM = target
+    img = _load(path)
+    chains = image_uploader._plan_chains(dict(SIZES), {name: FORMATS for name in SIZES})
+
+    cpu_started = time.process_time()
+    rendered, encodings = {}, {}
+    for chain in chains:
+        rendered.update(image_uploader._render_chain(img, chain, encodings=encodings))
+    cpu = time.process_time() - cpu_started
+
+    total = sum(len(data) for by_format in rendered.values() for data in by_format.values())
+    qualities = [encodings[name]["JPEG"]["quality"] for name in encodings if "JPEG" in encodings[name]]
+
+    lowest = 1.0
+    for name, size in SIZES.items():
+        reference = img.copy()
+        if size is not None:
+            reference.thumbnail(size, resample=image_uploader.LANCZOS)
+        for fmt in FORMATS:
+            lowest = min(lowest, ssim(reference, Image.open(io.BytesIO(rendered[name][fmt]))))
+    return total, cpu, qualities, lowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", type=float, default=image_uploader.IMAGE_TARGET_SSIM,
+                        help="IMAGE_TARGET_SSIM to benchmark")
+    parser.add_argument("images", nargs="*")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = args.images or sorted(glob.glob(os.path.join(root, "seed_images", "*.jpg")))
+
+    header = f"{'image':<28} {'bytes KB':>15} {'saved':>6} {'cpu s':>11} {'quality':>8} {'min ssim':>15}"
+    print(f"IMAGE_TARGET_SSIM = {args.target}, IMAGE_MIN_QUALITY = {image_uploader.IMAGE_MIN_QUALITY}\n")
+    print(header)
+    print("-" * len(header))
+
+    totals = {"fixed": [0, 0.0], "ssim": [0, 0.0]}
+    for path in paths:
+        results = {}
+        for mode in totals:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results[mode] = pool.submit(_run, path, mode, args.target).result()
+            totals[mode][0] += results[mode][0]
+            totals[mode][1] += results[mode][1]
+
+        fixed, searched = results["fixed"], results["ssim"]
+        saved = 1 - searched[0] / fixed[0]
+        qualities = f"{min(searched[2])}-{max(searched[2])}"
+        print(
+            f"{os.path.basename(path):<28} {fixed[0] / 1024:>7.0f}/{searched[0] / 1024:<7.0f} {saved:>6.1%} "
+            f"{fixed[1]:>5.2f}/{searched[1]:<5.2f} {qualities:>8} {fixed[3]:>7.4f}/{searched[3]:<7.4f}"
+        )
+
+    (fixed_bytes, fixed_cpu), (ssim_bytes, ssim_cpu) = totals["fixed"], totals["ssim"]
+    print("\n(columns show fixed/ssim)\n")
+    print(f"bytes  {fixed_bytes / 1024 ** 2:7.2f} MB -> {ssim_bytes / 1024 ** 2:7.2f} MB "
+          f"({fixed_bytes - ssim_bytes:,} bytes, {1 - ssim_bytes / fixed_bytes:.1%} saved)")
+    print(f"cpu    {fixed_cpu:7.2f} s  -> {ssim_cpu:7.2f} s  ({ssim_cpu / fixed_cpu:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cascaded vs direct responsive downscaling.
+
+For every image, renders the hero size set (xl, large, medium, small) as JPEG
+with each IMAGE_RESIZE_MODE and reports:
+
+  - cpu:  process CPU seconds spent resizing + encoding
+  - rss:  peak resident set size (MB) after decode + render, each mode in a
+          fresh process (the decode of the full image dominates this)
+  - ssim: per-size SSIM of the encoded output against an exact single-pass
+          LANCZOS reference resized from the full-resolution image
+
+Usage:
+    python benchmarks/resize_cascade.py [image ...]    # defaults to seed_images/*.jpg
+"""
+
+import glob
+import io
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from app.utils import image_uploader  # noqa: E402
+from app.utils.image_quality import ssim  # noqa: E402
+
+MODES = ("direct", "cascade")
+SIZES = image_uploader.RESPONSIVE_SIZES_HERO
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _load(path):
+    with Image.open(path) as img:
+        return ImageOps.exif_transpose(img).convert("RGB")
+
+
+def _run_mode(path, mode):
+    """Runs in a fresh worker process so peak RSS is not shared between modes."""
+    img = _load(path)
+    chains = image_uploader._plan_chains(
+        dict(SIZES), {name: ["JPEG"] for name in SIZES}, resize_mode=mode
+    )
+
+    cpu_started = time.process_time()
+    rendered = {}
+    for chain in chains:
+        rendered.update(image_uploader._render_chain(img, chain))
+    cpu = time.process_time() - cpu_started
+    rss = _peak_rss_mb()
+
+    scores = {}
+    for name, size in SIZES.items():
+        out = Image.open(io.BytesIO(rendered[name]["JPEG"]))
+        reference = img.resize(out.size, Image.Resampling.LANCZOS)
+        scores[name] = ssim(reference, out)
+    return cpu, rss, scores
+
+
+def main(paths):
+    totals = {mode: [0.0, 0.0] for mode in MODES}
+    header = f"{'image':<28} {'mode':<8} {'cpu s':>7} {'rss MB':>7}  " + " ".join(f"{n:>7}" for n in SIZES)
+    print(header)
+    print("-" * len(header))
+
+    for path in paths:
+        for mode in MODES:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                cpu, rss, scores = pool.submit(_run_mode, path, mode).result()
+            totals[mode][0] += cpu
+            totals[mode][1] = max(totals[mode][1], rss)
+            print(
+                f"{os.path.basename(path):<28} {mode:<8} {cpu:>7.2f} {rss:>7.0f}  "
+                + " ".join(f"{scores[n]:>7.4f}" for n in SIZES)
+            )
+
+    print()
+    for mode in MODES:
+        cpu, rss = totals[mode]
+        print(f"{mode:<8} total cpu {cpu:6.2f}s   max peak rss {rss:5.0f} MB")
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    main(sys.argv[1:] or sorted(glob.glob(os.path.join(root, "seed_images", "*.jpg"))))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -16,6 +17,50 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Flask-Caching backend for memoized lookups such as presigned image URLs.
+    # FileSystemCache keeps entries under CACHE_DIR, shared by every worker on
+    # the host and kept across restarts; SimpleCache is per process.
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'FileSystemCache')
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(basedir, 'instance', 'cache')
+    CACHE_THRESHOLD = int(os.environ.get('CACHE_THRESHOLD') or 10000)
+
+    # Queue admin image uploads for the background worker (`flask images work`)
+    # instead of processing them inside the request.
+    IMAGE_JOBS_ENABLED = os.environ.get('IMAGE_JOBS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+    # Downscale admin image uploads in the browser before they are posted
+    # (to the largest size stored for their folder), see image_uploads.js
+    IMAGE_CLIENT_RESIZE = os.environ.get('IMAGE_CLIENT_RESIZE', 'false').lower() in ('1', 'true', 'yes')
+
+    # Admin forms upload images straight to storage through a presigned POST
+    # and submit only the staged key (see app/utils/direct_uploads.py)
+    IMAGE_DIRECT_UPLOADS = os.environ.get('IMAGE_DIRECT_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+
+    # Admin forms upload images in resumable chunks, assembled under
+    # CHUNKED_UPLOAD_PATH (see app/utils/chunked_uploads.py)
+    IMAGE_CHUNKED_UPLOADS = os.environ.get('IMAGE_CHUNKED_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+    CHUNKED_UPLOAD_PATH = os.environ.get('CHUNKED_UPLOAD_PATH') or os.path.join(basedir, 'instance', 'chunked-uploads')
+
+    # Where uploaded images are stored: "s3" (the S3_BUCKET_NAME bucket) or
+    # "local" (files under LOCAL_STORAGE_PATH, served by the app at /media/)
+    IMAGE_STORAGE = os.environ.get('IMAGE_STORAGE', 's3')
+    LOCAL_STORAGE_PATH = os.environ.get('LOCAL_STORAGE_PATH') or os.path.join(basedir, 'instance', 'media')
+
+    # On-demand resizing at /img/<key>?w=<width>&fmt=<format>. Only these widths,
+    # and only keys in the public image folders, are rendered, and results are
+    # kept in a size-bounded LRU directory, so it is safe to leave on.
+    # Templates use it for images that have no stored variant close to the
+    # width they need (e.g. backfilled single-size uploads).
+    IMAGE_RESIZE_ON_DEMAND = os.environ.get('IMAGE_RESIZE_ON_DEMAND', 'true').lower() in ('1', 'true', 'yes')
+    IMAGE_RESIZE_WIDTHS = tuple(
+        int(w) for w in os.environ.get('IMAGE_RESIZE_WIDTHS', '320,480,640,800,1200,1600,1920').split(',') if w.strip()
+    )
+    IMAGE_RESIZE_CACHE_PATH = os.environ.get('IMAGE_RESIZE_CACHE_PATH') or os.path.join(basedir, 'instance', 'resize-cache')
+    IMAGE_RESIZE_CACHE_MB = int(os.environ.get('IMAGE_RESIZE_CACHE_MB') or 1024)
+
+    # /i/<key> serves the best stored format for each browser's Accept header
+    IMAGE_FORMAT_NEGOTIATION = os.environ.get('IMAGE_FORMAT_NEGOTIATION', 'true').lower() in ('1', 'true', 'yes')
+
 
 class TestingConfig(Config):
     """Configuration for testing."""
@@ -24,4 +69,11 @@ class TestingConfig(Config):
     # Use an in-memory SQLite database for tests
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # Use in-memory SQLite database
     WTF_CSRF_ENABLED = False  # Disable CSRF forms in tests for simplicity
+    # Keep memoized results from leaking between tests
+    CACHE_TYPE = 'SimpleCache'
     SECRET_KEY = 'test-secret-key'
+    # Keep tests off the network
+    IMAGE_STORAGE = 'local'
+    LOCAL_STORAGE_PATH = os.path.join(tempfile.gettempdir(), 'tucson-golden-doodles-test-media')
+    IMAGE_RESIZE_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'tucson-golden-doodles-test-resize-cache')
+    CHUNKED_UPLOAD_PATH = os.path.join(tempfile.gettempdir(), 'tucson-golden-doodles-test-chunked-uploads')
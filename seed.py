@@ -20,12 +20,17 @@ from app.models import (
 )
 
 from app.utils.image_uploader import upload_image
+from app.utils.image_jobs import asset_for_keys
 
 
 # ======================================================
 # REAL S3 SEED IMAGE HELPER
 # ======================================================
 
+# {s3_key: {width, height, bytes}} measured by upload_image(), for the ImageAsset rows
+seed_variants = {}
+
+
 def upload_seed_image(filename, folder, responsive=False):
     image_path = os.path.join("seed_images", filename)
 
@@ -43,7 +48,8 @@ def upload_seed_image(filename, folder, responsive=False):
         return upload_image(
             file_storage,
             folder=folder,
-            create_responsive_versions=responsive
+            create_responsive_versions=responsive,
+            variants=seed_variants
         )
 
 
@@ -150,6 +156,8 @@ with app.app_context():
             parent.main_image_s3_key_medium = keys.get("medium")
             parent.main_image_s3_key_large = keys.get("large")
             parent.main_image_s3_key = keys.get("original")
+            parent.main_image_formats = keys.get("formats")
+            parent.main_image_asset = asset_for_keys(keys, seed_variants)
 
     db.session.commit()
 
@@ -216,14 +224,16 @@ with app.app_context():
     ]
 
     for name, coat, status, litter_id, image_file in puppies:
-        key = upload_seed_image(image_file, "puppies")
+        keys = upload_seed_image(image_file, "puppies", responsive=True)
         db.session.add(
             Puppy(
                 name=name,
                 coat=coat,
                 status=status,
                 litter_id=litter_id,
-                main_image_s3_key=key
+                main_image_s3_key=keys.get("original") if keys else None,
+                main_image_formats=keys.get("formats") if keys else None,
+                main_image_asset=asset_for_keys(keys, seed_variants)
             )
         )
 
@@ -239,9 +249,13 @@ with app.app_context():
     gallery_files = ["hero-image.jpg", "about-us.jpg"]
 
     for filename in gallery_files:
-        key = upload_seed_image(filename, "gallery")
-        if key:
-            db.session.add(GalleryImage(image_s3_key=key))
+        keys = upload_seed_image(filename, "gallery", responsive=True)
+        if keys:
+            db.session.add(GalleryImage(
+                image_s3_key=keys.get("original"),
+                image_formats=keys.get("formats"),
+                image_asset=asset_for_keys(keys, seed_variants)
+            ))
 
     # ======================================================
     # REVIEWS
@@ -276,6 +290,8 @@ with app.app_context():
         image_s3_key_small=hero_keys.get("small") if hero_keys else None,
         image_s3_key_medium=hero_keys.get("medium") if hero_keys else None,
         image_s3_key_large=hero_keys.get("large") if hero_keys else None,
+        image_formats=hero_keys.get("formats") if hero_keys else None,
+        image_asset=asset_for_keys(hero_keys, seed_variants),
     )
 
 
@@ -288,6 +304,8 @@ with app.app_context():
         image_s3_key_small=about_keys.get("small") if about_keys else None,
         image_s3_key_medium=about_keys.get("medium") if about_keys else None,
         image_s3_key_large=about_keys.get("large") if about_keys else None,
+        image_formats=about_keys.get("formats") if about_keys else None,
+        image_asset=asset_for_keys(about_keys, seed_variants),
         )
     
     banner = AnnouncementBanner(
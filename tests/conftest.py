@@ -1,5 +1,9 @@
 import pytest
+from flask import url_for
+
 from app import create_app, db as _db
+from app.models import User
+from app.utils.storage import LocalStorage
 from config import TestingConfig
 
 @pytest.fixture(scope='function')
@@ -28,4 +32,37 @@ def db(app):
 @pytest.fixture(scope='function')
 def client(app):
     """A test client for the app."""
-    return app.test_client()
\ No newline at end of file
+    return app.test_client()
+
+
+@pytest.fixture
+def queued_admin(app, client, db):
+    """Logs in an admin with background image processing switched on."""
+    app.config['IMAGE_JOBS_ENABLED'] = True
+    admin_user = User(username='admin')
+    admin_user.set_password('password')
+    db.session.add(admin_user)
+    db.session.commit()
+    client.post(
+        url_for('admin_auth.login'),
+        data={'username': 'admin', 'password': 'password'},
+        follow_redirects=True
+    )
+    return client
+
+
+@pytest.fixture
+def inline_admin(app, client, db, tmp_path):
+    """Logs in an admin whose uploads are processed inline into local storage."""
+    app.config['IMAGE_JOBS_ENABLED'] = False
+    app.extensions['image_storage'] = LocalStorage(tmp_path / 'media')
+    admin_user = User(username='admin')
+    admin_user.set_password('password')
+    db.session.add(admin_user)
+    db.session.commit()
+    client.post(
+        url_for('admin_auth.login'),
+        data={'username': 'admin', 'password': 'password'},
+        follow_redirects=True
+    )
+    return client
@@ -31,7 +31,7 @@ class TestAdminAboutBS5:
         )
         yield client
 
-    @patch('app.routes.admin.views.home.about_view.upload_image', return_value={'original': 'about/mock-image.jpg'})
+    @patch('app.routes.admin.views.base.upload_image', return_value={'original': 'about/mock-image.jpg'})
     def test_full_about_crud_workflow_bs5(self, mock_upload_image, setup_and_login, db):
         """
         Tests the complete CREATE, READ, UPDATE, and DELETE lifecycle for an
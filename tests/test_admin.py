@@ -33,7 +33,7 @@ class TestAdminFunctionality:
     # --- Puppy CRUD Tests (MODIFIED) ---
 
     # This patch is correct as upload_image is used in the view.
-    @patch('app.routes.admin.views.puppy_views.upload_image', return_value='puppies/new_puppy.jpg')
+    @patch('app.routes.admin.views.base.upload_image', return_value='puppies/new_puppy.jpg')
     def test_create_puppy_with_valid_data_saves_s3_key(self, mock_upload, client, db):
         admin_user = User(username='admin'); admin_user.set_password('pw')
         mom = Parent(name='Test Mom', role=ParentRole.MOM)
@@ -66,7 +66,7 @@ class TestAdminFunctionality:
 
     # --- Parent CRUD Tests (MODIFIED) ---
 
-    @patch('app.routes.admin.views.parent_views.upload_image')
+    @patch('app.routes.admin.views.base.upload_image')
     def test_edit_parent_record_saves_s3_keys(self, mock_upload, client, db):
         admin_user = User(username='admin'); admin_user.set_password('pw')
         parent = Parent(name='Old Name', role=ParentRole.DAD)
@@ -0,0 +1,112 @@
+# tests/test_chunked_uploads.py
+
+import io
+import sys
+
+import pytest
+from flask import url_for
+from PIL import Image
+
+from app.models import GalleryImage
+from app.utils.chunked_uploads import ChunkedUploads
+
+
+def _photo(fmt='JPEG', size=(1200, 900)):
+    """The same generated photo, encoded as `fmt` (so each format gets different keys)."""
+    img = Image.merge('RGB', (
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 64),
+    ))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+
+class TestChunkedUploads:
+
+    @pytest.fixture(autouse=True)
+    def enabled(self, app, tmp_path):
+        app.config['IMAGE_CHUNKED_UPLOADS'] = True
+        app.extensions['chunked_uploads'] = ChunkedUploads(tmp_path / 'chunks', chunk_size=16 * 1024)
+
+    def _open(self, admin, data, filename='pup.jpg'):
+        response = admin.post(url_for('admin_auth.chunked_upload_create'), json={'filename': filename, 'size': len(data)})
+        assert response.status_code == 201
+        return response.get_json()
+
+    def _put(self, admin, upload_id, index, data):
+        return admin.put(url_for('admin_auth.chunked_upload_chunk', upload_id=upload_id, index=index), data=data)
+
+    def _send(self, admin, data):
+        """Does what image_uploads.js does: open the upload, then PUT each chunk in order."""
+        status = self._open(admin, data)
+        size = status['chunk_size']
+        for index in range(status['received'], -(-len(data) // size)):
+            assert self._put(admin, status['upload_id'], index, data[index * size:(index + 1) * size]).status_code == 200
+        return status['upload_id']
+
+    def test_upload_inputs_point_at_the_chunked_endpoint(self, inline_admin):
+        page = inline_admin.get(url_for('galleryimage.create_view'))
+        assert b'data-chunked-upload="/admin/chunked-upload"' in page.data
+
+    def test_chunks_out_of_order_are_refused_and_retries_are_harmless(self, inline_admin):
+        data = _photo().getvalue()
+        status = self._open(inline_admin, data)
+        upload_id, size = status['upload_id'], status['chunk_size']
+        assert (status['received'], status['filename']) == (0, 'pup.jpg')
+
+        skipped = self._put(inline_admin, upload_id, 1, data[size:2 * size])
+        assert (skipped.status_code, skipped.get_json()['received']) == (409, 0)
+        assert self._put(inline_admin, upload_id, 0, data[:size]).get_json() == {'received': 1}
+        # The response was lost and the browser sends chunk 0 again
+        assert self._put(inline_admin, upload_id, 0, data[:size]).get_json() == {'received': 1}
+        short = self._put(inline_admin, upload_id, 1, data[size:size + 10])
+        assert (short.status_code, short.get_json()['received']) == (409, 1)
+
+        resumed = inline_admin.get(url_for('admin_auth.chunked_upload_status', upload_id=upload_id)).get_json()
+        assert resumed['received'] == 1
+
+    def test_assembled_upload_is_stored_and_removed(self, app, inline_admin, db):
+        data = _photo().getvalue()
+        upload_id = self._send(inline_admin, data)
+        uploads = app.extensions['chunked_uploads']
+        assert uploads.open(upload_id, 'image_upload').read() == data
+
+        response = inline_admin.post(url_for('galleryimage.create_view'),
+                                     data={'caption': 'Chunked', 'sort_order': '1',
+                                           'chunked_upload_image_upload': upload_id},
+                                     follow_redirects=True)
+
+        assert b'Record was successfully created.' in response.data
+        assert GalleryImage.query.one().image_asset.original.width == 1200
+        assert inline_admin.get(url_for('admin_auth.chunked_upload_status', upload_id=upload_id)).status_code == 404
+
+    def test_unfinished_upload_is_not_stored(self, inline_admin, db):
+        data = _photo().getvalue()
+        status = self._open(inline_admin, data)
+        self._put(inline_admin, status['upload_id'], 0, data[:status['chunk_size']])
+
+        response = inline_admin.post(url_for('galleryimage.create_view'),
+                                     data={'caption': 'Chunked', 'sort_order': '1',
+                                           'chunked_upload_image_upload': status['upload_id']},
+                                     follow_redirects=True)
+        assert b'the upload never finished' in response.data
+        assert GalleryImage.query.one().image_asset is None
+
+    def test_chunks_are_stored_without_fcntl(self, monkeypatch, tmp_path):
+        # As on Windows: the store falls back to another lock instead of failing to import
+        monkeypatch.setitem(sys.modules, 'fcntl', None)
+        uploads = ChunkedUploads(tmp_path / 'no-fcntl', chunk_size=4)
+        upload_id = uploads.create('pup.jpg', 6)['upload_id']
+        assert (uploads.append(upload_id, 0, b'abcd'), uploads.append(upload_id, 1, b'ef')) == (1, 2)
+        assert uploads.open(upload_id, 'image_upload').read() == b'abcdef'
+
+    def test_oversized_uploads_and_anonymous_requests_are_refused(self, client, inline_admin):
+        too_big = inline_admin.post(url_for('admin_auth.chunked_upload_create'),
+                                    json={'filename': 'pup.jpg', 'size': 10 ** 12})
+        assert too_big.status_code == 413
+        inline_admin.get(url_for('admin_auth.logout'))
+        assert client.post(url_for('admin_auth.chunked_upload_create'),
+                           json={'filename': 'pup.jpg', 'size': 10}).status_code == 401
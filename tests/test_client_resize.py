@@ -0,0 +1,50 @@
+# tests/test_client_resize.py
+
+import io
+
+from flask import url_for
+from PIL import Image
+
+from app.models import GalleryImage, ImageAsset
+
+
+def _photo(fmt='JPEG', size=(1200, 900)):
+    """The same generated photo, encoded as `fmt` (so each format gets different keys)."""
+    img = Image.merge('RGB', (
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 64),
+    ))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+
+class TestClientResize:
+
+    def _add_gallery_image(self, admin, photo, filename='pup.jpg'):
+        data = {'caption': 'Resized', 'sort_order': '1', 'image_upload': (photo, filename),
+                'client_resized': 'image_upload'}
+        return admin.post(url_for('galleryimage.create_view'), data=data,
+                          content_type='multipart/form-data', follow_redirects=True)
+
+    def test_upload_inputs_are_marked_only_when_enabled(self, app, inline_admin):
+        assert b'data-client-resize' not in inline_admin.get(url_for('galleryimage.create_view')).data
+
+        app.config['IMAGE_CLIENT_RESIZE'] = True
+        assert b'data-client-resize="1200"' in inline_admin.get(url_for('galleryimage.create_view')).data
+        assert b'data-client-resize="1920"' in inline_admin.get(url_for('herosection.create_view')).data
+        assert b'js/previews/image_uploads.js' in inline_admin.get(url_for('puppy.create_view')).data
+
+    def test_resized_upload_is_stored(self, inline_admin, db):
+        self._add_gallery_image(inline_admin, _photo(size=(1200, 900)))
+
+        image = GalleryImage.query.one()
+        assert image.image_asset.original.width == 1200
+
+    def test_upload_larger_than_the_resize_edge_is_rejected(self, inline_admin, db):
+        response = self._add_gallery_image(inline_admin, _photo(size=(1600, 1200)))
+
+        assert b'is larger than the 1200px it should have been resized to' in response.data
+        assert ImageAsset.query.count() == 0
@@ -0,0 +1,124 @@
+# tests/test_direct_uploads.py
+
+import io
+from unittest.mock import patch
+
+import pytest
+from flask import url_for
+from PIL import Image
+
+from app.models import GalleryImage, ImageJob, ImageJobStatus
+from app.utils import image_jobs
+from app.utils.image_uploader import upload_image
+from app.utils.storage import LocalStorage
+
+
+def _photo(fmt='JPEG', size=(1200, 900)):
+    """The same generated photo, encoded as `fmt` (so each format gets different keys)."""
+    img = Image.merge('RGB', (
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 64),
+    ))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+
+class TestDirectUploads:
+
+    @pytest.fixture(autouse=True)
+    def enabled(self, app):
+        app.config['IMAGE_DIRECT_UPLOADS'] = True
+
+    def _stage(self, admin, photo, filename='pup.jpg'):
+        """Does what image_uploads.js does: presign, then POST the file straight to storage."""
+        post = admin.post(url_for('admin_auth.direct_upload'), json={'filename': filename}).get_json()
+        stored = admin.post(post['url'], data={**post['fields'], 'file': (photo, filename)},
+                            content_type='multipart/form-data')
+        assert stored.status_code == 204
+        return post
+
+    def _add_gallery_image(self, admin, token, **extra):
+        return admin.post(url_for('galleryimage.create_view'),
+                          data={'caption': 'Direct', 'sort_order': '1', 'direct_upload_image_upload': token, **extra},
+                          follow_redirects=True)
+
+    def test_upload_inputs_point_at_the_presign_endpoint(self, inline_admin):
+        page = inline_admin.get(url_for('galleryimage.create_view'))
+        assert b'data-direct-upload="/admin/direct-upload"' in page.data
+
+    @patch('app.routes.admin.views.base.upload_image', wraps=upload_image)
+    def test_staged_original_is_processed_inline_and_removed(self, mock_upload, app, inline_admin, db):
+        post = self._stage(inline_admin, _photo())
+        key = post['fields']['key']
+        storage = app.extensions['image_storage']
+        assert key.startswith('uploads/') and storage.exists(key)
+
+        response = self._add_gallery_image(inline_admin, post['token'])
+
+        assert b'Record was successfully created.' in response.data
+        image = GalleryImage.query.one()
+        assert image.image_asset.original.width == 1200
+        assert mock_upload.call_args.args[0].filename == 'pup.jpg'
+        assert not storage.exists(key)
+
+    def test_queued_job_reads_the_staged_original(self, app, queued_admin, db, tmp_path):
+        app.extensions['image_storage'] = storage = LocalStorage(tmp_path / 'media')
+        post = self._stage(queued_admin, _photo())
+        self._add_gallery_image(queued_admin, post['token'])
+
+        job = ImageJob.query.one()
+        assert (job.payload, job.source_s3_key) == (None, post['fields']['key'])
+
+        assert image_jobs.run_worker(once=True) == 1
+        assert job.status == ImageJobStatus.DONE
+        assert GalleryImage.query.one().image_asset is not None
+        assert (job.source_s3_key, storage.exists(post['fields']['key'])) == (None, False)
+
+    def test_queued_staged_upload_is_checked_first(self, app, queued_admin, db, tmp_path):
+        app.extensions['image_storage'] = storage = LocalStorage(tmp_path / 'media')
+        self._add_gallery_image(queued_admin, self._stage(queued_admin, _photo())['token'])
+        assert image_jobs.run_worker(once=True) == 1
+
+        oversized = self._stage(queued_admin, _photo(size=(1600, 1200)))
+        response = self._add_gallery_image(queued_admin, oversized['token'], client_resized='image_upload')
+        assert b'is larger than the 1200px it should have been resized to' in response.data
+
+        again = self._stage(queued_admin, _photo('PNG', (800, 600)), 'pup.png')
+        response = self._add_gallery_image(queued_admin, again['token'], reuse_duplicate_images='y')
+        assert b'so the stored copy was reused' in response.data
+
+        assert ImageJob.query.count() == 1
+        assert not storage.exists(oversized['fields']['key']) and not storage.exists(again['fields']['key'])
+        first, rejected, reused = GalleryImage.query.order_by(GalleryImage.id).all()
+        assert rejected.image_asset is None and reused.image_asset is first.image_asset
+
+    def test_failed_direct_upload_job_can_be_retried(self, app, queued_admin, db, tmp_path):
+        app.extensions['image_storage'] = LocalStorage(tmp_path / 'media')
+        post = self._stage(queued_admin, _photo())
+        self._add_gallery_image(queued_admin, post['token'])
+        job = ImageJob.query.one()
+        job.status, job.attempts = ImageJobStatus.FAILED, job.max_attempts
+        db.session.commit()
+
+        response = queued_admin.post(url_for('imagejob.action_view'),
+                                     data={'action': 'retry', 'rowid': [str(job.id)]}, follow_redirects=True)
+
+        assert b'1 image job(s) queued for retry.' in response.data
+        assert (job.status, job.attempts) == (ImageJobStatus.PENDING, 0)
+        assert image_jobs.run_worker(once=True) == 1
+        assert GalleryImage.query.one().image_asset is not None
+
+    def test_tampered_requests_are_refused(self, inline_admin, db):
+        post = inline_admin.post(url_for('admin_auth.direct_upload'), json={'filename': 'pup.jpg'}).get_json()
+
+        elsewhere = {**post['fields'], 'key': 'gallery/overwrite.jpg', 'file': (_photo(), 'pup.jpg')}
+        assert inline_admin.post(post['url'], data=elsewhere, content_type='multipart/form-data').status_code == 403
+        response = self._add_gallery_image(inline_admin, post['token'] + 'x')
+        assert b'An image upload is required' in response.data
+        assert GalleryImage.query.count() == 0
+
+    def test_presigning_needs_a_login(self, client):
+        assert client.post(url_for('admin_auth.direct_upload'), json={'filename': 'pup.jpg'}).status_code == 401
@@ -28,7 +28,7 @@ class TestAdminGalleryBS5:
         )
         yield client
 
-    @patch('app.routes.admin.views.home.gallery_view.upload_image', return_value='gallery/mock-image.jpg')
+    @patch('app.routes.admin.views.base.upload_image', return_value='gallery/mock-image.jpg')
     def test_full_gallery_crud_workflow_bs5(self, mock_upload_image, setup_and_login, db):
         """
         Tests the complete CREATE, READ, UPDATE, and DELETE lifecycle for a
@@ -35,7 +35,7 @@ class TestAdminHeroBS5:
         # Yield the authenticated client to the tests
         yield client
 
-    @patch('app.routes.admin.views.home.hero_view.upload_image', return_value={'original': 'hero/mock-image.jpg'})
+    @patch('app.routes.admin.views.base.upload_image', return_value={'original': 'hero/mock-image.jpg'})
     def test_full_hero_crud_workflow_bs5(self, mock_upload_image, setup_and_login, db):
         """
         Tests the complete CREATE, READ, UPDATE, and DELETE lifecycle of a
@@ -0,0 +1,137 @@
+# tests/test_image_backfill.py
+
+import io
+import time
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import GalleryImage, ImageAsset, ImageVariant, Parent, ParentRole
+from app.utils.image_backfill import RateLimiter, find_missing_variants
+from app.utils.image_jobs import asset_for_keys
+from app.utils.image_uploader import hash_upload, upload_image
+from app.utils.storage import LocalStorage
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Points the app at a fresh local storage directory."""
+    storage = LocalStorage(tmp_path / 'media')
+    app.extensions['image_storage'] = storage
+    return storage
+
+
+def _store_original(folder, shade=120):
+    """Stores a 1600x1200 photo the way a pre-responsive upload did and returns its key."""
+    buf = io.BytesIO()
+    Image.new('RGB', (1600, 1200), (shade, 90, 160)).save(buf, format='JPEG')
+    buf.seek(0)
+    return upload_image(FileStorage(stream=buf, filename='photo.jpg'), folder=folder)
+
+
+def _backfill(app, *args):
+    return app.test_cli_runner().invoke(args=['images', 'backfill', *map(str, args)])
+
+
+class TestImageBackfill:
+
+    def test_dry_run_lists_rows_without_writing(self, app, db, local_storage):
+        db.session.add(GalleryImage(image_s3_key=_store_original('gallery')))
+        db.session.commit()
+
+        result = _backfill(app, '--dry-run')
+
+        assert result.exit_code == 0, result.output
+        assert 'missing small, medium, large' in result.output
+        assert '1 row(s) across 1 image(s) need a backfill.' in result.output
+        assert GalleryImage.query.one().image_asset is None
+
+    def test_generates_missing_sizes_and_keeps_the_original(self, app, db, local_storage):
+        original = _store_original('gallery')
+        db.session.add_all([GalleryImage(image_s3_key=original), GalleryImage(image_s3_key=original)])
+        db.session.commit()
+
+        result = _backfill(app, '--workers', 2, '--batch-size', 1)
+
+        assert result.exit_code == 0, result.output
+        assert 'Backfilled 2 of 2 row(s) (1 image(s), 0 row(s) failed)' in result.output
+        images = GalleryImage.query.all()
+        assert images[0].image_asset is images[1].image_asset
+        asset = images[0].image_asset
+        assert asset.original.key == original
+        assert asset.variant_for(480).width == 480
+        assert local_storage.exists(asset.variant_for(480).key)
+        assert find_missing_variants() == []
+
+    def test_fills_the_parent_size_columns(self, app, db, local_storage):
+        parent = Parent(name='Penelope', role=ParentRole.MOM, main_image_s3_key=_store_original('parents'))
+        db.session.add(parent)
+        db.session.commit()
+
+        result = _backfill(app, '--folder', 'parents', '--rate', 50)
+
+        assert result.exit_code == 0, result.output
+        parent = db.session.get(Parent, parent.id)
+        assert parent.main_image_s3_key_small.endswith('-small.jpg')
+        assert parent.main_image_s3_key_medium.endswith('-medium.jpg')
+        assert parent.main_image_s3_key_large.endswith('-large.jpg')
+        assert parent.main_image_asset.variant_for(800).key == parent.main_image_s3_key_medium
+
+    def test_missing_original_counts_as_failed(self, app, db, local_storage):
+        db.session.add(GalleryImage(image_s3_key='gallery/gone.jpg'))
+        db.session.commit()
+
+        result = _backfill(app)
+
+        assert 'Backfilled 0 of 1 row(s) (1 image(s), 1 row(s) failed)' in result.output
+        assert GalleryImage.query.one().image_asset is None
+
+
+class TestMeasureVariants:
+
+    def test_records_dimensions_of_unmeasured_variants(self, app, db, local_storage):
+        original = _store_original('gallery')
+        db.session.add(GalleryImage(image_s3_key=original,
+                                    image_asset=asset_for_keys({'original': original, 'small': 'gallery/gone.jpg'})))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['images', 'measure', '--workers', 2])
+
+        assert result.exit_code == 0, result.output
+        assert 'Measured 1 of 2 variant(s) (1 failed)' in result.output
+        variant = ImageVariant.query.filter_by(key=original).one()
+        assert (variant.width, variant.height) == (1600, 1200)
+        assert variant.bytes == len(local_storage.get(original))
+
+    def test_dry_run_only_counts(self, app, db, local_storage):
+        original = _store_original('gallery')
+        db.session.add(GalleryImage(image_s3_key=original, image_asset=asset_for_keys(original)))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['images', 'measure', '--dry-run'])
+
+        assert '2 variant(s) have no recorded dimensions.' in result.output  # jpg + webp
+        assert ImageVariant.query.filter_by(key=original).one().width is None
+
+
+def test_hash_records_perceptual_hash_of_older_assets(app, db, local_storage):
+    original = _store_original('gallery')
+    asset = asset_for_keys(original)
+    db.session.add(GalleryImage(image_s3_key=original, image_asset=asset))
+    db.session.add(GalleryImage(image_s3_key='gallery/gone.jpg', image_asset=asset_for_keys('gallery/gone.jpg')))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['images', 'hash'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Hashed 1 of 2 image(s) (1 failed)' in result.output
+    assert db.session.get(ImageAsset, asset.id).dhash == hash_upload(io.BytesIO(local_storage.get(original)))
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(20)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,127 @@
+# tests/test_image_gc.py
+
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import GalleryImage, ImageAsset
+from app.utils.image_gc import collect_garbage
+from app.utils.image_jobs import apply_image_keys
+from app.utils.image_uploader import upload_image
+from app.utils.storage import LocalStorage, S3Storage
+
+GALLERY_FIELDS = {'original': 'image_s3_key', 'formats': 'image_formats', 'asset': 'image_asset'}
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Points the app at a fresh local storage directory."""
+    storage = LocalStorage(tmp_path / 'media')
+    app.extensions['image_storage'] = storage
+    return storage
+
+
+def _upload(shade):
+    buf = io.BytesIO()
+    Image.new('RGB', (900, 600), (shade, 90, 160)).save(buf, format='JPEG')
+    buf.seek(0)
+    return upload_image(FileStorage(stream=buf, filename='photo.jpg'), folder='gallery',
+                        create_responsive_versions=True)
+
+
+def _gc(app, *args):
+    return app.test_cli_runner().invoke(args=['images', 'gc', *map(str, args)])
+
+
+@pytest.fixture
+def replaced_image(db, local_storage):
+    """A gallery row whose image was replaced: returns (old keys, new keys)."""
+    old_keys, new_keys = _upload(40), _upload(200)
+    image = GalleryImage()
+    apply_image_keys(image, old_keys, GALLERY_FIELDS)
+    db.session.add(image)
+    db.session.commit()
+    apply_image_keys(image, new_keys, GALLERY_FIELDS)
+    db.session.commit()
+    return old_keys, new_keys
+
+
+def _stored(keys):
+    return [key for name, key in keys.items() if name not in ('formats', 'placeholder')]
+
+
+class TestImageGC:
+
+    def test_deletes_replaced_objects_and_orphaned_assets(self, app, local_storage, replaced_image):
+        old_keys, new_keys = replaced_image
+        local_storage.put('backups/db.sql', b'not an image', 'text/plain')
+
+        result = _gc(app, '--grace-days', 0)
+
+        assert result.exit_code == 0, result.output
+        assert f"Deleted {len(_stored(old_keys))} unreferenced object(s)" in result.output
+        assert 'and 1 orphaned asset(s)' in result.output
+        assert not local_storage.existing(_stored(old_keys))
+        assert local_storage.existing(_stored(new_keys)) == set(_stored(new_keys))
+        assert local_storage.exists('backups/db.sql')
+        assert ImageAsset.query.count() == 1
+
+    def test_grace_period_keeps_recent_objects(self, app, local_storage, replaced_image):
+        old_keys, new_keys = replaced_image
+        # An untracked leftover, e.g. from an upload whose row was never saved
+        local_storage.put('gallery/leftover.jpg', b'jpeg', 'image/jpeg')
+
+        result = _gc(app)
+
+        # The replaced image's asset is recent too, so its objects are still kept
+        total = len(_stored(old_keys)) + len(_stored(new_keys))
+        assert 'Deleted 0 unreferenced object(s)' in result.output
+        assert f"{total} referenced, 1 newer than 7 day(s)" in result.output
+        assert ImageAsset.query.count() == 2
+
+    def test_dry_run_deletes_nothing(self, app, local_storage, replaced_image):
+        old_keys, _ = replaced_image
+
+        result = _gc(app, '--grace-days', 0, '--dry-run')
+
+        assert f"Would delete {len(_stored(old_keys))} unreferenced object(s)" in result.output
+        assert local_storage.existing(_stored(old_keys)) == set(_stored(old_keys))
+        assert ImageAsset.query.count() == 2
+
+
+def test_s3_listing_is_deleted_in_batches_of_1000(app, db):
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+
+    class FakeClient:
+        def __init__(self):
+            self.batches = []
+
+        def get_paginator(self, operation):
+            assert operation == 'list_objects_v2'
+            return self
+
+        def paginate(self, Bucket, Prefix):
+            if Prefix != 'gallery/':
+                return
+            keys = [f'gallery/{i:04}.jpg' for i in range(2500)]
+            for start in range(0, len(keys), 1000):
+                yield {'Contents': [{'Key': k, 'Size': 10, 'LastModified': old} for k in keys[start:start + 1000]]}
+
+        def delete_objects(self, Bucket, Delete):
+            self.batches.append(len(Delete['Objects']))
+            return {}
+
+    client = FakeClient()
+    app.extensions['image_storage'] = S3Storage(bucket='test', client=client)
+    db.session.add(GalleryImage(image_s3_key='gallery/0007.jpg'))
+    db.session.commit()
+
+    summary = collect_garbage(grace_days=1)
+
+    assert client.batches == [1000, 1000, 499]
+    assert summary['deleted'] == 2499
+    assert summary['bytes_reclaimed'] == 24990
+    assert summary['referenced'] == 1
@@ -0,0 +1,88 @@
+# tests/test_image_import.py
+
+from datetime import date
+
+import pytest
+from PIL import Image
+
+from app.models import GalleryImage, Litter, Parent, ParentRole, Puppy
+from app.utils.image_import import MANIFEST_NAME
+from app.utils.storage import LocalStorage
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Points the app at a fresh local storage directory."""
+    storage = LocalStorage(tmp_path / 'media')
+    app.extensions['image_storage'] = storage
+    return storage
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """A directory of three distinct photos (one in a subdirectory) and a non-image file."""
+    directory = tmp_path / 'photos'
+    (directory / 'more').mkdir(parents=True)
+    for path, shade in [('a.jpg', 40), ('b.png', 120), ('more/c_pup.jpg', 200)]:
+        Image.new('RGB', (640, 480), (shade, 90, 160)).save(directory / path)
+    (directory / 'notes.txt').write_text('not an image')
+    return directory
+
+
+def _import(app, *args):
+    return app.test_cli_runner().invoke(args=['images', 'import', *map(str, args)])
+
+
+class TestImageImport:
+
+    def test_imports_gallery_rows_with_assets(self, app, db, local_storage, photos):
+        result = _import(app, photos, '--folder', 'gallery', '--responsive', '--workers', 2)
+
+        assert result.exit_code == 0, result.output
+        assert 'Imported 3 image(s) from 3 file(s)' in result.output
+        assert 'images/s' in result.output
+
+        images = GalleryImage.query.order_by(GalleryImage.sort_order).all()
+        assert [image.sort_order for image in images] == [1, 2, 3]
+        for image in images:
+            assert local_storage.exists(image.image_s3_key)
+            assert image.image_asset.variant_for(480).width == 480
+
+    def test_rerun_skips_files_already_imported(self, app, db, local_storage, photos):
+        _import(app, photos, '--folder', 'gallery')
+        assert len((photos / MANIFEST_NAME).read_text().splitlines()) == 3
+
+        Image.new('RGB', (300, 200), 'white').save(photos / 'd.jpg')
+        result = _import(app, photos, '--folder', 'gallery')
+
+        assert 'Imported 1 image(s) from 4 file(s): 3 already imported' in result.output
+        assert GalleryImage.query.count() == 4
+
+    def test_lost_manifest_does_not_duplicate_rows(self, app, db, local_storage, photos):
+        _import(app, photos, '--folder', 'gallery')
+        (photos / MANIFEST_NAME).unlink()
+
+        result = _import(app, photos, '--folder', 'gallery', '--batch-size', 2)
+
+        assert 'Imported 0 image(s) from 3 file(s): 0 already imported, 3 already on a row' in result.output
+        assert GalleryImage.query.count() == 3
+
+    def test_puppies_are_created_in_the_litter(self, app, db, local_storage, photos):
+        mom = Parent(name='Penelope', role=ParentRole.MOM)
+        dad = Parent(name='Archie', role=ParentRole.DAD)
+        db.session.add_all([mom, dad])
+        db.session.flush()
+        litter = Litter(mom_id=mom.id, dad_id=dad.id, birth_date=date(2024, 1, 15))
+        db.session.add(litter)
+        db.session.commit()
+
+        result = _import(app, photos, '--folder', 'puppies', '--litter-id', litter.id, '--responsive')
+
+        assert result.exit_code == 0, result.output
+        assert sorted(p.name for p in Puppy.query.filter_by(litter_id=litter.id)) == ['A', 'B', 'C Pup']
+
+    def test_parents_need_an_existing_parent(self, app, db, local_storage, photos):
+        result = _import(app, photos, '--folder', 'parents', '--parent-id', 999)
+
+        assert result.exit_code != 0
+        assert 'parent-id' in result.output
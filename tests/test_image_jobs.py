@@ -0,0 +1,270 @@
+# tests/test_image_jobs.py
+
+import io
+import re
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from flask import url_for
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import GalleryImage, HeroSection, ImageJob, ImageJobStatus, ImageAsset
+from app.models.image_models import utcnow
+from app.utils import image_jobs, image_uploader
+
+
+class TestImageJobQueue:
+
+    @patch('app.routes.admin.views.base.upload_image')
+    def test_admin_save_queues_upload_instead_of_processing(self, mock_upload, queued_admin, db):
+        response = queued_admin.post(
+            url_for('galleryimage.create_view'),
+            data={
+                'caption': 'Queued pup',
+                'sort_order': '1',
+                'image_upload': (io.BytesIO(b"raw-image-bytes"), 'pup.jpg')
+            },
+            content_type='multipart/form-data',
+            follow_redirects=True
+        )
+
+        assert b'Record was successfully created.' in response.data
+        mock_upload.assert_not_called()
+
+        image = GalleryImage.query.filter_by(caption='Queued pup').one()
+        assert image.image_s3_key is None
+
+        job = ImageJob.query.one()
+        assert job.status == ImageJobStatus.PENDING
+        assert (job.target_table, job.target_id) == ('gallery_image', image.id)
+        assert job.payload == b"raw-image-bytes"
+
+        jobs_page = queued_admin.get(url_for('imagejob.index_view'))
+        assert b'Pending' in jobs_page.data
+
+    @patch('app.utils.image_jobs.upload_image')
+    def test_worker_writes_keys_back_and_marks_done(self, mock_upload, app, db):
+        mock_upload.return_value = {
+            'original': 'hero/abc-original.jpg',
+            'large': 'hero/abc-large.jpg',
+            'small': 'hero/abc-small.jpg',
+        }
+        hero = HeroSection(main_title='Hero')
+        db.session.add(hero)
+        db.session.commit()
+        image_jobs.enqueue_image_job(
+            hero, _file(), folder='hero', responsive=True,
+            field_map={'original': 'image_s3_key', 'large': 'image_s3_key_large'}
+        )
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['images', 'work', '--once'])
+
+        assert 'Processed 1 image job(s).' in result.output
+        db.session.expire_all()
+        assert hero.image_s3_key == 'hero/abc-original.jpg'
+        assert hero.image_s3_key_large == 'hero/abc-large.jpg'
+        assert hero.image_s3_key_small is None  # not in the field map
+        job = ImageJob.query.one()
+        assert job.status == ImageJobStatus.DONE
+        assert job.payload is None
+
+    @patch('app.utils.image_jobs.upload_image', return_value=None)
+    def test_failed_job_is_retried_with_backoff_then_gives_up(self, mock_upload, db):
+        image = GalleryImage(caption='Broken')
+        db.session.add(image)
+        job = image_jobs.enqueue_image_job(image, _file(), folder='gallery', field_map={'original': 'image_s3_key'})
+        job.max_attempts = 2
+        db.session.commit()
+
+        assert image_jobs.run_worker(once=True) == 1
+        assert job.status == ImageJobStatus.PENDING
+        assert job.attempts == 1
+        assert job.next_attempt_at > utcnow() + timedelta(seconds=20)
+
+        # Not due yet, so a second pass does nothing
+        assert image_jobs.run_worker(once=True) == 0
+
+        job.next_attempt_at = utcnow()
+        db.session.commit()
+        image_jobs.run_worker(once=True)
+        assert job.status == ImageJobStatus.FAILED
+        assert job.payload is not None  # kept so the job can be retried from the admin
+
+    @patch('app.utils.image_jobs.upload_image', return_value='gallery/recovered.jpg')
+    def test_job_orphaned_by_crashed_worker_is_reclaimed(self, mock_upload, db):
+        image = GalleryImage(caption='Orphan')
+        db.session.add(image)
+        job = image_jobs.enqueue_image_job(image, _file(), folder='gallery', field_map={'original': 'image_s3_key'})
+        job.status = ImageJobStatus.RUNNING
+        job.locked_at = utcnow() - timedelta(seconds=image_jobs.STALE_LOCK_SECONDS + 1)
+        db.session.commit()
+
+        assert image_jobs.run_worker(once=True) == 1
+        assert job.status == ImageJobStatus.DONE
+        assert job.attempts == 1  # the crashed run counts
+        assert image.image_s3_key == 'gallery/recovered.jpg'
+
+    @patch('app.utils.image_jobs.upload_image')
+    def test_job_that_keeps_killing_workers_fails(self, mock_upload, db):
+        image = GalleryImage(caption='Poison')
+        db.session.add(image)
+        job = image_jobs.enqueue_image_job(image, _file(), folder='gallery', field_map={'original': 'image_s3_key'})
+        job.status = ImageJobStatus.RUNNING
+        job.attempts, job.max_attempts = 1, 2
+        job.locked_at = utcnow() - timedelta(seconds=image_jobs.STALE_LOCK_SECONDS + 1)
+        db.session.commit()
+
+        assert image_jobs.run_worker(once=True) == 0
+        assert job.status == ImageJobStatus.FAILED
+        assert 'stopped before it finished' in job.last_error
+        mock_upload.assert_not_called()
+
+
+class TestImageAssets:
+
+    KEYS = {
+        'original': 'parents/abc-original.jpg',
+        'large': 'parents/abc-large.jpg',
+        'small': 'parents/abc-small.jpg',
+        'original_webp': 'parents/abc-original.webp',
+        'large_webp': 'parents/abc-large.webp',
+        'small_webp': 'parents/abc-small.webp',
+        'formats': 'webp',
+    }
+
+    def test_asset_records_every_variant_and_is_reused(self, db):
+        measured = {
+            'parents/abc-original.jpg': {'width': 3000, 'height': 2000, 'bytes': 900_000},
+            'parents/abc-large.jpg': {'width': 1200, 'height': 800, 'bytes': 150_000},
+            'parents/abc-small.jpg': {'width': 480, 'height': 320, 'bytes': 30_000},
+        }
+        asset = image_jobs.asset_for_keys(self.KEYS, measured)
+        db.session.commit()
+
+        assert (asset.folder, asset.source_format, asset.alternate_formats) == ('parents', 'jpeg', ['webp'])
+        assert len(asset.variants) == 6
+        large = asset.variant_for(1000)
+        assert (large.key, large.width, large.bytes) == ('parents/abc-large.jpg', 1200, 150_000)
+        assert asset.variant_for(400, 'webp').key == 'parents/abc-small.webp'
+        assert asset.variant_for(5000).key == 'parents/abc-original.jpg'  # nothing is wide enough
+        assert asset.variant_for().key == 'parents/abc-original.jpg'
+
+        # Same content-addressed keys -> same asset
+        assert image_jobs.asset_for_keys(self.KEYS) is asset
+        assert ImageAsset.query.count() == 1
+
+    def test_unmeasured_variants_fall_back_to_nominal_widths(self, db):
+        asset = image_jobs.asset_for_keys(self.KEYS)
+
+        assert asset.variant_for(480).key == 'parents/abc-small.jpg'
+        assert asset.variant_for(481).key == 'parents/abc-large.jpg'
+        assert asset.variant_for(1500).key == 'parents/abc-original.jpg'
+
+    def test_single_key_upload_gets_its_alternate_formats(self, db):
+        with patch('app.utils.image_jobs.stored_formats_for_key', return_value='avif,webp'):
+            asset = image_jobs.asset_for_keys('gallery/def.jpg')
+
+        assert sorted(v.key for v in asset.variants) == ['gallery/def.avif', 'gallery/def.jpg', 'gallery/def.webp']
+        assert asset.variant_for(800, 'avif').key == 'gallery/def.avif'
+
+    @patch('app.utils.image_jobs.upload_image')
+    def test_worker_links_the_asset(self, mock_upload, db):
+        mock_upload.return_value = dict(self.KEYS)
+        hero = HeroSection(main_title='Hero')
+        db.session.add(hero)
+        image_jobs.enqueue_image_job(
+            hero, _file(), folder='hero', responsive=True,
+            field_map={'original': 'image_s3_key', 'formats': 'image_formats', 'asset': 'image_asset'}
+        )
+        db.session.commit()
+
+        assert image_jobs.run_worker(once=True) == 1
+        assert hero.image_asset.variant_for(1200).key == 'parents/abc-large.jpg'
+
+
+def _photo(fmt='JPEG', size=(1200, 900)):
+    """The same generated photo, encoded as `fmt` (so each format gets different keys)."""
+    img = Image.merge('RGB', (
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 64),
+    ))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+
+class TestRejectedUploads:
+
+    def test_inline_rejection_is_flashed(self, inline_admin, db):
+        with patch.dict(image_uploader.IMAGE_MAX_UPLOAD_BYTES, {'gallery': 1024}):
+            response = inline_admin.post(url_for('galleryimage.create_view'),
+                                         data={'caption': 'Big', 'sort_order': '1', 'image_upload': (_photo(), 'big.jpg')},
+                                         content_type='multipart/form-data', follow_redirects=True)
+
+        assert b'big.jpg&#34; was not stored: file is 0.0 MB, over the 0 MB limit for' in response.data
+        assert GalleryImage.query.one().image_s3_key is None
+
+    def test_queued_rejection_is_recorded_on_the_job(self, queued_admin, db):
+        queued_admin.post(url_for('galleryimage.create_view'),
+                          data={'caption': 'Big', 'sort_order': '1', 'image_upload': (_photo(), 'big.jpg')},
+                          content_type='multipart/form-data', follow_redirects=True)
+        with patch.dict(image_uploader.IMAGE_MAX_UPLOAD_BYTES, {'gallery': 1024}):
+            image_jobs.run_worker(once=True)
+
+        # The same file would be rejected again, so it is not retried
+        job = ImageJob.query.one()
+        assert (job.status, job.attempts) == (ImageJobStatus.FAILED, 1)
+        assert job.last_error.startswith('Image rejected: file is')
+
+
+class TestNearDuplicates:
+
+    def _add_gallery_image(self, admin, caption, photo, filename, reuse=False):
+        data = {'caption': caption, 'sort_order': '1', 'image_upload': (photo, filename)}
+        if reuse:
+            data['reuse_duplicate_images'] = 'y'
+        return admin.post(url_for('galleryimage.create_view'), data=data,
+                          content_type='multipart/form-data', follow_redirects=True)
+
+    def test_upload_form_offers_reuse_unticked(self, inline_admin):
+        response = inline_admin.get(url_for('galleryimage.create_view'))
+        checkbox = re.search(rb'<input[^>]*name="reuse_duplicate_images"[^>]*>', response.data)
+        assert checkbox and b'checked' not in checkbox.group()
+
+    def test_near_duplicate_reuses_the_stored_image(self, inline_admin, db):
+        self._add_gallery_image(inline_admin, 'First', _photo(), 'pup.jpg')
+        response = self._add_gallery_image(inline_admin, 'Again', _photo('PNG', (800, 600)), 'pup.png', reuse=True)
+
+        assert b'so the stored copy was reused' in response.data
+        first, again = GalleryImage.query.order_by(GalleryImage.id).all()
+        assert again.image_s3_key == first.image_s3_key
+        assert again.image_asset is first.image_asset
+        assert first.image_asset.dhash is not None
+        assert ImageAsset.query.count() == 1
+
+    def test_near_duplicate_is_only_flagged_by_default(self, inline_admin, db):
+        self._add_gallery_image(inline_admin, 'First', _photo(), 'pup.jpg')
+        response = self._add_gallery_image(inline_admin, 'Again', _photo('PNG', (800, 600)), 'pup.png')
+
+        assert b'looks like a near-duplicate' in response.data
+        first, again = GalleryImage.query.order_by(GalleryImage.id).all()
+        assert again.image_s3_key.endswith('.png')
+        assert ImageAsset.query.count() == 2
+        matches = image_jobs.near_duplicates(again.image_asset.dhash)
+        assert {asset for asset, _ in matches} == {first.image_asset, again.image_asset}
+
+    def test_asset_missing_sizes_cannot_stand_in(self, db):
+        asset = image_jobs.asset_for_keys('gallery/def.jpg')
+        field_map = {'original': 'main_image_s3_key', 'large': 'main_image_s3_key_large', 'asset': 'main_image_asset'}
+
+        assert image_jobs.asset_covers(asset, {'original': 'image_s3_key', 'asset': 'image_asset'})
+        assert not image_jobs.asset_covers(asset, field_map)
+
+
+def _file():
+    return FileStorage(stream=io.BytesIO(b"raw-image-bytes"), filename='photo.jpg')
@@ -0,0 +1,617 @@
+# tests/test_image_uploader.py
+
+import base64
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.utils import image_uploader
+from app.utils.storage import S3Storage
+from app.utils.image_quality import ssim
+
+
+def _make_upload(size=(2000, 1500), fmt='JPEG', mode='RGB', filename='photo.jpg', orientation=None):
+    """Builds an in-memory FileStorage holding a generated test image."""
+    # Deterministic gradients give the encoder real content to work with.
+    red = Image.linear_gradient('L').resize(size)
+    green = Image.radial_gradient('L').resize(size)
+    blue = red.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    img = Image.merge('RGB', (red, green, blue))
+    if mode == 'RGBA':
+        img.putalpha(green)
+    buf = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buf, format=fmt, exif=exif)
+    else:
+        img.save(buf, format=fmt)
+    buf.seek(0)
+    return FileStorage(stream=buf, filename=filename)
+
+
+def _use_s3(client):
+    """Routes upload_image through an S3Storage wrapped around a fake client."""
+    return patch.object(image_uploader, 'get_storage', return_value=S3Storage(bucket='test', client=client))
+
+
+class _RecordingS3:
+    """Stand-in for the boto3 client that keeps uploaded bytes by key."""
+
+    def __init__(self, latency=0.0):
+        self.objects = {}
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        self.objects[key] = fileobj.read()
+        with self._lock:
+            self.in_flight -= 1
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise KeyError(Key)
+        return {'ContentLength': len(self.objects[Key])}
+
+
+class TestResponsiveUpload:
+
+    def test_sequential_upload_returns_all_sizes(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(), folder='parents', create_responsive_versions=True
+            )
+
+        assert {'small', 'medium', 'large', 'original'} <= set(keys)
+        assert all(keys[name].startswith('parents/') for name in ('small', 'medium', 'large', 'original'))
+        small = Image.open(io.BytesIO(fake_s3.objects[keys['small']]))
+        assert max(small.size) == 480
+
+    @pytest.mark.parametrize('mode,fmt,filename', [
+        ('RGB', 'JPEG', 'photo.jpg'),
+        ('RGBA', 'PNG', 'photo.png'),
+    ])
+    def test_process_pool_matches_sequential_byte_for_byte(self, mode, fmt, filename):
+        sequential_s3 = _RecordingS3()
+        with _use_s3(sequential_s3):
+            image_uploader.upload_image(
+                _make_upload(size=(1700, 1000), fmt=fmt, mode=mode, filename=filename),
+                folder='hero', create_responsive_versions=True
+            )
+
+        pooled_s3 = _RecordingS3()
+        with ProcessPoolExecutor(max_workers=2) as pool, \
+                _use_s3(pooled_s3):
+            image_uploader.upload_image(
+                _make_upload(size=(1700, 1000), fmt=fmt, mode=mode, filename=filename),
+                folder='hero', create_responsive_versions=True, executor=pool
+            )
+
+        assert len(sequential_s3.objects) == 10  # small, medium, large, xl, original x (source, webp)
+        assert pooled_s3.objects == sequential_s3.objects
+
+    @pytest.mark.parametrize('streaming', [False, True])
+    def test_stored_variants_are_measured(self, streaming):
+        fake_s3 = _RecordingS3()
+        variants = {}
+        with _use_s3(fake_s3), \
+                patch.object(image_uploader, 'MEMORY_BUDGET', image_uploader.MemoryBudget(0)):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(2000, 1500)), folder='parents', create_responsive_versions=True,
+                streaming=streaming, variants=variants
+            )
+
+        assert set(variants) == set(fake_s3.objects)
+        assert variants[keys['small']] == {'width': 480, 'height': 360, 'bytes': len(fake_s3.objects[keys['small']])}
+        assert (variants[keys['original_webp']]['width'], variants[keys['original_webp']]['height']) == (2000, 1500)
+
+
+class TestPlaceholder:
+
+    def test_responsive_upload_includes_tiny_placeholder(self):
+        with _use_s3(_RecordingS3()):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(2000, 1500)), folder='puppies', create_responsive_versions=True
+            )
+
+        header, data = keys['placeholder'].split(',', 1)
+        assert header == 'data:image/webp;base64'
+        assert len(keys['placeholder']) < 1000
+        assert Image.open(io.BytesIO(base64.b64decode(data))).size == (20, 15)
+
+    def test_transparent_image_gets_no_placeholder(self):
+        with _use_s3(_RecordingS3()):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(800, 600), fmt='PNG', mode='RGBA', filename='photo.png'),
+                folder='puppies', create_responsive_versions=True
+            )
+
+        assert 'placeholder' not in keys
+
+
+class TestPerceptualHash:
+
+    def test_upload_records_the_hash_of_its_original(self):
+        variants = {}
+        with _use_s3(_RecordingS3()):
+            key = image_uploader.upload_image(_make_upload(size=(2000, 1500)), folder='gallery', variants=variants)
+
+        assert variants[key]['dhash'] == image_uploader.hash_upload(_make_upload(size=(2000, 1500)))
+        assert len(variants[key]['dhash']) == 16
+
+    def test_resized_and_reencoded_copies_hash_close(self):
+        original = image_uploader.hash_upload(_make_upload(size=(2000, 1500)))
+        smaller_png = image_uploader.hash_upload(_make_upload(size=(600, 450), fmt='PNG', filename='a.png'))
+        buf = io.BytesIO()
+        Image.effect_mandelbrot((2000, 1500), (-2, -1.5, 1, 1.5), 64).convert('RGB').save(buf, format='JPEG')
+        other = image_uploader.hash_upload(FileStorage(stream=buf, filename='other.jpg'))
+
+        assert image_uploader.hamming_distance(original, smaller_png) <= image_uploader.IMAGE_DUPLICATE_MAX_DISTANCE
+        assert image_uploader.hamming_distance(original, other) > image_uploader.IMAGE_DUPLICATE_MAX_DISTANCE
+
+    def test_unreadable_upload_has_no_hash(self):
+        upload = FileStorage(stream=io.BytesIO(b'not an image'), filename='a.jpg')
+        assert image_uploader.hash_upload(upload) is None
+
+
+class TestCascadedResize:
+
+    def test_each_size_is_resized_from_the_next_larger_one(self):
+        sizes = image_uploader.RESPONSIVE_SIZES_HERO
+        chains = image_uploader._plan_chains(
+            {**sizes, 'original': None}, {name: ['JPEG'] for name in (*sizes, 'original')}, 'cascade'
+        )
+
+        assert chains == [
+            [('original', None, ['JPEG'])],
+            [(name, sizes[name], ['JPEG']) for name in ('xl', 'large', 'medium', 'small')],
+        ]
+
+    def test_chain_keeps_larger_steps_needed_for_a_missing_small_variant(self):
+        sizes = image_uploader.RESPONSIVE_SIZES_BASE
+        chains = image_uploader._plan_chains(sizes, {'small': ['WEBP']}, 'cascade')
+
+        assert chains == [[('large', sizes['large'], []), ('medium', sizes['medium'], []),
+                           ('small', sizes['small'], ['WEBP'])]]
+
+    def test_cascade_matches_direct_quality(self):
+        outputs = {}
+        for mode in ('direct', 'cascade'):
+            fake_s3 = _RecordingS3()
+            with _use_s3(fake_s3), \
+                    patch.object(image_uploader, 'IMAGE_RESIZE_MODE', mode):
+                keys = image_uploader.upload_image(
+                    _make_upload(size=(2400, 1600)), folder='parents', create_responsive_versions=True
+                )
+            outputs[mode] = {name: Image.open(io.BytesIO(fake_s3.objects[keys[name]]))
+                             for name in ('small', 'medium', 'large')}
+
+        for name, direct in outputs['direct'].items():
+            cascaded = outputs['cascade'][name]
+            assert cascaded.size == direct.size
+            assert ssim(direct, cascaded) > 0.99
+
+
+class TestQualityTargeting:
+
+    def _upload(self, upload, mode='ssim'):
+        fake_s3, variants = _RecordingS3(), {}
+        with _use_s3(fake_s3), patch.object(image_uploader, 'IMAGE_QUALITY_MODE', mode):
+            keys = image_uploader.upload_image(upload, folder='puppies', create_responsive_versions=True,
+                                               variants=variants)
+        return fake_s3, keys, variants
+
+    def test_smooth_image_gets_a_lower_quality_that_still_reaches_the_target(self):
+        fake_s3, keys, variants = self._upload(_make_upload(size=(1000, 750)))
+        _, fixed_keys, fixed_variants = self._upload(_make_upload(size=(1000, 750)), mode='fixed')
+
+        medium = variants[keys['medium']]
+        assert medium['quality'] < image_uploader.JPEG_QUALITY
+        assert medium['bytes_saved'] == fixed_variants[fixed_keys['medium']]['bytes'] - medium['bytes']
+        assert variants[keys['medium_webp']]['quality'] <= image_uploader.WEBP_QUALITY
+        # Different encoder settings, different keys
+        assert keys['medium'] != fixed_keys['medium']
+
+        source = Image.open(_make_upload(size=(1000, 750)))
+        source.thumbnail((800, 800), Image.Resampling.LANCZOS)
+        stored = Image.open(io.BytesIO(fake_s3.objects[keys['medium']]))
+        assert ssim(source, stored) >= image_uploader.IMAGE_TARGET_SSIM
+
+    def test_busy_image_keeps_the_fixed_quality(self):
+        buf = io.BytesIO()
+        Image.effect_noise((600, 400), 20).convert('RGB').save(buf, format='JPEG', quality=95)
+        buf.seek(0)
+        _, keys, variants = self._upload(FileStorage(stream=buf, filename='fur.jpg'))
+
+        small = variants[keys['small']]
+        assert (small['quality'], small['bytes_saved']) == (image_uploader.JPEG_QUALITY, 0)
+
+    def test_large_images_are_searched_on_a_crop(self):
+        with patch.object(image_uploader, 'QUALITY_SEARCH_SAMPLE_EDGE', 256), \
+                patch.object(image_uploader, 'ssim', wraps=ssim) as measured:
+            _, keys, variants = self._upload(_make_upload(size=(1000, 750)))
+
+        assert {call.args[0].size for call in measured.call_args_list} <= {(256, 256)}
+        assert variants[keys['original']]['bytes_saved'] > 0
+
+
+class TestDraftDecode:
+
+    def test_variants_use_scaled_decode_and_original_stays_full_size(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3), \
+                patch.object(image_uploader, '_render_source_chain',
+                             wraps=image_uploader._render_source_chain) as full_decode:
+            keys = image_uploader.upload_image(
+                _make_upload(size=(3000, 2000), orientation=6), folder='parents',
+                create_responsive_versions=True
+            )
+
+        # Only the original needed the full-resolution decode...
+        assert [chain[0][0] for _, (_, chain, _), _ in full_decode.mock_calls] == ['original']
+        # ...and EXIF orientation 6 (rotate 90 CW) is applied to both paths
+        assert Image.open(io.BytesIO(fake_s3.objects[keys['original']])).size == (2000, 3000)
+        assert Image.open(io.BytesIO(fake_s3.objects[keys['large']])).size == (800, 1200)
+
+    def test_draft_variants_match_full_decode_quality(self):
+        outputs = {}
+        for enabled in (False, True):
+            fake_s3 = _RecordingS3()
+            with _use_s3(fake_s3), \
+                    patch.object(image_uploader, 'IMAGE_DRAFT_DECODE', enabled):
+                keys = image_uploader.upload_image(
+                    _make_upload(size=(3000, 2000), orientation=8), folder='parents',
+                    create_responsive_versions=True
+                )
+            outputs[enabled] = {name: Image.open(io.BytesIO(fake_s3.objects[keys[name]]))
+                                for name in ('small', 'medium', 'large')}
+
+        for name, full in outputs[False].items():
+            drafted = outputs[True][name]
+            assert drafted.size == full.size
+            assert ssim(full, drafted) > 0.99
+
+    def test_reused_original_skips_full_decode(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(3000, 2000)), folder='parents', create_responsive_versions=True
+            )
+            del fake_s3.objects[keys['small']]
+
+            with patch.object(image_uploader, '_render_source_chain') as full_decode:
+                image_uploader.upload_image(
+                    _make_upload(size=(3000, 2000)), folder='parents', create_responsive_versions=True
+                )
+
+        full_decode.assert_not_called()
+        assert keys['small'] in fake_s3.objects
+
+    def test_pooled_draft_upload_matches_sequential(self):
+        sequential_s3 = _RecordingS3()
+        with _use_s3(sequential_s3):
+            image_uploader.upload_image(
+                _make_upload(size=(3000, 2000)), folder='parents', create_responsive_versions=True
+            )
+
+        pooled_s3 = _RecordingS3()
+        with ProcessPoolExecutor(max_workers=2) as pool, \
+                _use_s3(pooled_s3):
+            image_uploader.upload_image(
+                _make_upload(size=(3000, 2000)), folder='parents',
+                create_responsive_versions=True, executor=pool
+            )
+
+        assert pooled_s3.objects == sequential_s3.objects
+
+
+# Runs concurrent streaming uploads in a fresh interpreter and prints the peak
+# RSS growth (MB) they caused, so earlier tests cannot skew the high-water mark.
+_PEAK_RSS_SCRIPT = textwrap.dedent("""
+    import io, resource, sys, threading
+    from werkzeug.datastructures import FileStorage
+    from app.utils import image_uploader
+    from app.utils.storage import S3Storage
+
+    class Sink:
+        def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+            while fileobj.read(1 << 20):
+                pass
+
+        def head_object(self, Bucket, Key):
+            raise KeyError(Key)
+
+    image_uploader.get_storage = lambda: S3Storage(bucket="test", client=Sink())
+    streaming = sys.argv[1] == "streaming"
+    uploads = [open(path, "rb").read() for path in sys.argv[2:]]
+
+    def peak_mb():
+        # VmHWM, not ru_maxrss: Linux carries the parent's RSS into ru_maxrss across exec
+        with open("/proc/self/status") as status:
+            hwm = next(line for line in status if line.startswith("VmHWM:"))
+        return int(hwm.split()[1]) / 1024
+
+    # Current (not high-water) RSS, so import-time spikes do not hide growth
+    with open("/proc/self/statm") as statm:
+        baseline = int(statm.read().split()[1]) * resource.getpagesize() / 2**20
+    threads = [
+        threading.Thread(target=image_uploader.upload_image, args=(FileStorage(io.BytesIO(data)),),
+                         kwargs={"folder": "parents", "create_responsive_versions": True, "streaming": streaming})
+        for data in uploads
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(peak_mb() - baseline)
+""")
+
+
+class TestStreamingUpload:
+
+    def test_streaming_upload_stores_same_objects(self):
+        buffered_s3 = _RecordingS3()
+        with _use_s3(buffered_s3):
+            image_uploader.upload_image(_make_upload(size=(3000, 2000)), folder='parents',
+                                        create_responsive_versions=True)
+
+        streamed_s3 = _RecordingS3()
+        timings = {}
+        with _use_s3(streamed_s3), \
+                patch.object(image_uploader, 'MEMORY_BUDGET', image_uploader.MemoryBudget(100 * 2**20)):
+            image_uploader.upload_image(_make_upload(size=(3000, 2000)), folder='parents',
+                                        create_responsive_versions=True, streaming=True, timings=timings)
+
+        assert streamed_s3.objects == buffered_s3.objects
+        assert streamed_s3.max_in_flight == 1
+        assert list(timings['uploads']) == list(streamed_s3.objects)
+
+    def test_image_larger_than_budget_is_rejected_before_decoding(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3), \
+                patch.object(image_uploader, 'MEMORY_BUDGET', image_uploader.MemoryBudget(10 * 2**20)), \
+                patch.object(image_uploader, '_upload_image') as process:
+            result = image_uploader.upload_image(_make_upload(size=(3000, 2000)), streaming=True)
+
+        assert result is None
+        process.assert_not_called()
+
+    def test_spooled_buffer_spills_to_disk_above_threshold(self):
+        img = Image.effect_noise((600, 600), 64).convert('RGB')
+        with patch.object(image_uploader, 'IMAGE_SPOOL_THRESHOLD', 1024):
+            spilled = image_uploader._save_image_to_bytes(img, 'JPEG', spool=True)
+        with patch.object(image_uploader, 'IMAGE_SPOOL_THRESHOLD', 16 * 2**20):
+            in_memory = image_uploader._save_image_to_bytes(img, 'JPEG', spool=True)
+
+        assert spilled._rolled and not in_memory._rolled
+        assert spilled.read() == in_memory.read()
+
+    @pytest.mark.skipif(not sys.platform.startswith('linux'), reason="ru_maxrss units and allocator are Linux-specific")
+    def test_peak_rss_stays_under_memory_budget(self, tmp_path):
+        budget_mb = 100
+        paths = []
+        for i in range(3):
+            path = tmp_path / f'photo-{i}.jpg'
+            path.write_bytes(_make_upload(size=(3000 + i * 8, 2000)).read())
+            paths.append(str(path))
+
+        env = {
+            **os.environ,
+            'SECRET_KEY': 'test',
+            'IMAGE_MEMORY_BUDGET_MB': str(budget_mb),
+            'PYTHONPATH': os.getcwd(),
+        }
+
+        def peak_growth(mode):
+            result = subprocess.run(
+                [sys.executable, '-c', _PEAK_RSS_SCRIPT, mode, *paths],
+                env=env, capture_output=True, text=True, timeout=300, check=True
+            )
+            return float(result.stdout.strip().splitlines()[-1])
+
+        # Three 6MP uploads at once would blow the budget...
+        assert peak_growth('buffered') > budget_mb
+        # ...but streaming admits them one at a time
+        assert peak_growth('streaming') < budget_mb
+
+
+class TestIngestLimits:
+
+    def _stored_original(self, fake_s3, key):
+        return Image.open(io.BytesIO(fake_s3.objects[key]))
+
+    def test_oversized_jpeg_is_downscaled_from_a_scaled_decode(self):
+        fake_s3 = _RecordingS3()
+        timings = {}
+        with _use_s3(fake_s3), patch.object(image_uploader, 'IMAGE_MAX_PIXELS', {'': 1_000_000}):
+            keys = image_uploader.upload_image(_make_upload(size=(3000, 2000)), folder='parents',
+                                               create_responsive_versions=True, timings=timings)
+
+        original = self._stored_original(fake_s3, keys['original'])
+        assert original.size == (1224, 816)
+        # Decoded at 1/2 scale, never at the full 3000x2000
+        assert timings['decoded_bytes'] == 1500 * 1000 * 4
+
+    def test_oversized_png_is_downscaled(self):
+        fake_s3 = _RecordingS3()
+        timings = {}
+        with _use_s3(fake_s3), patch.object(image_uploader, 'IMAGE_MAX_PIXELS', {'': 1_000_000}):
+            key = image_uploader.upload_image(_make_upload(size=(2000, 1500), fmt='PNG', filename='a.png'),
+                                              timings=timings)
+
+        assert self._stored_original(fake_s3, key).size == (1154, 866)
+        assert timings['decoded_bytes'] == 2000 * 1500 * 4
+
+    def test_images_within_the_limit_are_untouched(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            key = image_uploader.upload_image(_make_upload(size=(1200, 900)))
+
+        assert self._stored_original(fake_s3, key).size == (1200, 900)
+
+    def test_folder_limits_override_the_default(self):
+        with patch.object(image_uploader, 'IMAGE_MAX_PIXELS', {'': 1_000_000, 'hero': 5_000_000}), \
+                patch.object(image_uploader, 'IMAGE_MAX_UPLOAD_BYTES', {'': 2**20}):
+            assert image_uploader.image_limits('hero') == (5_000_000, 2**20)
+            assert image_uploader.image_limits('gallery') == (1_000_000, 2**20)
+
+    def test_upload_over_the_byte_limit_is_rejected_before_decoding(self):
+        with _use_s3(_RecordingS3()), \
+                patch.object(image_uploader, 'IMAGE_MAX_UPLOAD_BYTES', {'': 1024}), \
+                patch.object(image_uploader, '_upload_image') as process:
+            result = image_uploader.upload_image(_make_upload(size=(800, 600)))
+
+        assert result is None
+        process.assert_not_called()
+
+    def test_image_too_large_to_decode_is_rejected(self):
+        with _use_s3(_RecordingS3()), \
+                patch.object(image_uploader, 'IMAGE_MAX_PIXELS', {'': 100_000}), \
+                patch.object(image_uploader, 'IMAGE_MAX_DECODE_PIXELS', 1_000_000), \
+                patch.object(image_uploader, '_upload_image') as process:
+            png = image_uploader.upload_image(_make_upload(size=(2000, 1500), fmt='PNG', filename='a.png'))
+            # A JPEG of the same size decodes at 1/4 scale, within the limit
+            jpeg_error = image_uploader._check_ingest_limits(_make_upload(size=(2000, 1500)), 'general')
+
+        assert png is None
+        process.assert_not_called()
+        assert jpeg_error is None
+
+    def test_memory_estimate_uses_the_downscaled_size(self):
+        upload = _make_upload(size=(3000, 2000))
+        full = image_uploader._estimate_working_set(upload)
+        with patch.object(image_uploader, 'IMAGE_MAX_PIXELS', {'': 1_000_000}):
+            capped = image_uploader._estimate_working_set(upload)
+
+        assert capped < full / 2
+
+
+class TestConcurrentUpload:
+
+    def test_variants_upload_concurrently(self):
+        fake_s3 = _RecordingS3(latency=0.2)
+        timings = {}
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(900, 600)), folder='about',
+                create_responsive_versions=True, timings=timings
+            )
+
+        assert len(fake_s3.objects) == 8
+        # The 200ms round trips overlap, rather than running one after another
+        assert fake_s3.max_in_flight > 1
+
+    def test_timings_breakdown_is_reported(self):
+        timings = {}
+        with _use_s3(_RecordingS3()):
+            key = image_uploader.upload_image(_make_upload(size=(600, 400)), timings=timings)
+
+        assert {'decode', 'render', 'upload', 'total', 'uploads'} <= set(timings)
+        assert list(timings['uploads']) == [key, image_uploader.format_key(key, 'webp')]
+        assert timings['total'] >= timings['render']
+
+
+class TestContentAddressedKeys:
+
+    def test_keys_are_derived_from_image_content(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            first = image_uploader.upload_image(_make_upload(size=(600, 400), filename='a.jpg'), folder='gallery')
+            renamed = image_uploader.upload_image(_make_upload(size=(600, 400), filename='b.jpg'), folder='gallery')
+            different = image_uploader.upload_image(_make_upload(size=(640, 400), filename='a.jpg'), folder='gallery')
+
+        assert first == renamed
+        assert first != different
+        assert first.startswith('gallery/') and first.endswith('.jpg')
+
+    def test_reupload_skips_processing_and_upload(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(900, 600)), folder='parents', create_responsive_versions=True
+            )
+            stored = dict(fake_s3.objects)
+
+            timings = {}
+            with patch.object(image_uploader, '_save_image_to_bytes') as mock_encode:
+                again = image_uploader.upload_image(
+                    _make_upload(size=(900, 600), filename='same-photo.jpg'), folder='parents',
+                    create_responsive_versions=True, timings=timings
+                )
+
+        assert again == keys
+        mock_encode.assert_not_called()
+        assert timings['reused'] == 8
+        assert timings['uploads'] == {}
+        assert fake_s3.objects == stored
+
+    def test_missing_variant_is_regenerated(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(900, 600)), folder='parents', create_responsive_versions=True
+            )
+            del fake_s3.objects[keys['small']]
+
+            timings = {}
+            image_uploader.upload_image(
+                _make_upload(size=(900, 600)), folder='parents',
+                create_responsive_versions=True, timings=timings
+            )
+
+        assert list(timings['uploads']) == [keys['small']]
+        assert keys['small'] in fake_s3.objects
+
+
+class TestAlternateFormats:
+
+    def test_webp_variants_are_stored_alongside_source_format(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(900, 600)), folder='parents', create_responsive_versions=True
+            )
+
+        assert keys['formats'] == 'webp'
+        assert keys['small_webp'] == image_uploader.format_key(keys['small'], 'webp')
+        assert keys['small_webp'].endswith('-small.webp')
+        webp = Image.open(io.BytesIO(fake_s3.objects[keys['small_webp']]))
+        assert webp.format == 'WEBP' and max(webp.size) == 480
+
+    def test_png_alpha_is_preserved_in_webp(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3):
+            key = image_uploader.upload_image(
+                _make_upload(size=(300, 200), fmt='PNG', mode='RGBA', filename='logo.png'), folder='gallery'
+            )
+
+        webp = Image.open(io.BytesIO(fake_s3.objects[image_uploader.format_key(key, 'webp')]))
+        assert webp.mode == 'RGBA'
+
+    def test_avif_is_emitted_when_enabled(self):
+        fake_s3 = _RecordingS3()
+        with _use_s3(fake_s3), \
+                patch.object(image_uploader, 'ALTERNATE_FORMATS', ['AVIF', 'WEBP']):
+            keys = image_uploader.upload_image(
+                _make_upload(size=(600, 400)), folder='about', create_responsive_versions=True
+            )
+
+        assert keys['formats'] == 'avif,webp'
+        assert Image.open(io.BytesIO(fake_s3.objects[keys['medium_avif']])).format == 'AVIF'
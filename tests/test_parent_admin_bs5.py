@@ -32,7 +32,7 @@ class TestAdminParentBS5:
         )
         yield client
 
-    @patch('app.routes.admin.views.parent_views.upload_image')
+    @patch('app.routes.admin.views.base.upload_image')
     def test_full_parent_crud_workflow_bs5(self, mock_upload_image, setup_and_login, db):
         """
         Tests the complete CREATE, READ, UPDATE, and DELETE lifecycle for a Parent
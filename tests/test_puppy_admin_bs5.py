@@ -36,7 +36,7 @@ class TestAdminPuppyBS5:
         )
         yield client
 
-    @patch('app.routes.admin.views.puppy_views.upload_image', return_value='puppies/mock-puppy.jpg')
+    @patch('app.routes.admin.views.base.upload_image', return_value='puppies/mock-puppy.jpg')
     def test_full_puppy_crud_workflow_bs5(self, mock_upload_image, setup_and_login, db):
         """
         Tests the complete CREATE, READ, UPDATE, and DELETE lifecycle for a Puppy
@@ -1,5 +1,5 @@
 # tests/test_routes.py
-from app.models import Parent, ParentRole, HeroSection, Puppy, PuppyStatus
+from app.models import Parent, ParentRole, HeroSection, Puppy, PuppyStatus, GalleryImage
 from datetime import date
 from unittest.mock import patch
 
@@ -48,4 +48,191 @@ def test_parents_page_route_with_presigned_urls(mock_generate_url, client, db):
     # The name is rendered as 'Archie', and the `text-uppercase` class handles the styling.
     # The test should check for the actual data in the response.
     assert b'Archie' in response.data
-    mock_generate_url.assert_called()
\ No newline at end of file
+    mock_generate_url.assert_called()
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_parents_page_offers_alternate_formats(mock_generate_url, client, db):
+    """
+    GIVEN a parent whose main image was also stored as WebP
+    WHEN the '/parents' route is requested
+    THEN check that a WebP <source> precedes the JPEG fallback
+    """
+    parent = Parent(
+        name='Penelope',
+        role=ParentRole.MOM,
+        main_image_s3_key='parents/abc-original.jpg',
+        main_image_formats='webp',
+        description='A test mom.'
+    )
+    db.session.add(parent)
+    db.session.commit()
+
+    response = client.get('/parents')
+    assert response.status_code == 200
+    assert b'<source type="image/webp" srcset="https://cdn.test/parents/abc-original.webp">' in response.data
+    assert b'src="https://cdn.test/parents/abc-original.jpg"' in response.data
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_parents_page_sends_smallest_adequate_variant(mock_generate_url, client, db):
+    """
+    GIVEN a parent whose main image has an ImageAsset with several sizes
+    WHEN the '/parents' route is requested
+    THEN check that the carousel gets the large variant rather than the original
+    """
+    from app.utils.image_jobs import asset_for_keys
+
+    keys = {
+        'original': 'parents/abc-original.jpg',
+        'large': 'parents/abc-large.jpg',
+        'original_webp': 'parents/abc-original.webp',
+        'large_webp': 'parents/abc-large.webp',
+        'formats': 'webp',
+    }
+    parent = Parent(
+        name='Penelope',
+        role=ParentRole.MOM,
+        main_image_s3_key=keys['original'],
+        main_image_formats='webp',
+        main_image_asset=asset_for_keys(keys),
+        description='A test mom.'
+    )
+    db.session.add(parent)
+    db.session.commit()
+
+    response = client.get('/parents')
+    assert response.status_code == 200
+    assert b'<source type="image/webp" srcset="https://cdn.test/parents/abc-large.webp">' in response.data
+    assert b'src="https://cdn.test/parents/abc-large.jpg"' in response.data
+    assert b'abc-original' not in response.data
+
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_gallery_thumbnails_inline_their_placeholder(mock_generate_url, client, db):
+    """
+    GIVEN a gallery image whose asset has a placeholder
+    WHEN the '/' route is requested
+    THEN check that the thumbnail carries it as its initial background
+    """
+    from app.utils.image_jobs import asset_for_keys
+
+    placeholder = 'data:image/webp;base64,UklGRiQAAABXRUJQ'
+    keys = {'original': 'gallery/abc-original.jpg', 'small': 'gallery/abc-small.jpg', 'placeholder': placeholder}
+    db.session.add(GalleryImage(image_s3_key=keys['original'], image_asset=asset_for_keys(keys)))
+    db.session.commit()
+
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'class="img-fluid img-thumbnail lqip"' in response.data
+    assert f"style=\"background-image: url('{placeholder}')\"".encode() in response.data
+
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_single_size_image_is_resized_on_demand(mock_generate_url, client, db):
+    """
+    GIVEN a parent whose asset only has the original (e.g. a backfilled upload)
+    WHEN the '/parents' route is requested
+    THEN check that the carousel points at the /img resize endpoint instead
+    """
+    from app.utils.image_jobs import asset_for_keys
+
+    keys = {'original': 'parents/abc.jpg', 'original_webp': 'parents/abc.webp', 'formats': 'webp'}
+    parent = Parent(
+        name='Penelope',
+        role=ParentRole.MOM,
+        main_image_s3_key=keys['original'],
+        main_image_asset=asset_for_keys(keys),
+        description='A test mom.'
+    )
+    db.session.add(parent)
+    db.session.commit()
+
+    response = client.get('/parents')
+    assert b'srcset="/img/parents/abc.jpg?w=1200&amp;fmt=webp"' in response.data
+    assert b'src="/img/parents/abc.jpg?w=1200&amp;fmt=jpeg"' in response.data
+
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_measured_variants_get_dimensions_and_srcset(mock_generate_url, client, db):
+    """
+    GIVEN a parent whose asset variants were measured at upload
+    WHEN the '/parents' route is requested
+    THEN check that the carousel <img> has width/height plus a srcset and sizes
+    """
+    from app.utils.image_jobs import asset_for_keys
+
+    keys = {name: f'parents/abc-{name}.jpg' for name in ('original', 'small', 'medium', 'large')}
+    measured = {
+        keys['original']: {'width': 3000, 'height': 2000, 'bytes': 900000},
+        keys['small']: {'width': 480, 'height': 320, 'bytes': 30000},
+        keys['medium']: {'width': 800, 'height': 533, 'bytes': 70000},
+        keys['large']: {'width': 1200, 'height': 800, 'bytes': 150000},
+    }
+    parent = Parent(
+        name='Penelope',
+        role=ParentRole.MOM,
+        main_image_s3_key=keys['original'],
+        main_image_asset=asset_for_keys(keys, measured),
+        description='A test mom.'
+    )
+    db.session.add(parent)
+    db.session.commit()
+
+    response = client.get('/parents')
+    assert (
+        b'srcset="https://cdn.test/parents/abc-small.jpg 480w, https://cdn.test/parents/abc-medium.jpg 800w, '
+        b'https://cdn.test/parents/abc-large.jpg 1200w, https://cdn.test/parents/abc-original.jpg 3000w" '
+        b'sizes="(max-width: 1200px) 100vw, 1200px" width="1200" height="800"'
+    ) in response.data
+
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://cdn.test/{key}')
+def test_measured_single_size_image_offers_on_demand_widths(mock_generate_url, client, db):
+    """
+    GIVEN a parent whose asset only has a measured 1000px original
+    WHEN the '/parents' route is requested
+    THEN check that the srcset lists the /img widths below it and the original
+    """
+    from app.utils.image_jobs import asset_for_keys
+
+    keys = {'original': 'parents/abc.jpg'}
+    parent = Parent(
+        name='Penelope',
+        role=ParentRole.MOM,
+        main_image_s3_key=keys['original'],
+        main_image_asset=asset_for_keys(keys, {keys['original']: {'width': 1000, 'height': 750, 'bytes': 1}}),
+        description='A test mom.'
+    )
+    db.session.add(parent)
+    db.session.commit()
+
+    response = client.get('/parents')
+    assert b'/img/parents/abc.jpg?w=800&amp;fmt=jpeg 800w, https://cdn.test/parents/abc.jpg 1000w"' in response.data
+    assert b'src="https://cdn.test/parents/abc.jpg"' in response.data
+    assert b'width="1000" height="750"' in response.data
+
+
+@patch('app.utils.template_filters.generate_presigned_url', side_effect=lambda key: f'https://signed.example/{key}')
+def test_presigned_urls_are_shared_by_workers_through_the_filesystem_cache(mock_generate_url, tmp_path):
+    """
+    GIVEN two app instances (workers) with CACHE_TYPE=FileSystemCache in one directory
+    WHEN both render the same key with the s3_url filter
+    THEN the URL is signed once, and the counters record one miss and one hit
+    """
+    from app import create_app
+    from config import TestingConfig
+
+    class SharedCacheConfig(TestingConfig):
+        CACHE_TYPE = 'FileSystemCache'
+        CACHE_DIR = str(tmp_path / 'cache')
+
+    workers = [create_app(SharedCacheConfig), create_app(SharedCacheConfig)]
+    for worker in workers:
+        with worker.app_context():
+            assert worker.jinja_env.filters['s3_url']('gallery/pup.jpg') == 'https://signed.example/gallery/pup.jpg'
+            worker.extensions['presigned_url_counters'].flush()
+    assert mock_generate_url.call_count == 1
+
+    result = workers[0].test_cli_runner().invoke(args=['images', 'cache-stats', '--reset'])
+    assert '2 lookup(s), 1 hit(s), 1 signed (50.0% hit rate)' in result.output
+    with workers[1].app_context():
+        assert workers[1].extensions['presigned_url_counters'].totals() == {'lookups': 0, 'hits': 0, 'misses': 0}
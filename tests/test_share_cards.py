@@ -0,0 +1,112 @@
+# tests/test_share_cards.py
+
+import io
+from datetime import date
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import Litter, Parent, ParentRole, Puppy, PuppyStatus
+from app.utils.image_jobs import apply_image_keys
+from app.utils.image_uploader import upload_image
+from app.utils.share_cards import (
+    BADGE_COLOURS, SHARE_CARD_SIZE, litter_card, refresh_share_card, refresh_share_cards,
+)
+from app.utils.storage import LocalStorage
+
+PUPPY_FIELDS = {'original': 'main_image_s3_key', 'formats': 'main_image_formats', 'asset': 'main_image_asset'}
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Points the app at a fresh local storage directory."""
+    storage = LocalStorage(tmp_path / 'media')
+    app.extensions['image_storage'] = storage
+    return storage
+
+
+@pytest.fixture
+def litter(db, local_storage):
+    """A litter of Penelope & Archie with one available puppy that has a photo."""
+    mom = Parent(name='Penelope', role=ParentRole.MOM)
+    dad = Parent(name='Archie', role=ParentRole.DAD)
+    litter = Litter(mother=mom, father=dad, birth_date=date(2026, 8, 1), breed_name='F1B Goldendoodle')
+    puppy = Puppy(name='Biscuit', status=PuppyStatus.AVAILABLE, litter=litter)
+
+    buf = io.BytesIO()
+    Image.linear_gradient('L').resize((1600, 1200)).convert('RGB').save(buf, format='JPEG')
+    buf.seek(0)
+    keys = upload_image(FileStorage(stream=buf, filename='biscuit.jpg'), folder='puppies',
+                        create_responsive_versions=True)
+    apply_image_keys(puppy, keys, PUPPY_FIELDS)
+    db.session.add_all([mom, dad, litter, puppy])
+    db.session.commit()
+    return litter
+
+
+class TestShareCards:
+
+    def test_renders_a_card_once(self, db, litter, local_storage):
+        assert refresh_share_card(litter) is True
+        key = litter.share_image_s3_key
+
+        card = Image.open(io.BytesIO(local_storage.get(key)))
+        assert (card.format, card.size) == ('JPEG', SHARE_CARD_SIZE)
+        # Nothing changed: the stored card is kept
+        assert refresh_share_card(litter) is False
+        assert litter.share_image_s3_key == key
+
+    def test_status_change_replaces_puppy_and_litter_cards(self, db, litter):
+        puppy = litter.puppies[0]
+        refresh_share_cards(puppy)
+        before = (puppy.share_image_s3_key, litter.share_image_s3_key)
+
+        puppy.status = PuppyStatus.RESERVED
+        assert refresh_share_cards(puppy) == 2
+        assert puppy.share_image_s3_key != before[0]
+        assert litter.share_image_s3_key != before[1]
+
+    def test_litter_without_photo_uses_the_same_puppy_as_its_tile(self, db, litter):
+        first = litter.puppies[0]
+        litter.puppies.append(Puppy(name='Aspen', status=PuppyStatus.AVAILABLE, main_image_s3_key='puppies/aspen.jpg'))
+        db.session.commit()
+
+        assert litter.puppies[0] is first
+        assert litter_card(litter)[0] == first.main_image_asset.variant_for(SHARE_CARD_SIZE[0]).key
+
+    @pytest.mark.parametrize('statuses, badge', [
+        ([PuppyStatus.SOLD, PuppyStatus.SOLD], ('All puppies sold', PuppyStatus.SOLD)),
+        ([PuppyStatus.RESERVED, PuppyStatus.RESERVED], ('All puppies reserved', PuppyStatus.RESERVED)),
+        ([PuppyStatus.RESERVED, PuppyStatus.SOLD], ('All puppies reserved or sold', PuppyStatus.RESERVED)),
+    ])
+    def test_litter_badge_follows_the_puppies_statuses(self, db, litter, statuses, badge):
+        litter.puppies.append(Puppy(name='Aspen'))
+        for puppy, status in zip(litter.puppies, statuses):
+            puppy.status = status
+
+        assert litter_card(litter)[3:] == (badge[0], BADGE_COLOURS[badge[1]])
+
+    def test_cli_renders_missing_cards(self, app, db, litter):
+        result = app.test_cli_runner().invoke(args=['images', 'cards'])
+
+        assert result.exit_code == 0, result.output
+        assert 'Rendered 2 share card(s)' in result.output
+        assert db.session.get(Puppy, litter.puppies[0].id).share_image_s3_key.startswith('share/')
+
+
+def test_litter_page_links_its_card_for_crawlers(client, db, litter):
+    refresh_share_card(litter)
+    db.session.commit()
+
+    page = client.get(f'/litters/{litter.id}')
+    card_url = f'http://localhost/og/{litter.share_image_s3_key}'
+
+    assert f'<meta property="og:image" content="{card_url}">'.encode() in page.data
+    assert b'<meta name="twitter:card" content="summary_large_image">' in page.data
+
+    response = client.get(card_url)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get('/og/puppies/anything.jpg').status_code == 404
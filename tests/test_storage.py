@@ -0,0 +1,277 @@
+# tests/test_storage.py
+
+import base64
+import io
+import json
+import os
+import time
+from unittest.mock import patch
+
+import boto3
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.utils import image_uploader
+from app.utils.resize_cache import DiskLRUCache
+from app.utils.storage import LocalStorage, S3Storage, get_storage
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Points the app at a fresh local storage directory."""
+    storage = LocalStorage(tmp_path)
+    app.extensions['image_storage'] = storage
+    return storage
+
+
+def _jpeg_upload(size=(900, 600)):
+    buf = io.BytesIO()
+    Image.linear_gradient('L').resize(size).convert('RGB').save(buf, format='JPEG')
+    buf.seek(0)
+    return FileStorage(stream=buf, filename='photo.jpg')
+
+
+class TestLocalStorage:
+
+    def test_get_returns_bytes_or_none(self, tmp_path):
+        storage = LocalStorage(tmp_path)
+        storage.put('gallery/a.jpg', b'aaa', 'image/jpeg')
+
+        assert storage.get('gallery/a.jpg') == b'aaa'
+        assert storage.get('gallery/missing.jpg') is None
+        assert storage.get('../outside.jpg') is None
+
+    def test_put_exists_and_delete(self, tmp_path):
+        storage = LocalStorage(tmp_path)
+        storage.put_many({
+            'gallery/a.jpg': (b'aaa', 'image/jpeg'),
+            'gallery/b.webp': (io.BytesIO(b'bbb'), 'image/webp'),
+        })
+
+        assert (tmp_path / 'gallery' / 'a.jpg').read_bytes() == b'aaa'
+        assert storage.existing(['gallery/a.jpg', 'gallery/b.webp', 'gallery/c.jpg']) == {
+            'gallery/a.jpg', 'gallery/b.webp'
+        }
+
+        storage.delete_many(['gallery/a.jpg', 'gallery/missing.jpg'])
+        assert not storage.exists('gallery/a.jpg')
+        assert storage.exists('gallery/b.webp')
+
+    def test_keys_cannot_escape_the_storage_root(self, tmp_path):
+        storage = LocalStorage(tmp_path / 'media')
+        with pytest.raises(ValueError):
+            storage.put('../outside.jpg', b'x', 'image/jpeg')
+        assert not storage.exists('../../etc/passwd')
+
+    def test_app_uses_configured_backend(self, app):
+        assert isinstance(get_storage(), LocalStorage)
+
+
+class TestMediaRoute:
+
+    def test_uploaded_image_is_served_with_immutable_caching(self, client, local_storage):
+        keys = image_uploader.upload_image(_jpeg_upload(), folder='parents', create_responsive_versions=True)
+
+        url = image_uploader.generate_presigned_url(keys['small'])
+        assert url == f"/media/{keys['small']}"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert max(Image.open(io.BytesIO(response.data)).size) == 480
+
+    def test_missing_key_is_404(self, client, local_storage):
+        assert client.get('/media/parents/nope.jpg').status_code == 404
+
+    def test_route_is_disabled_for_s3(self, app, client, local_storage):
+        local_storage.put('gallery/a.jpg', b'aaa', 'image/jpeg')
+        app.extensions['image_storage'] = S3Storage(bucket='test', client=object())
+        assert client.get('/media/gallery/a.jpg').status_code == 404
+
+    def test_direct_upload_enforces_the_signed_policy(self, client, local_storage):
+        post = local_storage.presigned_post('uploads/a.jpg', max_bytes=4)
+
+        def send(data, fields=post['fields']):
+            return client.post(post['url'], data={**fields, 'file': (io.BytesIO(data), 'a.jpg')},
+                               content_type='multipart/form-data').status_code
+
+        assert send(b'too large') == 413
+        assert send(b'aaa') == 204
+        assert local_storage.get('uploads/a.jpg') == b'aaa'
+
+        expired = local_storage.presigned_post('uploads/b.jpg', max_bytes=4, expiration=-1)
+        assert send(b'bbb', expired['fields']) == 403
+
+
+@pytest.fixture
+def resize_cache(app, tmp_path):
+    cache = DiskLRUCache(tmp_path / 'resize-cache', 10 * 1024 * 1024)
+    app.extensions['image_resize_cache'] = cache
+    return cache
+
+
+class TestResizeEndpoint:
+
+    def test_resizes_to_allowed_width_and_caches(self, client, local_storage, resize_cache):
+        key = image_uploader.upload_image(_jpeg_upload(size=(1600, 1200)), folder='gallery')
+
+        with patch.object(local_storage, 'get', wraps=local_storage.get) as storage_get:
+            first = client.get(f'/img/{key}?w=480&fmt=webp')
+            second = client.get(f'/img/{key}?w=480&fmt=webp')
+
+        assert first.status_code == 200
+        assert first.mimetype == 'image/webp'
+        assert first.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert Image.open(io.BytesIO(first.data)).size == (480, 360)
+        assert second.data == first.data
+        assert storage_get.call_count == 1  # second request served from the cache
+
+    def test_defaults_to_source_format(self, client, local_storage, resize_cache):
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+
+        response = client.get(f'/img/{key}?w=320')
+        assert response.mimetype == 'image/jpeg'
+        assert Image.open(io.BytesIO(response.data)).width == 320
+
+    @pytest.mark.parametrize('transparent, mimetype', [(False, 'image/jpeg'), (True, 'image/png')])
+    def test_gif_falls_back_to_an_encodable_format(self, client, local_storage, resize_cache, transparent, mimetype):
+        buf = io.BytesIO()
+        Image.new('P', (640, 480), 1).save(buf, format='GIF', **({'transparency': 0} if transparent else {}))
+        local_storage.put('gallery/pup.gif', io.BytesIO(buf.getvalue()), 'image/gif')
+
+        with patch.object(local_storage, 'get', wraps=local_storage.get) as storage_get:
+            first = client.get('/img/gallery/pup.gif?w=320')
+            second = client.get('/img/gallery/pup.gif?w=320')
+
+        assert first.status_code == 200
+        assert (first.mimetype, second.mimetype) == (mimetype, mimetype)
+        assert Image.open(io.BytesIO(first.data)).size == (320, 240)
+        assert storage_get.call_count == 1
+
+    @pytest.mark.parametrize('query', ['w=481', 'w=', 'w=480&fmt=tiff', 'w=100000'])
+    def test_rejects_widths_and_formats_outside_the_allow_list(self, client, local_storage, resize_cache, query):
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+        assert client.get(f'/img/{key}?{query}').status_code == 400
+
+    def test_missing_key_is_404(self, client, local_storage, resize_cache):
+        assert client.get('/img/gallery/nope.jpg?w=480').status_code == 404
+
+    @pytest.mark.parametrize('key', ['uploads/staged.jpg', 'share/card.jpg', 'gallery/../uploads/staged.jpg', 'a.jpg'])
+    def test_only_public_image_folders_are_resized(self, client, local_storage, resize_cache, key):
+        local_storage.put(key.replace('gallery/../', ''), _jpeg_upload().stream, 'image/jpeg')
+        with patch.object(local_storage, 'get', wraps=local_storage.get) as storage_get:
+            assert client.get(f'/img/{key}?w=320').status_code == 404
+        storage_get.assert_not_called()
+
+
+class TestNegotiatedEndpoint:
+
+    def test_serves_the_best_accepted_format(self, client, db, local_storage):
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+
+        modern = client.get(f'/i/{key}', headers={'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8'})
+        legacy = client.get(f'/i/{key}', headers={'Accept': 'image/png,image/*;q=0.8,*/*;q=0.5'})
+
+        assert modern.mimetype == 'image/webp'
+        assert legacy.mimetype == 'image/jpeg'
+        for response in (modern, legacy):
+            assert response.headers['Vary'] == 'Accept'
+            assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    def test_alternate_removed_by_gc_is_no_longer_offered(self, client, db, local_storage):
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+        assert client.get(f'/i/{key}', headers={'Accept': 'image/webp'}).mimetype == 'image/webp'
+
+        local_storage.delete_many([image_uploader.format_key(key, 'webp')])
+        assert client.get(f'/i/{key}', headers={'Accept': 'image/webp'}).mimetype == 'image/jpeg'
+
+    def test_uses_the_formats_recorded_on_the_asset(self, client, db, local_storage):
+        from app.utils.image_jobs import asset_for_keys
+
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+        db.session.add(asset_for_keys({'original': key, 'formats': ''}))
+        db.session.commit()
+
+        response = client.get(f'/i/{key}', headers={'Accept': 'image/webp'})
+        assert response.mimetype == 'image/jpeg'
+
+    def test_s3_redirects_to_the_chosen_object(self, app, client, db):
+        class FakeClient:
+            def head_object(self, Bucket, Key):
+                return {}
+
+            def generate_presigned_url(self, operation, Params, ExpiresIn):
+                return f"https://bucket.test/{Params['Key']}"
+
+        app.extensions['image_storage'] = S3Storage(bucket='test', client=FakeClient())
+        response = client.get('/i/gallery/abc.jpg', headers={'Accept': 'image/webp'})
+
+        assert response.status_code == 302
+        assert response.headers['Location'] == 'https://bucket.test/gallery/abc.webp'
+        assert response.headers['Vary'] == 'Accept'
+
+    def test_only_public_image_folders_are_served(self, app, client, db):
+        class FakeClient:
+            def head_object(self, Bucket, Key):
+                raise AssertionError(f'HEAD {Key}')
+
+            def generate_presigned_url(self, operation, Params, ExpiresIn):
+                raise AssertionError(f"presigned {Params['Key']}")
+
+        app.extensions['image_storage'] = S3Storage(bucket='test', client=FakeClient())
+        for key in ('uploads/staged.jpg', 'share/card.jpg', 'gallery/../uploads/staged.jpg', 'a.jpg'):
+            assert client.get(f'/i/{key}', headers={'Accept': 'image/webp'}).status_code == 404
+
+    def test_resize_endpoint_negotiates_without_fmt(self, client, local_storage, resize_cache):
+        key = image_uploader.upload_image(_jpeg_upload(), folder='gallery')
+
+        negotiated = client.get(f'/img/{key}?w=320', headers={'Accept': 'image/webp,*/*'})
+        explicit = client.get(f'/img/{key}?w=320&fmt=jpeg', headers={'Accept': 'image/webp,*/*'})
+
+        assert negotiated.mimetype == 'image/webp'
+        assert negotiated.headers['Vary'] == 'Accept'
+        assert explicit.mimetype == 'image/jpeg'
+        assert 'Vary' not in explicit.headers
+
+
+class TestDiskLRUCache:
+
+    def test_evicts_least_recently_used_beyond_limit(self, tmp_path):
+        cache = DiskLRUCache(tmp_path, max_bytes=3500)
+        for name in ('a', 'b', 'c'):
+            path = cache.put(f'{name}0.bin', b'x' * 1000)
+            os.utime(path, (time.time() - 100 + ord(name), time.time() - 100 + ord(name)))
+
+        assert cache.get('a0.bin') is not None  # now the most recently used
+        cache.put('d0.bin', b'x' * 1000)
+
+        # Over the limit: the oldest entry goes, until under 90% of it
+        assert cache.get('b0.bin') is None
+        assert all(cache.get(name) is not None for name in ('a0.bin', 'c0.bin', 'd0.bin'))
+
+
+class TestS3Storage:
+
+    def test_delete_many_batches_requests(self):
+        class FakeClient:
+            def __init__(self):
+                self.batches = []
+
+            def delete_objects(self, Bucket, Delete):
+                self.batches.append(len(Delete['Objects']))
+
+        client = FakeClient()
+        deleted = S3Storage(bucket='test', client=client).delete_many(f'k/{i}.jpg' for i in range(2500))
+
+        assert deleted == 2500
+        assert client.batches == [1000, 1000, 500]
+
+    def test_presigned_post_limits_the_upload_size(self):
+        client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+        post = S3Storage(bucket='test', client=client).presigned_post('uploads/a.jpg', max_bytes=1024)
+
+        policy = json.loads(base64.b64decode(post['fields']['policy']))
+        assert post['fields']['key'] == 'uploads/a.jpg'
+        assert ['content-length-range', 1, 1024] in policy['conditions']